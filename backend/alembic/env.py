@@ -24,6 +24,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from app.db.base import Base
 from app.models.user import User, Notification, UserAction
+from app.models.sales import SaleLine, SalesSyncState, SalesRollupHourly, SalesRollupDaily, SalesRollupProduct
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,51 @@
+"""notifications keyset index
+
+Revision ID: 2b3c4d5e6f7a
+Revises: 1a2b3c4d5e6f
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2b3c4d5e6f7a'
+down_revision = '1a2b3c4d5e6f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Индексы строятся без блокировки записи в таблицу уведомлений;
+    # порядок ключей совпадает с ORDER BY created_at DESC, id DESC
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notifications_user_created',
+            'notifications',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True
+        )
+        # Непрочитанные (фильтр is_read=false) - частичный индекс
+        op.create_index(
+            'ix_notifications_user_unread_created',
+            'notifications',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_where=sa.text('NOT is_read'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_notifications_user_unread_created',
+            table_name='notifications',
+            postgresql_concurrently=True
+        )
+        op.drop_index(
+            'ix_notifications_user_created',
+            table_name='notifications',
+            postgresql_concurrently=True
+        )
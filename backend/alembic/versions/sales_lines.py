@@ -0,0 +1,59 @@
+"""sales lines fact table
+
+Revision ID: 3c4d5e6f7a8b
+Revises: 2b3c4d5e6f7a
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3c4d5e6f7a8b'
+down_revision = '2b3c4d5e6f7a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Секционирование по месяцам sold_at; секции создаёт синхронизация продаж
+    op.create_table('sales_lines',
+        sa.Column('line_id', sa.String(), nullable=False),
+        sa.Column('sold_at', sa.DateTime(), nullable=False),
+        sa.Column('receipt_id', sa.String(), nullable=False),
+        sa.Column('store_id', sa.String(), nullable=False),
+        sa.Column('store_name', sa.String(), nullable=True),
+        sa.Column('warehouse_id', sa.String(), nullable=True),
+        sa.Column('category_id', sa.String(), nullable=True),
+        sa.Column('product_id', sa.String(), nullable=False),
+        sa.Column('product_name', sa.String(), nullable=True),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.Column('is_deleted', sa.Boolean(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.Column('synced_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('line_id', 'sold_at'),
+        postgresql_partition_by='RANGE (sold_at)'
+    )
+    op.create_index('ix_sales_lines_sold_at', 'sales_lines', ['sold_at'], unique=False)
+    op.create_index('ix_sales_lines_store_sold_at', 'sales_lines', ['store_id', 'sold_at'], unique=False)
+    op.create_index('ix_sales_lines_warehouse_sold_at', 'sales_lines', ['warehouse_id', 'sold_at'], unique=False)
+    op.create_index('ix_sales_lines_category_sold_at', 'sales_lines', ['category_id', 'sold_at'], unique=False)
+    op.create_index('ix_sales_lines_line_id', 'sales_lines', ['line_id'], unique=False)
+
+    op.create_table('sales_sync_state',
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=True),
+        sa.Column('line_id', sa.String(), nullable=True),
+        sa.Column('synced_from', sa.DateTime(), nullable=True),
+        sa.Column('synced_until', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sales_sync_state')
+    # Секции удаляются вместе с родительской таблицей
+    op.drop_table('sales_lines')
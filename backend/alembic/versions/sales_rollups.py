@@ -0,0 +1,61 @@
+"""sales rollups
+
+Revision ID: 4d5e6f7a8b9c
+Revises: 3c4d5e6f7a8b
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '4d5e6f7a8b9c'
+down_revision = '3c4d5e6f7a8b'
+branch_labels = None
+depends_on = None
+
+
+def rollup_columns():
+    return [
+        sa.Column('level', sa.SmallInteger(), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('store_id', sa.String(), nullable=False),
+        sa.Column('warehouse_id', sa.String(), nullable=False),
+        sa.Column('category_id', sa.String(), nullable=False),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.Column('lines', sa.Integer(), nullable=False),
+        sa.Column('receipts', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('level', 'bucket', 'store_id', 'warehouse_id', 'category_id')
+    ]
+
+
+def upgrade() -> None:
+    op.add_column('sales_sync_state', sa.Column('rolled_until', sa.DateTime(), nullable=True))
+    op.add_column('sales_sync_state', sa.Column('rolled_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_sales_lines_synced_at', 'sales_lines', ['synced_at'], unique=False)
+
+    # Итоги строятся синхронизацией продаж при следующем проходе
+    op.create_table('sales_rollup_hourly', *rollup_columns())
+    op.create_table('sales_rollup_daily', *rollup_columns())
+    op.create_table('sales_rollup_products',
+        sa.Column('day', sa.DateTime(), nullable=False),
+        sa.Column('store_id', sa.String(), nullable=False),
+        sa.Column('warehouse_id', sa.String(), nullable=False),
+        sa.Column('category_id', sa.String(), nullable=False),
+        sa.Column('product_id', sa.String(), nullable=False),
+        sa.Column('store_name', sa.String(), nullable=True),
+        sa.Column('product_name', sa.String(), nullable=True),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'store_id', 'warehouse_id', 'category_id', 'product_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sales_rollup_products')
+    op.drop_table('sales_rollup_daily')
+    op.drop_table('sales_rollup_hourly')
+    op.drop_index('ix_sales_lines_synced_at', table_name='sales_lines')
+    op.drop_column('sales_sync_state', 'rolled_at')
+    op.drop_column('sales_sync_state', 'rolled_until')
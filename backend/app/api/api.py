@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, sales, notifications, processes
+from app.api.endpoints import auth, sales, notifications, processes, reports
 
 api_router = APIRouter()
 
@@ -9,3 +9,4 @@ api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(sales.router, prefix="/sales", tags=["sales"])
 api_router.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
 api_router.include_router(processes.router, prefix="/processes", tags=["processes"])
+api_router.include_router(reports.router, prefix="/reports", tags=["reports"])
@@ -1,12 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 import logging
 
 from app.db.base import get_db
 from app.core.config import settings
-from app.services.auth import create_access_token, verify_telegram_data
+from app.services.auth import (
+    create_access_token,
+    telegram_profile,
+    upsert_telegram_user,
+    verify_telegram_data_cached,
+)
+from app.services.audit_log import audit_log
+from app.services.user_cache import user_cache
 from app.models.user import User, UserAction
 from app.schemas.user import User as UserSchema, TokenData, Token, UserCreate
 
@@ -17,7 +25,7 @@ logger = logging.getLogger(__name__)
 @router.post("/telegram-auth", response_model=Token)
 async def login_with_telegram(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Аутентификация через Telegram Mini App.
@@ -33,8 +41,14 @@ async def login_with_telegram(
                 detail="Invalid authentication data"
             )
         
-        # Проверяем данные от Telegram
-        telegram_data = verify_telegram_data(init_data)
+        # Проверяем подпись и срок данных от Telegram (повторный вход - из кэша)
+        try:
+            telegram_data = await verify_telegram_data_cached(init_data)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=str(e)
+            )
         
         # Получаем Telegram ID пользователя
         telegram_id = telegram_data.get("id")
@@ -44,31 +58,20 @@ async def login_with_telegram(
                 detail="User ID not found in Telegram data"
             )
         
-        # Проверяем, есть ли пользователь в базе
-        user = db.query(User).filter(User.telegram_id == telegram_id).first()
-        
-        # Если пользователя нет, создаем его с ролью employee
-        if not user:
-            new_user = User(
-                telegram_id=telegram_id,
-                username=telegram_data.get("username", ""),
-                full_name=telegram_data.get("first_name", "") + " " + telegram_data.get("last_name", ""),
-                role="employee"
-            )
-            db.add(new_user)
-            db.commit()
-            db.refresh(new_user)
-            user = new_user
+        # Пользователь из кэша; если его нет или Telegram прислал новое имя -
+        # создаём/обновляем одним upsert
+        username, full_name = telegram_profile(telegram_data)
+        user = await user_cache.get_cached(telegram_id)
+        if user is None or (user.username, user.full_name) != (username, full_name):
+            user = await upsert_telegram_user(db, telegram_id, username, full_name)
         
-        # Логируем действие пользователя
-        log_action = UserAction(
+        # Логируем действие пользователя (запись в БД пакетом, в фоне)
+        audit_log.record(
             user_id=user.id,
             action_type="login",
             action_details="Telegram Mini App login",
             ip_address=request.client.host if request.client else None
         )
-        db.add(log_action)
-        db.commit()
         
         # Создаем JWT токен
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -79,6 +82,8 @@ async def login_with_telegram(
         
         return {"access_token": access_token, "token_type": "bearer"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error during Telegram authentication: {e}")
         raise HTTPException(
@@ -90,14 +95,14 @@ async def login_with_telegram(
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получение токена через логин/пароль (для внутреннего использования)
     В основном используется для тестирования и доступа к API из других систем
     """
     # В данном примере ищем пользователя по telegram_id, который используется как username
-    user = db.query(User).filter(User.telegram_id == form_data.username).first()
+    user = await db.scalar(select(User).where(User.telegram_id == form_data.username))
     
     # В реальном приложении здесь должна быть проверка пароля
     # Для примера просто проверяем, что пользователь существует и активен
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Header, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 
+from app.core.responses import trusted_response
 from app.db.base import get_db
 from app.services.auth import get_current_active_user, get_current_admin
 from app.models.user import User
 from app.services.notification_service import notification_service
-from app.schemas.user import Notification, NotificationList, NotificationCreate, NotificationUpdate
+from app.services.notification_push import notification_push
+from app.schemas.user import Notification, NotificationList, NotificationCreate, NotificationUpdate, UnreadCounts
 
 router = APIRouter()
 
@@ -17,28 +20,72 @@ async def get_notifications(
     limit: int = Query(20, ge=1, le=100),
     category: Optional[str] = Query(None, description="Фильтр по категории уведомлений"),
     is_read: Optional[bool] = Query(None, description="Фильтр по статусу прочтения"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor), вместо skip"),
+    count: str = Query("approximate", pattern="^(approximate|exact|none)$", description="Подсчёт total: approximate, exact, none"),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получение списка уведомлений для текущего пользователя
     """
     # Используем фиксированный user_id для всех запросов, так как авторизация отключена
-    result = await notification_service.get_notifications(
-        db=db,
-        user_id=1,  # Фиксированный ID пользователя
-        skip=skip,
-        limit=limit,
-        category=category,
-        is_read=is_read
-    )
+    try:
+        result = await notification_service.get_notifications(
+            db=db,
+            user_id=1,  # Фиксированный ID пользователя
+            skip=skip,
+            limit=limit,
+            category=category,
+            is_read=is_read,
+            cursor=cursor,
+            count=count
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
     return result
 
 
+@router.get("/stream")
+async def stream_notifications(
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+    since_id: Optional[int] = Query(None, description="Последний полученный id (если нельзя передать Last-Event-ID)")
+):
+    """
+    Поток новых уведомлений (Server-Sent Events) вместо опроса списка.
+    После переподключения досылаются уведомления, пропущенные с Last-Event-ID.
+    """
+    return StreamingResponse(
+        notification_push.stream(
+            user_id=1,  # Фиксированный ID пользователя
+            last_event_id=last_event_id if last_event_id is not None else since_id
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/unread-counts", response_model=UnreadCounts)
+async def get_unread_counts(
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Количество непрочитанных уведомлений по категориям (для бейджей)
+    """
+    counts = await notification_service.get_unread_counts(
+        db=db,
+        user_id=1  # Фиксированный ID пользователя
+    )
+    # Счётчики формирует само приложение - без повторной проверки схемой
+    return trusted_response(counts)
+
+
 @router.post("/mark-read/{notification_id}", response_model=Notification)
 async def mark_notification_as_read(
     notification_id: int = Path(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Пометка уведомления как прочитанного
@@ -61,7 +108,7 @@ async def mark_notification_as_read(
 @router.post("/mark-all-read", response_model=dict)
 async def mark_all_notifications_as_read(
     category: Optional[str] = Query(None, description="Категория уведомлений для пометки (все, если не указана)"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Пометка всех уведомлений как прочитанных
@@ -78,7 +125,7 @@ async def mark_all_notifications_as_read(
 @router.delete("/{notification_id}", response_model=dict)
 async def delete_notification(
     notification_id: int = Path(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Удаление уведомления
@@ -101,7 +148,7 @@ async def delete_notification(
 @router.post("/create", response_model=Notification)
 async def create_notification(
     notification: NotificationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Создание нового уведомления (только для администраторов)
@@ -120,12 +167,13 @@ async def create_notifications_for_role(
     category: str = Query(..., description="Категория уведомления"),
     title: str = Query(..., description="Заголовок уведомления"),
     message: str = Query(..., description="Текст уведомления"),
-    db: Session = Depends(get_db)
+    return_ids: bool = Query(False, description="Вернуть id созданных уведомлений"),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Создание уведомлений для всех пользователей с определенной ролью (только для администраторов)
     """
-    notifications = await notification_service.create_notifications_for_role(
+    notification_ids = await notification_service.create_notifications_for_role(
         db=db,
         role=role,
         category=category,
@@ -133,4 +181,8 @@ async def create_notifications_for_role(
         message=message
     )
     
-    return {"success": True, "created_count": len(notifications)}
+    result = {"success": True, "created_count": len(notification_ids)}
+    if return_ids:
+        result["notification_ids"] = notification_ids
+    
+    return result
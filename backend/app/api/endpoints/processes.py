@@ -1,21 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Body, Path
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import logging
 
+from app.core.config import settings
 from app.db.base import get_db
 from app.services.auth import get_current_active_user, get_current_manager
 from app.models.user import User, UserAction
 from app.services.onec_service import onec_service
-from app.schemas.sales import OneCProcessRequest, OneCProcessResponse
+from app.services.job_queue import job_queue, FINAL_STATUSES
+from app.services.report_service import report_service
+from app.schemas.sales import OneCProcessRequest, OneCProcessResponse, ProcessStatus
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+async def invalidate_warehouses_cache(result: dict):
+    # Остатки изменились - сбрасываем кэш справочника складов
+    await onec_service.invalidate_reference_cache("get_warehouses")
+
+
+job_queue.on_complete("UpdateStock", invalidate_warehouses_cache)
+
+
+async def generate_report_job(process_request: OneCProcessRequest) -> dict:
+    # Отчёты по продажам строит приложение (файл в кэше отчётов), остальные - 1С
+    parameters = process_request.parameters or {}
+    if not report_service.supports(parameters.get("reportType")):
+        return await onec_service.run_process(process_request, timeout=settings.JOB_TIMEOUT)
+
+    report = await report_service.get_report(
+        parameters["reportType"],
+        parameters.get("period") or "today",
+        parameters.get("storeId"),
+        parameters.get("warehouseId"),
+        parameters.get("format")
+    )
+    if "error" in report:
+        return {"success": False, "message": report["error"]}
+    return {"success": True, "message": "Отчет сформирован", "result": report}
+
+
+job_queue.register("GenerateReport", generate_report_job)
+
+
+async def enqueue_process(process_request: OneCProcessRequest) -> dict:
+    """
+    Постановка обработки в очередь; результат получают через GET /processes/{process_id}
+    """
+    job = await job_queue.enqueue(process_request)
+    return {
+        "success": True,
+        "message": "Обработка поставлена в очередь",
+        "result": {"status": job["status"]},
+        "process_id": job["process_id"]
+    }
+
+
 @router.post("/run", response_model=OneCProcessResponse)
 async def run_process(
     process_request: OneCProcessRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Запуск обработки в 1С
@@ -23,10 +70,8 @@ async def run_process(
     try:
         # Не логируем действия пользователя, так как авторизация отключена
         
-        # Запускаем процесс в 1С
-        result = await onec_service.run_process(process_request)
-        
-        return result
+        # Ставим процесс в очередь обработок 1С
+        return await enqueue_process(process_request)
     
     except Exception as e:
         logger.exception(f"Error running 1C process: {e}")
@@ -37,7 +82,7 @@ async def run_process(
 async def update_stock(
     warehouse_id: str = Body(None, embed=True),
     current_user: User = Depends(get_current_manager),  # Только менеджеры и админы
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Обновление остатков на складе
@@ -51,10 +96,8 @@ async def update_stock(
         
         # Не логируем действия пользователя, так как авторизация отключена
         
-        # Запускаем процесс в 1С
-        result = await onec_service.run_process(process_request)
-        
-        return result
+        # Ставим процесс в очередь, кэш складов сбрасывается по его завершении
+        return await enqueue_process(process_request)
     
     except Exception as e:
         logger.exception(f"Error updating stock: {e}")
@@ -67,12 +110,19 @@ async def generate_report(
     period: str = Body("today", embed=True),
     store_id: str = Body(None, embed=True),
     warehouse_id: str = Body(None, embed=True),
-    db: Session = Depends(get_db)
+    report_format: str = Body("xlsx", embed=True, alias="format", pattern="^(xlsx|csv)$"),
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Генерация отчета в 1С
+    Генерация отчета.
+    Готовый отчёт из кэша возвращается сразу (без process_id), иначе обработка ставится в очередь.
     """
     try:
+        if report_service.supports(report_type):
+            report = report_service.cached(report_type, period, store_id, warehouse_id, report_format)
+            if report is not None:
+                return {"success": True, "message": "Отчет сформирован", "result": report}
+
         # Создаем запрос для 1С
         process_request = OneCProcessRequest(
             process_name="GenerateReport",
@@ -80,17 +130,62 @@ async def generate_report(
                 "reportType": report_type,
                 "period": period,
                 "storeId": store_id,
-                "warehouseId": warehouse_id
+                "warehouseId": warehouse_id,
+                "format": report_format
             }
         )
         
         # Не логируем действия пользователя, так как авторизация отключена
         
-        # Запускаем процесс в 1С
-        result = await onec_service.run_process(process_request)
-        
-        return result
+        # Ставим процесс в очередь обработок 1С
+        return await enqueue_process(process_request)
     
     except Exception as e:
         logger.exception(f"Error generating report: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/{process_id}", response_model=ProcessStatus)
+async def get_process_status(
+    process_id: str = Path(...)
+):
+    """
+    Статус обработки, поставленной в очередь
+    """
+    job = await job_queue.get(process_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Process not found")
+    
+    return job
+
+
+@router.get("/{process_id}/events")
+async def stream_process_status(
+    process_id: str = Path(...)
+):
+    """
+    Поток изменений статуса обработки (Server-Sent Events) до её завершения
+    """
+    job = await job_queue.get(process_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Process not found")
+    
+    async def events():
+        last_update = None
+        while True:
+            current = await job_queue.get(process_id)
+            if current is None:
+                return
+            if current["updated_at"] != last_update:
+                last_update = current["updated_at"]
+                payload = ProcessStatus(**current).model_dump_json()
+                yield f"event: status\ndata: {payload}\n\n"
+            if current["status"] in FINAL_STATUSES:
+                return
+            await asyncio.sleep(1)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
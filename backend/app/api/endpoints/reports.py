@@ -0,0 +1,38 @@
+from fastapi import APIRouter, HTTPException, Path
+from fastapi.responses import FileResponse, Response
+import logging
+import re
+
+from app.core.config import settings
+from app.services.report_service import FILE_ID, REPORT_FORMATS, report_service
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+@router.get("/{file_id}/{filename}")
+async def download_report(
+    file_id: str = Path(..., description="Идентификатор файла в кэше отчётов"),
+    filename: str = Path(..., description="Имя файла для сохранения")
+):
+    """
+    Скачивание готового отчёта (ссылка из результата обработки GenerateReport).
+    Сам файл отдаёт nginx по X-Accel-Redirect, без передачи через приложение.
+    """
+    if not FILE_ID.match(file_id) or not report_service.touch(file_id):
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    report_format = file_id.rsplit(".", 1)[1]
+    filename = UNSAFE_FILENAME.sub("_", filename) or file_id
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        # Содержимое по данному id не меняется
+        "Cache-Control": "private, max-age=86400, immutable"
+    }
+    if not settings.REPORTS_ACCEL_PREFIX:
+        return FileResponse(report_service.path(file_id), media_type=REPORT_FORMATS[report_format], headers=headers)
+
+    headers["X-Accel-Redirect"] = f"{settings.REPORTS_ACCEL_PREFIX}{file_id[:2]}/{file_id}"
+    return Response(media_type=REPORT_FORMATS[report_format], headers=headers)
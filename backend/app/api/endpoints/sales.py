@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 import logging
+import math
 
+from app.core.config import settings
 from app.db.base import get_db
 from app.services.auth import get_current_active_user, get_current_manager
 from app.models.user import User, UserAction
 from app.services.onec_service import onec_service
+from app.services.response_cache import response_cache
+from app.services.sales_aggregation import period_window
+from app.services.sales_export import EXPORT_FORMATS, sales_export
 from app.schemas.sales import (
+    SalesBatchResponse,
     SalesFilter, 
     SalesResponse, 
     StoresResponse,
@@ -18,13 +25,29 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def checked(data):
+    """
+    Данные от сервиса 1С; ответ с ошибкой (1С недоступна и сохранённого ответа нет) - 503
+    """
+    if isinstance(data, dict) and "error" in data:
+        headers = {"Retry-After": str(math.ceil(data["retry_after"]))} if "retry_after" in data else None
+        raise HTTPException(status_code=503, detail=f"1C unavailable: {data['error']}", headers=headers)
+    return data
+
+
 @router.get("/", response_model=SalesResponse)
 async def get_sales(
-    period: str = Query("today", description="Период: today, yesterday, week, month"),
+    request: Request,
+    period: str = Query("today", pattern="^(today|yesterday|week|month)$", description="Период: today, yesterday, week, month"),
     store_id: Optional[str] = Query(None, description="ID магазина"),
     warehouse_id: Optional[str] = Query(None, description="ID склада"),
     category_id: Optional[str] = Query(None, description="ID категории"),
-    db: Session = Depends(get_db)
+    group_by: Optional[str] = Query(
+        None,
+        pattern="^(store|warehouse|category)$",
+        description="Серии графика по магазинам, складам или категориям"
+    ),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Получение данных о продажах с фильтрацией
@@ -35,30 +58,131 @@ async def get_sales(
             period=period,
             store_id=store_id,
             warehouse_id=warehouse_id,
-            category_id=category_id
+            category_id=category_id,
+            group_by=group_by
         )
         
         # Не логируем действия пользователя, авторизация отключена
         
-        # Запрашиваем данные из 1С
-        sales_data = await onec_service.get_sales_data(filter_params)
+        async def load():
+            return checked(await onec_service.get_sales_data(filter_params))
         
-        return sales_data
+        # Запрашиваем данные из 1С (готовый ответ - из кэша, с ETag)
+        return await response_cache.respond(
+            request,
+            "get_sales_data",
+            load,
+            model=SalesResponse,
+            ttl=settings.RESPONSE_CACHE_TTL_SALES,
+            max_age=settings.HTTP_MAX_AGE_SALES,
+            params=filter_params.model_dump()
+        )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error getting sales data: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@router.get("/batch", response_model=SalesBatchResponse)
+async def get_sales_batch(
+    period: List[Literal["today", "yesterday", "week", "month"]] = Query(
+        ["today"],
+        description="Периоды: today, yesterday, week, month (можно несколько)"
+    ),
+    store_id: List[str] = Query([], description="ID магазинов (можно несколько; без них - все магазины вместе)"),
+    warehouse_id: Optional[str] = Query(None, description="ID склада"),
+    category_id: Optional[str] = Query(None, description="ID категории"),
+    group_by: Optional[str] = Query(
+        None,
+        pattern="^(store|warehouse|category)$",
+        description="Серии графика по магазинам, складам или категориям"
+    ),
+    warehouses: bool = Query(False, description="Добавить склады каждого магазина")
+):
+    """
+    Продажи для нескольких наборов фильтров одним ответом (каждый период по каждому магазину),
+    например для сводки руководителя по всем магазинам.
+    """
+    filters = [
+        SalesFilter(
+            period=p,
+            store_id=store,
+            warehouse_id=warehouse_id,
+            category_id=category_id,
+            group_by=group_by
+        )
+        for p in period
+        for store in (store_id or [None])
+    ]
+    if len(filters) > settings.SALES_BATCH_MAX_FILTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many filter combinations: {len(filters)} > {settings.SALES_BATCH_MAX_FILTERS}"
+        )
+
+    try:
+        return {"results": await onec_service.get_sales_batch(filters, warehouses=warehouses)}
+    
+    except Exception as e:
+        logger.exception(f"Error getting sales batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/export")
+async def export_sales(
+    period: str = Query("today", pattern="^(today|yesterday|week|month)$", description="Период: today, yesterday, week, month"),
+    store_id: Optional[str] = Query(None, description="ID магазина"),
+    warehouse_id: Optional[str] = Query(None, description="ID склада"),
+    category_id: Optional[str] = Query(None, description="ID категории"),
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="Формат: ndjson, csv")
+):
+    """
+    Потоковая выгрузка строк чеков за прошедшую часть периода (NDJSON или CSV).
+    Строки отправляются по мере чтения из базы и 1С, без сборки всего ответа в памяти.
+    """
+    filter_params = SalesFilter(
+        period=period,
+        store_id=store_id,
+        warehouse_id=warehouse_id,
+        category_id=category_id
+    )
+    window = period_window(period)
+    filename = f"sales_{period}_{window.start:%Y-%m-%d}.{export_format}"
+
+    return StreamingResponse(
+        sales_export.stream(filter_params, window.start, window.current_end, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx не должен буферизовать ответ целиком
+            "X-Accel-Buffering": "no",
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        }
+    )
+
+
 @router.get("/stores", response_model=StoresResponse)
-async def get_stores():
+async def get_stores(request: Request):
     """
     Получение списка магазинов из 1С
     """
+    async def load():
+        return {"stores": checked(await onec_service.get_stores())}
+    
     try:
-        stores = await onec_service.get_stores()
-        return {"stores": stores}
+        return await response_cache.respond(
+            request,
+            "get_stores",
+            load,
+            model=StoresResponse,
+            ttl=settings.RESPONSE_CACHE_TTL_REFERENCE,
+            max_age=settings.HTTP_MAX_AGE_REFERENCE
+        )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error getting stores: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -66,15 +190,28 @@ async def get_stores():
 
 @router.get("/warehouses", response_model=WarehousesResponse)
 async def get_warehouses(
+    request: Request,
     store_id: Optional[str] = Query(None, description="ID магазина для фильтрации складов")
 ):
     """
     Получение списка складов из 1С
     """
+    async def load():
+        return {"warehouses": checked(await onec_service.get_warehouses(store_id))}
+    
     try:
-        warehouses = await onec_service.get_warehouses(store_id)
-        return {"warehouses": warehouses}
+        return await response_cache.respond(
+            request,
+            "get_warehouses",
+            load,
+            model=WarehousesResponse,
+            ttl=settings.RESPONSE_CACHE_TTL_REFERENCE,
+            max_age=settings.HTTP_MAX_AGE_REFERENCE,
+            params={"store_id": store_id}
+        )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error getting warehouses: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,7 +17,16 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = os.getenv("POSTGRES_USER", "postgres")
     POSTGRES_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "postgres")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "tg_mini_app")
-    DATABASE_URI: str = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}/{POSTGRES_DB}"
+    DATABASE_URI: str = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}/{POSTGRES_DB}"  # синхронный, для Alembic и скриптов
+    ASYNC_DATABASE_URI: str = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}/{POSTGRES_DB}"
+    
+    # Пул соединений к БД (на каждый воркер uvicorn)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))  # ожидание свободного соединения, с
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # пересоздание соединений старше N секунд
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT: int = int(os.getenv("DB_STATEMENT_TIMEOUT", 30000))  # мс, 0 - без ограничения
     
     # Настройки Redis для кэширования
     REDIS_HOST: str = os.getenv("REDIS_HOST", "redis")
@@ -26,11 +36,124 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-for-jwt")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 дней
+    AUTH_ENABLED: bool = os.getenv("AUTH_ENABLED", "false").lower() == "true"  # проверка токена и ролей
+    AUTH_CLAIMS_CACHE_SIZE: int = int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", 10000))  # проверенных токенов в памяти процесса
+    AUTH_CLAIMS_CACHE_TTL: int = int(os.getenv("AUTH_CLAIMS_CACHE_TTL", 300))  # с, но не дольше срока токена
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", 300))  # пользователь и роль в Redis, с
     
     # Настройки для 1С
     ONEC_API_URL: str = os.getenv("ONEC_API_URL", "http://1c-server:8080/api")
     ONEC_API_USER: str = os.getenv("ONEC_API_USER", "api_user")
     ONEC_API_PASSWORD: str = os.getenv("ONEC_API_PASSWORD", "api_password")
+    ONEC_USE_MOCK: bool = os.getenv("ONEC_USE_MOCK", "true").lower() == "true"  # тестовые данные вместо запросов к 1С
+    ONEC_CONNECT_TIMEOUT: float = float(os.getenv("ONEC_CONNECT_TIMEOUT", 5))
+    ONEC_READ_TIMEOUT: float = float(os.getenv("ONEC_READ_TIMEOUT", 30))
+    ONEC_POOL_LIMIT: int = int(os.getenv("ONEC_POOL_LIMIT", 100))  # всего соединений к 1С
+    ONEC_POOL_LIMIT_PER_HOST: int = int(os.getenv("ONEC_POOL_LIMIT_PER_HOST", 20))
+    ONEC_KEEPALIVE_TIMEOUT: float = float(os.getenv("ONEC_KEEPALIVE_TIMEOUT", 30))
+    # Предохранители (circuit breaker) по endpoint'ам 1С и адаптивные таймауты
+    ONEC_BREAKER_ENABLED: bool = os.getenv("ONEC_BREAKER_ENABLED", "true").lower() == "true"
+    ONEC_BREAKER_FAILURES: int = int(os.getenv("ONEC_BREAKER_FAILURES", 5))  # ошибок подряд до размыкания
+    ONEC_BREAKER_OPEN_SECONDS: float = float(os.getenv("ONEC_BREAKER_OPEN_SECONDS", 15))  # до пробного запроса
+    ONEC_BREAKER_OPEN_MAX: float = float(os.getenv("ONEC_BREAKER_OPEN_MAX", 300))  # предел удвоения после неудачных проб
+    ONEC_TIMEOUT_PERCENTILE: float = float(os.getenv("ONEC_TIMEOUT_PERCENTILE", 99))  # по времени последних ответов
+    ONEC_TIMEOUT_MULTIPLIER: float = float(os.getenv("ONEC_TIMEOUT_MULTIPLIER", 3))
+    ONEC_TIMEOUT_MIN: float = float(os.getenv("ONEC_TIMEOUT_MIN", 2))  # с; сверху таймаут ограничен ONEC_READ_TIMEOUT
+    # Последние удачные ответы 1С - отдаются, пока 1С недоступна
+    ONEC_LAST_GOOD_TTL: int = int(os.getenv("ONEC_LAST_GOOD_TTL", 86400))
+    ONEC_LAST_GOOD_LRU_SIZE: int = int(os.getenv("ONEC_LAST_GOOD_LRU_SIZE", 128))
+    # Пакетные запросы к 1С: GET-запросы за ONEC_BATCH_WINDOW_MS уходят одним POST <ONEC_BATCH_ENDPOINT>
+    ONEC_BATCH_WINDOW_MS: float = float(os.getenv("ONEC_BATCH_WINDOW_MS", 5))  # 0 - без пакетирования
+    ONEC_BATCH_MAX_SIZE: int = int(os.getenv("ONEC_BATCH_MAX_SIZE", 50))  # запросов в пакете
+    ONEC_BATCH_ENDPOINT: str = os.getenv("ONEC_BATCH_ENDPOINT", "batch")  # пустой - 1С не поддерживает пакеты
+    ONEC_BATCH_CONCURRENCY: int = int(os.getenv("ONEC_BATCH_CONCURRENCY", 8))  # без пакетов: параллельных запросов
+
+    # Кэш справочников 1С (магазины, склады), время в секундах
+    ONEC_CACHE_TTL_STORES: int = int(os.getenv("ONEC_CACHE_TTL_STORES", 3600))
+    ONEC_CACHE_TTL_WAREHOUSES: int = int(os.getenv("ONEC_CACHE_TTL_WAREHOUSES", 3600))
+    ONEC_CACHE_STALE_TTL: int = int(os.getenv("ONEC_CACHE_STALE_TTL", 3600))  # отдаём устаревшее, обновляя в фоне
+    ONEC_CACHE_LOCAL_TTL: int = int(os.getenv("ONEC_CACHE_LOCAL_TTL", 30))  # время жизни копии в памяти процесса
+    ONEC_CACHE_LRU_SIZE: int = int(os.getenv("ONEC_CACHE_LRU_SIZE", 1024))
+
+    # Агрегация продаж по строкам чеков 1С
+    SALES_ITEMS_LIMIT: int = int(os.getenv("SALES_ITEMS_LIMIT", 100))  # товаров в ответе (по выручке)
+
+    # Локальная таблица продаж (sales_lines) и её инкрементальная синхронизация из 1С
+    SALES_LOCAL_STORE_ENABLED: bool = os.getenv("SALES_LOCAL_STORE_ENABLED", "true").lower() == "true"
+    SALES_SYNC_INTERVAL: int = int(os.getenv("SALES_SYNC_INTERVAL", 300))  # с, 0 - без фоновой синхронизации
+    SALES_SYNC_LAG: int = int(os.getenv("SALES_SYNC_LAG", 120))  # с, запас на долгие транзакции 1С
+    SALES_SYNC_BATCH: int = int(os.getenv("SALES_SYNC_BATCH", 5000))  # строк ленты изменений за запрос
+    SALES_SYNC_INITIAL_DAYS: int = int(os.getenv("SALES_SYNC_INITIAL_DAYS", 62))  # первая загрузка: месяц и предыдущий
+    SALES_SYNC_LOCK_TTL: int = int(os.getenv("SALES_SYNC_LOCK_TTL", 1800))  # с, блокировка от параллельной синхронизации
+    # Итоги по часам и дням (sales_rollup_*), пересчитываются после синхронизации
+    SALES_ROLLUPS_ENABLED: bool = os.getenv("SALES_ROLLUPS_ENABLED", "true").lower() == "true"
+    # Потоковая выгрузка строк чеков (GET /sales/export)
+    SALES_EXPORT_BATCH: int = int(os.getenv("SALES_EXPORT_BATCH", 2000))  # строк в порции курсора и части ответа
+    SALES_BATCH_MAX_FILTERS: int = int(os.getenv("SALES_BATCH_MAX_FILTERS", 30))  # наборов фильтров в GET /sales/batch
+
+    # Отчёты (XLSX/CSV): строятся в пуле процессов, файлы хранятся в кэше на диске
+    REPORTS_DIR: str = os.getenv("REPORTS_DIR", "/tmp/reports")
+    REPORTS_CACHE_MAX_BYTES: int = int(os.getenv("REPORTS_CACHE_MAX_BYTES", 512 * 2 ** 20))  # сверх - удаляются давние
+    REPORTS_MAX_AGE: int = int(os.getenv("REPORTS_MAX_AGE", 300))  # с, отчёт за текущий период строится заново
+    REPORTS_WORKERS: int = int(os.getenv("REPORTS_WORKERS", 2))  # процессов построения
+    REPORTS_ITEMS_LIMIT: int = int(os.getenv("REPORTS_ITEMS_LIMIT", 10000))  # товаров в отчёте
+    # Префикс internal-location nginx с каталогом REPORTS_DIR; пустой - файл отдаёт само приложение
+    REPORTS_ACCEL_PREFIX: str = os.getenv("REPORTS_ACCEL_PREFIX", "/protected-reports/")
+
+    # HTTP-кэширование ответов продаж: ETag/304, Cache-Control и готовые тела в Redis
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"  # тела в Redis
+    RESPONSE_CACHE_TTL_SALES: int = int(os.getenv("RESPONSE_CACHE_TTL_SALES", 60))
+    RESPONSE_CACHE_TTL_REFERENCE: int = int(os.getenv("RESPONSE_CACHE_TTL_REFERENCE", 300))  # магазины, склады
+    HTTP_MAX_AGE_SALES: int = int(os.getenv("HTTP_MAX_AGE_SALES", 30))  # Cache-Control max-age, с
+    HTTP_MAX_AGE_REFERENCE: int = int(os.getenv("HTTP_MAX_AGE_REFERENCE", 300))
+
+    # Сериализация ответов через orjson (при установленном пакете)
+    JSON_ORJSON: bool = os.getenv("JSON_ORJSON", "true").lower() == "true"
+
+    # Сжатие ответов (gzip, brotli при установленном пакете Brotli)
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))  # байт, меньшие ответы не сжимаются
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))  # 1-9
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))  # 0-11
+
+    # Фоновые обработки 1С (очередь в Redis)
+    JOB_WORKERS_ENABLED: bool = os.getenv("JOB_WORKERS_ENABLED", "true").lower() == "true"
+    JOB_CONCURRENCY: int = int(os.getenv("JOB_CONCURRENCY", 4))  # исполнителей общей очереди на процесс
+    JOB_TYPE_CONCURRENCY: Dict[str, int] = json.loads(
+        os.getenv("JOB_TYPE_CONCURRENCY", '{"GenerateReport": 2, "UpdateStock": 1}')
+    )  # отдельные лимиты для типов обработок
+    JOB_MAX_RETRIES: int = int(os.getenv("JOB_MAX_RETRIES", 3))
+    JOB_RETRY_BACKOFF: float = float(os.getenv("JOB_RETRY_BACKOFF", 2))  # с, удваивается с каждой попыткой
+    JOB_TIMEOUT: float = float(os.getenv("JOB_TIMEOUT", 600))
+    JOB_TTL: int = int(os.getenv("JOB_TTL", 86400))  # хранение статуса обработки, с
+    # Задание, взятое исполнителем и не завершённое за этот срок, возвращается в очередь, с
+    JOB_VISIBILITY_TIMEOUT: float = float(os.getenv("JOB_VISIBILITY_TIMEOUT", 660))
+    JOB_REAP_INTERVAL: float = float(os.getenv("JOB_REAP_INTERVAL", 60))  # проверка зависших заданий, с
+    JOB_RETRY_POLL_INTERVAL: float = float(os.getenv("JOB_RETRY_POLL_INTERVAL", 1))  # перенос повторов в очередь, с
+    
+    # Сверка счётчиков уведомлений в Redis с БД, с (0 - отключена)
+    NOTIFICATION_COUNTERS_RECONCILE_INTERVAL: int = int(os.getenv("NOTIFICATION_COUNTERS_RECONCILE_INTERVAL", 3600))
+    
+    # Push-доставка уведомлений (SSE)
+    NOTIFICATION_PUSH_HEARTBEAT: float = float(os.getenv("NOTIFICATION_PUSH_HEARTBEAT", 15))  # с между ping
+    NOTIFICATION_PUSH_QUEUE_SIZE: int = int(os.getenv("NOTIFICATION_PUSH_QUEUE_SIZE", 100))  # событий на соединение
+    NOTIFICATION_PUSH_RESUME_LIMIT: int = int(os.getenv("NOTIFICATION_PUSH_RESUME_LIMIT", 500))
+    # При переподключении досылаются и уведомления с меньшим id, созданные не раньше
+    # чем за столько секунд до последнего полученного (транзакции коммитятся не по порядку id)
+    NOTIFICATION_PUSH_RESUME_GRACE: float = float(os.getenv("NOTIFICATION_PUSH_RESUME_GRACE", 10))
+    NOTIFICATION_PUSH_RETRY_MS: int = int(os.getenv("NOTIFICATION_PUSH_RETRY_MS", 3000))
+    
+    # Логирование
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_JSON: bool = os.getenv("LOG_JSON", "true").lower() == "true"  # структурированные JSON-строки в logs/app.log
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", 0.01))  # доля логируемых служебных запросов
+    LOG_SAMPLED_PATHS: List[str] = ["/", "/health", "/metrics"]
+    LOG_SAMPLED_PREFIXES: List[str] = ["/static/", "/docs", "/favicon"]
+    
+    # Пакетная запись действий пользователей (UserAction)
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+    AUDIT_FLUSH_INTERVAL: float = float(os.getenv("AUDIT_FLUSH_INTERVAL", 2))  # с
+    AUDIT_BUFFER_LIMIT: int = int(os.getenv("AUDIT_BUFFER_LIMIT", 50000))  # макс. записей в памяти
     
     # FTP настройки для обмена с 1С
     FTP_HOST: Optional[str] = os.getenv("FTP_HOST")
@@ -48,7 +171,9 @@ class Settings(BaseSettings):
     ]
     
     # Telegram Bot API токен
-    TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
+    TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")  # пустой - подпись initData не проверяется
+    TELEGRAM_AUTH_MAX_AGE: int = int(os.getenv("TELEGRAM_AUTH_MAX_AGE", 86400))  # допустимый возраст auth_date, с
+    TELEGRAM_INITDATA_CACHE_TTL: int = int(os.getenv("TELEGRAM_INITDATA_CACHE_TTL", 3600))  # проверенные initData в Redis, с
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,174 @@
+import os
+import time
+
+# Каталог задаётся переменной окружения PROMETHEUS_MULTIPROC_DIR до запуска uvicorn:
+# тогда каждый воркер пишет значения в свои файлы, а /metrics суммирует их по всем процессам
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+DB_OPERATIONS = frozenset(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"))
+
+# HTTP-запросы к API
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Запросы, обрабатываемые в данный момент",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса",
+    ["method", "route", "status"]
+)
+
+# Запросы к 1С
+ONEC_REQUEST_DURATION = Histogram(
+    "onec_request_duration_seconds",
+    "Время запроса к API 1С",
+    ["endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+ONEC_REQUEST_ERRORS = Counter(
+    "onec_request_errors_total",
+    "Ошибки запросов к API 1С",
+    ["endpoint", "error"]
+)
+ONEC_SINGLE_FLIGHT = Counter(
+    "onec_single_flight_calls_total",
+    "Вызовы с объединением одинаковых запросов: executed - ушли в 1С, coalesced - дождались чужого",
+    ["name", "result"]
+)
+ONEC_BREAKER_STATE = Gauge(
+    "onec_circuit_breaker_state",
+    "Состояние предохранителя endpoint'а 1С: 0 - замкнут, 1 - пробный запрос, 2 - разомкнут",
+    ["endpoint"],
+    multiprocess_mode="max"
+)
+ONEC_FALLBACKS = Counter(
+    "onec_fallback_responses_total",
+    "Ответы из последних удачных данных при недоступной 1С",
+    ["method"]
+)
+ONEC_BATCH_SIZE = Histogram(
+    "onec_batch_size",
+    "Запросов в пакете к 1С: combined - одним запросом batch, concurrent - параллельно по одному",
+    ["mode"],
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+# Продажи: источник данных запроса и синхронизация из 1С
+SALES_READS = Counter(
+    "sales_reads_total",
+    "Чтения продаж по источнику: rollup (итоги), local, mixed (локально + хвост из 1С), onec",
+    ["source"]
+)
+SALES_SYNC_LINES = Counter(
+    "sales_sync_lines_total",
+    "Строки ленты изменений 1С, записанные в локальную таблицу"
+)
+
+# Отчёты: обращения к кэшу файлов и время построения
+REPORT_REQUESTS = Counter(
+    "report_requests_total",
+    "Запросы отчётов: hit - готовый файл из кэша, rendered - построен заново",
+    ["report_type", "result"]
+)
+REPORT_RENDER_DURATION = Histogram(
+    "report_render_duration_seconds",
+    "Время построения файла отчёта (данные и запись файла)",
+    ["report_type", "format"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+
+# Кэш справочников (LRU в памяти процесса + Redis)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Обращения к кэшу: local_hit, redis_hit, stale_hit, miss",
+    ["cache", "result"]
+)
+
+# База данных
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Время выполнения SQL-запроса",
+    ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание свободного соединения из пула",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Превышения DB_POOL_TIMEOUT при получении соединения"
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Соединения, выданные из пула",
+    multiprocess_mode="livesum"
+)
+DB_POOL_IDLE = Gauge(
+    "db_pool_idle",
+    "Свободные соединения в пуле",
+    multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Соединения сверх DB_POOL_SIZE (до DB_MAX_OVERFLOW)",
+    multiprocess_mode="livesum"
+)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Учёт времени SQL-запросов через события SQLAlchemy
+    (для AsyncEngine передаётся его sync_engine)
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        words = statement.lstrip().split(None, 1)
+        operation = words[0].upper() if words else ""
+        DB_QUERY_DURATION.labels(operation if operation in DB_OPERATIONS else "OTHER").observe(
+            time.perf_counter() - started
+        )
+
+
+def render_metrics() -> bytes:
+    """
+    Метрики в текстовом формате Prometheus (в режиме multiprocess - по всем воркерам)
+    """
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead() -> None:
+    """
+    Удаление gauge-значений завершающегося воркера (вызывается при остановке приложения)
+    """
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
@@ -0,0 +1,55 @@
+import json
+from typing import Any, Dict, Optional, Union
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него работает стандартный json
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """
+    Разбор JSON через orjson (без orjson - стандартным json), для больших ответов 1С
+    """
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+def json_dumps(value: Any) -> bytes:
+    """
+    Сериализация в компактный JSON (orjson, без него - стандартный json)
+    """
+    if orjson is None:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+    return orjson.dumps(value, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON-ответ, сериализуемый orjson (без orjson - стандартным json).
+    Ответ приложения по умолчанию (default_response_class).
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def trusted_response(
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None
+) -> FastJSONResponse:
+    """
+    Ответ из доверенных данных - сформированных самим приложением или уже
+    проверенных (например, из кэша). Возвращённый из эндпоинта Response
+    FastAPI не прогоняет повторно через response_model, поэтому данные
+    должны точно соответствовать схеме ответа.
+    """
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,42 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.metrics import (
+    DB_POOL_CHECKOUT_TIMEOUTS,
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_IDLE,
+    DB_POOL_IN_USE,
+    DB_POOL_OVERFLOW,
+)
+
+
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений asyncpg с учётом времени ожидания свободного соединения.
+    Позволяет увидеть, когда запросы встают в очередь за соединением.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+            self._observe()
+
+    def _do_return_conn(self, record):
+        try:
+            super()._do_return_conn(record)
+        finally:
+            self._observe()
+
+    def _observe(self) -> None:
+        DB_POOL_IN_USE.set(self.checkedout())
+        DB_POOL_IDLE.set(self.checkedin())
+        # overflow() отрицателен, пока не открыто pool_size соединений
+        DB_POOL_OVERFLOW.set(max(self.overflow(), 0))
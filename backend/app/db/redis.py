@@ -0,0 +1,19 @@
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+# Общий асинхронный клиент Redis (соединения открываются лениво из пула)
+redis_client = aioredis.Redis(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=0,
+    decode_responses=True
+)
+
+# Клиент для двоичных значений (готовые тела HTTP-ответов)
+redis_binary_client = aioredis.Redis(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=0,
+    decode_responses=False
+)
@@ -1,28 +1,52 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import logging
+import random
+import sys
 import time
 from loguru import logger
-import redis
-import json
 
 from app.api.api import api_router
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.responses import FastJSONResponse
+from app.core.metrics import (
+    CONTENT_TYPE_LATEST,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_FLIGHT,
+    mark_process_dead,
+    render_metrics,
+)
+from app.db.base import async_engine
+from app.db.redis import redis_binary_client, redis_client
+from app.services.onec_service import onec_service
+from app.services.circuit_breaker import onec_breakers
+from app.services.job_queue import job_queue
+from app.services.notification_counters import notification_counters
+from app.services.notification_push import notification_push
+from app.services.audit_log import audit_log
+from app.services.sales_sync import sales_sync
+from app.services.report_service import report_service
 
-# Настройка логирования
+# Настройка логирования: запись в файл и консоль идёт из фонового потока
+# (enqueue=True), поэтому не блокирует цикл событий
+logger.remove()
+logger.add(sys.stderr, level=settings.LOG_LEVEL, enqueue=True)
 logger.add(
     "logs/app.log", 
     rotation="500 MB", 
-    level="INFO", 
+    level=settings.LOG_LEVEL, 
     format="{time} {level} {message}",
-    serialize=False
+    serialize=settings.LOG_JSON,
+    enqueue=True
 )
 
 # Создаем приложение FastAPI
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=FastJSONResponse if settings.JSON_ORJSON else JSONResponse
 )
 
 # Добавляем middleware для CORS
@@ -34,43 +58,110 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Подключаем кэширование через Redis, если нужно
-try:
-    redis_client = redis.Redis(
-        host=settings.REDIS_HOST,
-        port=settings.REDIS_PORT,
-        db=0,
-        decode_responses=True
+# Сжатие ответов по Accept-Encoding
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY
     )
-    # Проверка соединения
-    redis_client.ping()
-    logger.info("Connected to Redis successfully")
-except Exception as e:
-    redis_client = None
-    logger.warning(f"Failed to connect to Redis: {e}")
 
 
-# Middleware для логирования запросов и времени выполнения
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
+@app.on_event("startup")
+async def startup():
+    # Проверяем подключение к Redis (используется для кэширования)
+    try:
+        await redis_client.ping()
+        logger.info("Connected to Redis successfully")
+    except Exception as e:
+        logger.warning(f"Failed to connect to Redis: {e}")
+    
+    # Общая keep-alive сессия к 1С на всё время работы приложения
+    await onec_service.startup()
+    
+    # Исполнители фоновых обработок 1С
+    await job_queue.start()
+    
+    # Периодическая сверка счётчиков уведомлений с БД
+    await notification_counters.start()
     
-    # Получаем клиентский IP
-    client_host = request.client.host if request.client else "unknown"
+    # Подписка на новые уведомления для push-доставки клиентам
+    await notification_push.start()
     
-    logger.info(f"Request: {request.method} {request.url.path} - Client: {client_host}")
+    # Пакетная запись действий пользователей
+    await audit_log.start()
+    
+    # Инкрементальная синхронизация продаж из 1С в локальную таблицу
+    await sales_sync.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_queue.stop()
+    await notification_counters.stop()
+    await notification_push.stop()
+    await audit_log.stop()
+    await sales_sync.stop()
+    await report_service.shutdown()
+    await onec_service.shutdown()
+    await redis_client.aclose()
+    await redis_binary_client.aclose()
+    await async_engine.dispose()
+    mark_process_dead()
+    await logger.complete()
+
+
+SAMPLED_PATHS = frozenset(settings.LOG_SAMPLED_PATHS)
+SAMPLED_PREFIXES = tuple(settings.LOG_SAMPLED_PREFIXES)
+
+
+def route_template(request: Request) -> str:
+    # Шаблон пути (/api/v1/processes/{process_id}), чтобы метки метрик не разрастались
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+# Middleware для логирования запросов и метрик времени выполнения
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    start_time = time.perf_counter()
+    in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(request.method)
+    in_flight.inc()
     
     try:
         response = await call_next(request)
-        process_time = time.time() - start_time
-        logger.info(f"Response: {request.method} {request.url.path} - Status: {response.status_code} - Time: {process_time:.4f}s")
-        return response
     except Exception as e:
         logger.exception(f"Error processing request: {request.method} {request.url.path} - {e}")
+        HTTP_REQUEST_DURATION.labels(request.method, route_template(request), "500").observe(
+            time.perf_counter() - start_time
+        )
         return JSONResponse(
             status_code=500, 
             content={"detail": "Internal Server Error"}
         )
+    finally:
+        in_flight.dec()
+    
+    HTTP_REQUEST_DURATION.labels(request.method, route_template(request), str(response.status_code)).observe(
+        time.perf_counter() - start_time
+    )
+    
+    # Частые служебные запросы логируем выборочно, ошибки - всегда
+    path = request.url.path
+    sampled = path in SAMPLED_PATHS or path.startswith(SAMPLED_PREFIXES)
+    if response.status_code < 400 and sampled and random.random() >= settings.LOG_SAMPLE_RATE:
+        return response
+    
+    process_time = time.perf_counter() - start_time
+    logger.bind(
+        method=request.method,
+        path=path,
+        status=response.status_code,
+        duration_ms=round(process_time * 1000, 2),
+        client=request.client.host if request.client else "unknown"
+    ).info(f"{request.method} {path} - Status: {response.status_code} - Time: {process_time:.4f}s")
+    return response
 
 
 # Подключаем API роутеры
@@ -88,15 +179,32 @@ async def health_check():
     Endpoint для проверки работоспособности API
     """
     # Проверяем подключение к Redis
-    redis_status = "ok" if redis_client and redis_client.ping() else "not connected"
+    try:
+        redis_status = "ok" if await redis_client.ping() else "not connected"
+    except Exception:
+        redis_status = "not connected"
     
     return {
         "status": "ok",
         "api_version": "1.0.0",
-        "redis": redis_status
+        "redis": redis_status,
+        # Предохранители запросов к 1С (этого процесса): closed, half_open, open
+        "onec": {
+            "status": "degraded" if onec_breakers.degraded() else "ok",
+            "breakers": onec_breakers.snapshot()
+        }
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Метрики для Prometheus: время запросов к API, 1С и БД, кэш, пул соединений.
+    Обычная (не async) функция: чтение файлов multiprocess идёт в пуле потоков.
+    """
+    return Response(render_metrics(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
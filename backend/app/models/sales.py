@@ -0,0 +1,123 @@
+from sqlalchemy import Column, String, Boolean, DateTime, Float, Index, Integer, SmallInteger
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class SaleLine(Base):
+    """
+    Строка чека, синхронизированная из 1С.
+    Таблица секционирована по месяцам sold_at (секции создаёт синхронизация),
+    поэтому sold_at входит в первичный ключ.
+    """
+    __tablename__ = "sales_lines"
+
+    line_id = Column(String, primary_key=True)
+    sold_at = Column(DateTime, primary_key=True)  # местное время 1С без смещения
+    receipt_id = Column(String, nullable=False)
+    store_id = Column(String, nullable=False)
+    store_name = Column(String)
+    warehouse_id = Column(String)
+    category_id = Column(String)
+    product_id = Column(String, nullable=False)
+    product_name = Column(String)
+    quantity = Column(Float, nullable=False)
+    price = Column(Float, nullable=False)
+    total = Column(Float, nullable=False)
+    is_deleted = Column(Boolean, nullable=False, default=False)  # строка удалена или чек отменён в 1С
+    changed_at = Column(DateTime, nullable=False)  # время изменения в 1С (отметка синхронизации)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Поиск часов, изменённых после последнего пересчёта итогов
+        Index("ix_sales_lines_synced_at", synced_at),
+        Index("ix_sales_lines_sold_at", sold_at),
+        Index("ix_sales_lines_store_sold_at", store_id, sold_at),
+        Index("ix_sales_lines_warehouse_sold_at", warehouse_id, sold_at),
+        Index("ix_sales_lines_category_sold_at", category_id, sold_at),
+        # Поиск строки при переносе в другой месяц (секцию)
+        Index("ix_sales_lines_line_id", line_id),
+        {"postgresql_partition_by": "RANGE (sold_at)"},
+    )
+
+
+class SalesSyncState(Base):
+    """
+    Состояние инкрементальной синхронизации продаж из 1С.
+
+    Отметка (changed_at, line_id) - последняя загруженная строка ленты изменений;
+    [synced_from, synced_until) - интервал sold_at, полностью загруженный в таблицу;
+    итоги (sales_rollup_*) посчитаны по строкам до rolled_until с учётом изменений
+    строк, записанных до rolled_at (synced_at).
+    """
+    __tablename__ = "sales_sync_state"
+
+    source = Column(String, primary_key=True)  # "sales"
+    changed_at = Column(DateTime)
+    line_id = Column(String)
+    synced_from = Column(DateTime)
+    synced_until = Column(DateTime)
+    rolled_until = Column(DateTime)
+    rolled_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# Уровни детализации итогов: магазин всегда, склад и категория - по битам
+ROLLUP_WAREHOUSE = 2
+ROLLUP_CATEGORY = 1
+
+
+class SalesRollupHourly(Base):
+    """
+    Итоги продаж по часам на четырёх уровнях детализации (level): магазин,
+    магазин и склад, магазин и категория, магазин, склад и категория.
+    Измерение, не входящее в уровень, хранится пустой строкой.
+    Чеки считаются без повторов внутри строки итогов; чек целиком в одном
+    часе, поэтому по часам их можно суммировать.
+    """
+    __tablename__ = "sales_rollup_hourly"
+
+    level = Column(SmallInteger, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # начало часа
+    store_id = Column(String, primary_key=True)
+    warehouse_id = Column(String, primary_key=True, default="")
+    category_id = Column(String, primary_key=True, default="")
+    total = Column(Float, nullable=False)
+    quantity = Column(Float, nullable=False)
+    lines = Column(Integer, nullable=False)
+    receipts = Column(Integer, nullable=False)
+
+
+class SalesRollupDaily(Base):
+    """
+    Те же итоги по дням (суммы часовых); день, в котором проходит
+    rolled_until, содержит только часы до него
+    """
+    __tablename__ = "sales_rollup_daily"
+
+    level = Column(SmallInteger, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # начало дня
+    store_id = Column(String, primary_key=True)
+    warehouse_id = Column(String, primary_key=True, default="")
+    category_id = Column(String, primary_key=True, default="")
+    total = Column(Float, nullable=False)
+    quantity = Column(Float, nullable=False)
+    lines = Column(Integer, nullable=False)
+    receipts = Column(Integer, nullable=False)
+
+
+class SalesRollupProduct(Base):
+    """
+    Продажи товаров по магазинам за день (для списка товаров в ответе)
+    """
+    __tablename__ = "sales_rollup_products"
+
+    day = Column(DateTime, primary_key=True)
+    store_id = Column(String, primary_key=True)
+    warehouse_id = Column(String, primary_key=True, default="")
+    category_id = Column(String, primary_key=True, default="")
+    product_id = Column(String, primary_key=True)
+    store_name = Column(String)
+    product_name = Column(String)
+    total = Column(Float, nullable=False)
+    quantity = Column(Float, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -35,6 +35,17 @@ class Notification(Base):
     
     # Отношения
     user = relationship("User", back_populates="notifications")
+    
+    # Индексы для keyset-пагинации списка уведомлений пользователя:
+    # порядок ключей совпадает с ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index("ix_notifications_user_created", user_id, created_at.desc(), id.desc()),
+        Index(
+            "ix_notifications_user_unread_created",
+            user_id, created_at.desc(), id.desc(),
+            postgresql_where=is_read == False
+        ),
+    )
 
 
 class UserAction(Base):
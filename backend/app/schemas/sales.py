@@ -8,6 +8,28 @@ class SalesFilter(BaseModel):
     store_id: Optional[str] = None
     warehouse_id: Optional[str] = None
     category_id: Optional[str] = None
+    group_by: Optional[str] = None  # store, warehouse, category - серии графика по группам
+
+
+class SalesLine(BaseModel):
+    """
+    Строка чека из 1С (GET sales с date_from/date_to), исходные данные агрегации.
+    1С отдаёт строки списком или колонками (format=columns: {поле: [значения]});
+    ответ разбирается в массивы напрямую, без проверки каждой строки моделью.
+    sold_at - местное время без смещения.
+    """
+    line_id: str
+    receipt_id: str
+    sold_at: datetime
+    store_id: str
+    store_name: Optional[str] = None
+    warehouse_id: Optional[str] = None
+    category_id: Optional[str] = None
+    product_id: str
+    product_name: str
+    quantity: float
+    price: float
+    total: float
 
 
 class SalesItem(BaseModel):
@@ -46,6 +68,18 @@ class OneCProcessResponse(BaseModel):
     process_id: Optional[str] = None
 
 
+class ProcessStatus(BaseModel):
+    process_id: str
+    process_name: str
+    status: str  # pending, running, completed, failed
+    attempts: int = 0
+    message: Optional[str] = None
+    parameters: Optional[Dict[str, Any]] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
 class StoreInfo(BaseModel):
     id: str
     name: str
@@ -64,3 +98,14 @@ class StoresResponse(BaseModel):
 
 class WarehousesResponse(BaseModel):
     warehouses: List[WarehouseInfo]
+
+
+class SalesBatchItem(BaseModel):
+    filter: SalesFilter
+    sales: Optional[SalesResponse] = None
+    warehouses: Optional[List[WarehouseInfo]] = None
+    error: Optional[str] = None
+
+
+class SalesBatchResponse(BaseModel):
+    results: List[SalesBatchItem]
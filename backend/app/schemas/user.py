@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 
@@ -65,7 +65,13 @@ class Notification(NotificationInDBBase):
 
 class NotificationList(BaseModel):
     notifications: List[Notification]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None  # курсор следующей страницы (keyset-пагинация)
+
+
+class UnreadCounts(BaseModel):
     total: int
+    categories: Dict[str, int]
 
 
 class UserActionCreate(BaseModel):
@@ -0,0 +1,142 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal
+from app.models.user import UserAction
+
+
+class AuditLogWriter:
+    """
+    Буферизованная запись действий пользователей (UserAction).
+
+    record() только кладёт запись в память; фоновая задача сбрасывает буфер
+    одним многострочным INSERT по таймеру или при наполнении пакета,
+    поэтому аудит не добавляет обращений к БД в обработку запроса.
+    Если пакет не записался, строки пишутся по одной: отвергнутые БД
+    (нарушение ограничения, неверные данные) логируются и отбрасываются,
+    остальные записываются.
+    """
+
+    def __init__(self):
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.rejected = 0
+
+    def record(
+        self,
+        user_id: int,
+        action_type: str,
+        action_details: Optional[str] = None,
+        ip_address: Optional[str] = None
+    ) -> None:
+        if len(self._buffer) >= settings.AUDIT_BUFFER_LIMIT:
+            # БД не успевает или недоступна - не растим память бесконечно
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append({
+            "user_id": user_id,
+            "action_type": action_type,
+            "action_details": action_details,
+            "ip_address": ip_address,
+            "created_at": datetime.now(timezone.utc)
+        })
+        if len(self._buffer) >= settings.AUDIT_BATCH_SIZE:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """
+        Запуск фонового сброса буфера (вызывается при старте приложения)
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Остановка с финальным сбросом буфера (вызывается при остановке приложения)
+        """
+        if self._task is not None:
+            # Не отменяем задачу: отмена посреди INSERT теряла бы забранный пакет
+            self._stopping = True
+            self._wakeup.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._stopping = False
+        while self._buffer:
+            if not await self.flush():
+                break
+
+    async def flush(self) -> bool:
+        """
+        Запись накопленных действий пакетами; False, если запись не удалась
+        """
+        while self._buffer:
+            # Пакет забирается из буфера до записи: record() может вытеснять
+            # старые строки, пока идёт INSERT
+            batch = [self._buffer.popleft() for _ in range(min(len(self._buffer), settings.AUDIT_BATCH_SIZE))]
+            try:
+                written = await self._insert(batch)
+            except asyncio.CancelledError:
+                # Отмена посреди записи: транзакция откатится, пакет возвращается в буфер
+                self._buffer.extendleft(reversed(batch))
+                raise
+            if not written:
+                self._buffer.extendleft(reversed(batch))
+                while len(self._buffer) > settings.AUDIT_BUFFER_LIMIT:
+                    self._buffer.popleft()
+                    self.dropped += 1
+                return False
+        return True
+
+    async def _insert(self, batch: List[Dict[str, Any]]) -> bool:
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(UserAction), batch)
+                await db.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"Не удалось записать {len(batch)} действий пользователей пакетом: {e}")
+            return await self._insert_rows(batch)
+
+    async def _insert_rows(self, batch: List[Dict[str, Any]]) -> bool:
+        """
+        Запись пакета по одной строке (каждая в своей точке сохранения);
+        False, если БД недоступна - тогда пакет остаётся в буфере целиком
+        """
+        try:
+            async with AsyncSessionLocal() as db:
+                for row in batch:
+                    try:
+                        async with db.begin_nested():
+                            await db.execute(insert(UserAction), [row])
+                    except (IntegrityError, DataError) as e:
+                        self.rejected += 1
+                        logger.error(f"Действие пользователя отвергнуто БД: {row}: {e.orig}")
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Не удалось записать {len(batch)} действий пользователей: {e}")
+            return False
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.AUDIT_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self._stopping:
+                return
+
+
+audit_log = AuditLogWriter()
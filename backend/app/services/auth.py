@@ -1,17 +1,74 @@
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
 from jose import JWTError, jwt
+from loguru import logger
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
 from app.db.base import get_db
+from app.db.redis import redis_client
 from app.models.user import User
 from app.schemas.user import TokenData
+from app.services.user_cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/token")
 
+# Секретный ключ проверки initData: HMAC-SHA256 токена бота с ключом "WebAppData",
+# вычисляется один раз при старте
+TELEGRAM_SECRET_KEY: Optional[bytes] = (
+    hmac.new(b"WebAppData", settings.TELEGRAM_BOT_TOKEN.encode(), hashlib.sha256).digest()
+    if settings.TELEGRAM_BOT_TOKEN else None
+)
+TELEGRAM_CLOCK_SKEW = 60  # с, допустимое опережение auth_date
+
+
+class ClaimsCache:
+    """
+    Ограниченный LRU проверенных токенов: подпись HS256 и срок действия
+    проверяются один раз, дальше claims берутся из памяти процесса
+    (не дольше ttl и не дольше срока действия самого токена)
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return claims
+
+    def set(self, token: str, claims: Dict[str, Any]) -> None:
+        expires_at = min(time.time() + self.ttl, claims.get("exp", float("inf")))
+        self._entries[token] = (claims, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+claims_cache = ClaimsCache(settings.AUTH_CLAIMS_CACHE_SIZE, settings.AUTH_CLAIMS_CACHE_TTL)
+
+# telegram_id пользователя по умолчанию (пока авторизация отключена)
+_default_telegram_id: Optional[str] = None
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -24,33 +81,179 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def verify_telegram_data(init_data: str) -> dict:
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """
+    Проверка JWT и получение claims (с кэшированием в памяти процесса).
+    Бросает JWTError для недействительного или просроченного токена.
+    """
+    claims = claims_cache.get(token)
+    if claims is not None:
+        CACHE_REQUESTS.labels("jwt", "local_hit").inc()
+        return claims
+
+    CACHE_REQUESTS.labels("jwt", "miss").inc()
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    if not claims.get("sub"):
+        raise JWTError("Token has no subject")
+    claims_cache.set(token, claims)
+    return claims
+
+
+def verify_telegram_data(init_data: str, now: Optional[float] = None) -> dict:
     """
-    Верификация данных от Telegram Mini App.
-    В реальном приложении здесь должна быть проверка подписи и валидация данных.
+    Верификация данных от Telegram Mini App
+    (https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app).
+    Поля пользователя из JSON-поля user поднимаются на верхний уровень (id, username, ...).
+    Бросает ValueError, если подпись неверна или данные устарели.
+    Без TELEGRAM_BOT_TOKEN подпись не проверяется (разработка с имитацией Telegram).
     """
-    # TODO: Реализовать проверку данных Telegram
-    # https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app
+    params = dict(parse_qsl(init_data or "", keep_blank_values=True))
+    
+    if TELEGRAM_SECRET_KEY is not None:
+        received_hash = params.pop("hash", "")
+        data_check_string = "\n".join(f"{key}={params[key]}" for key in sorted(params))
+        expected_hash = hmac.new(TELEGRAM_SECRET_KEY, data_check_string.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected_hash, received_hash):
+            raise ValueError("Invalid Telegram data signature")
+        
+        try:
+            auth_date = int(params.get("auth_date", ""))
+        except ValueError:
+            raise ValueError("Invalid Telegram auth_date")
+        age = (now if now is not None else time.time()) - auth_date
+        if age > settings.TELEGRAM_AUTH_MAX_AGE or age < -TELEGRAM_CLOCK_SKEW:
+            raise ValueError("Telegram data is expired")
     
-    # Для примера просто разбираем строку параметров и возвращаем словарь
-    # В реальном приложении должна быть полная проверка подписи!
-    params = {}
-    if init_data:
-        parts = init_data.split('&')
-        for part in parts:
-            if '=' in part:
-                key, value = part.split('=', 1)
-                params[key] = value
+    if "user" in params:
+        try:
+            user = json.loads(params["user"])
+        except ValueError:
+            raise ValueError("Invalid Telegram user data")
+        if not isinstance(user, dict):
+            raise ValueError("Invalid Telegram user data")
+        params.update({key: value for key, value in user.items() if value is not None})
+    if "id" in params:
+        params["id"] = str(params["id"])
     
     return params
 
 
+def sign_telegram_data(bot_token: str, fields: Dict[str, str]) -> str:
+    """
+    Формирование подписанной initData, как это делает Telegram (для скриптов и отладки)
+    """
+    secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    data_check_string = "\n".join(f"{key}={fields[key]}" for key in sorted(fields))
+    signature = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode({**fields, "hash": signature})
+
+
+async def verify_telegram_data_cached(init_data: str) -> dict:
+    """
+    verify_telegram_data с кэшем проверенных initData в Redis: повторный вход
+    с теми же данными не пересчитывает подпись. Запись живёт не дольше,
+    чем данные остаются действительными.
+    """
+    key = f"auth:initdata:{hashlib.sha256(init_data.encode()).hexdigest()}"
+    try:
+        cached = await redis_client.get(key)
+    except Exception as e:
+        logger.warning(f"Redis недоступен при проверке initData: {e}")
+        cached = None
+    if cached:
+        CACHE_REQUESTS.labels("initdata", "redis_hit").inc()
+        return json.loads(cached)
+    
+    CACHE_REQUESTS.labels("initdata", "miss").inc()
+    telegram_data = verify_telegram_data(init_data)
+    
+    ttl = settings.TELEGRAM_INITDATA_CACHE_TTL
+    if TELEGRAM_SECRET_KEY is not None:
+        ttl = min(ttl, int(telegram_data["auth_date"]) + settings.TELEGRAM_AUTH_MAX_AGE - int(time.time()))
+    if ttl > 0:
+        try:
+            await redis_client.set(key, json.dumps(telegram_data), ex=ttl)
+        except Exception as e:
+            logger.warning(f"Redis недоступен при записи initData: {e}")
+    
+    return telegram_data
+
+
+def telegram_profile(telegram_data: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Имя пользователя и полное имя из проверенных данных Telegram
+    """
+    username = telegram_data.get("username") or ""
+    full_name = " ".join(
+        part for part in (telegram_data.get("first_name"), telegram_data.get("last_name")) if part
+    )
+    return username, full_name
+
+
+async def upsert_telegram_user(db: AsyncSession, telegram_id: str, username: str, full_name: str) -> User:
+    """
+    Создание пользователя (с ролью employee) или обновление его имени
+    одним INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING
+    """
+    stmt = pg_insert(User).values(
+        telegram_id=telegram_id,
+        username=username,
+        full_name=full_name,
+        role="employee",
+        is_active=True
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={
+            "username": stmt.excluded.username,
+            "full_name": stmt.excluded.full_name,
+            "updated_at": func.now()
+        }
+    ).returning(User)
+    
+    user = await db.scalar(stmt, execution_options={"populate_existing": True})
+    await db.commit()
+    await user_cache.set(user)
+    return user
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
+    """
+    Текущий пользователь. Токен и пользователь берутся из кэшей,
+    поэтому на повторных запросах обращений к БД нет.
+    """
+    if not settings.AUTH_ENABLED:
+        return await get_default_user(db)
+    
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        claims = decode_access_token(token)
+    except JWTError:
+        raise credentials_exception
+    
+    user = await user_cache.get(db, claims["sub"])
+    if user is None:
+        raise credentials_exception
+    return user
+
+
+async def get_default_user(db: AsyncSession) -> User:
+    global _default_telegram_id
+    
+    if _default_telegram_id is not None:
+        user = await user_cache.get(db, _default_telegram_id)
+        if user is not None:
+            return user
+    
     # Всегда возвращаем некий базовый пользовательский объект, авторизация отключена
-    user = db.query(User).filter(User.id == 1).first()
+    user = await db.get(User, 1)
     
     # Если пользователя нет в базе, создаем его
     if not user:
@@ -63,23 +266,28 @@ async def get_current_user(
             is_active=True
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     
+    _default_telegram_id = user.telegram_id
+    await user_cache.set(user)
     return user
 
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
-    # Всегда считаем пользователя активным
+    # Пока авторизация отключена, всегда считаем пользователя активным
+    if settings.AUTH_ENABLED and not current_user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
     return current_user
 
 
 def check_user_role(required_roles: list):
     """
-    Декоратор для проверки роли пользователя (авторизация отключена)
+    Декоратор для проверки роли пользователя (при отключённой авторизации доступ разрешён всегда)
     """
-    async def dependency(current_user: User = Depends(get_current_user)):
-        # Всегда разрешаем доступ
+    async def dependency(current_user: User = Depends(get_current_active_user)):
+        if settings.AUTH_ENABLED and current_user.role not in required_roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
         return current_user
     return dependency
 
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+from app.db.redis import redis_client
+
+
+class CacheService:
+    """
+    Двухуровневый read-through кэш: LRU в памяти процесса перед Redis.
+
+    Записи хранятся вместе со временем загрузки. В пределах ttl запись свежая,
+    ещё stale_ttl секунд она отдаётся как устаревшая с фоновым обновлением
+    (stale-while-revalidate), после чего загружается заново.
+    """
+
+    def __init__(self, prefix: str, max_size: int, local_ttl: float):
+        self.prefix = prefix
+        self.max_size = max_size
+        # Локальная копия живёт не дольше local_ttl, чтобы инвалидация из другого
+        # воркера uvicorn доходила до этого процесса в ограниченное время
+        self.local_ttl = local_ttl
+        self._lru: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def make_key(self, method: str, params: Optional[Dict[str, Any]] = None) -> str:
+        return f"{self.prefix}:{method}:{json.dumps(params or {}, sort_keys=True, default=str)}"
+
+    async def get_or_load(
+        self,
+        method: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        stale_ttl: float = 0,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        """
+        Получение значения из кэша или через loader при промахе.
+        Исключения loader'а пробрасываются и в кэш не попадают.
+        """
+        key = self.make_key(method, params)
+        now = time.time()
+
+        entry = self._lru.get(key)
+        if entry is not None:
+            value, loaded_at, cached_at = entry
+            if now - cached_at < self.local_ttl:
+                age = now - loaded_at
+                if age < ttl:
+                    self._lru.move_to_end(key)
+                    CACHE_REQUESTS.labels(self.prefix, "local_hit").inc()
+                    return value
+                if age < ttl + stale_ttl:
+                    self._lru.move_to_end(key)
+                    self._schedule_refresh(key, loader, ttl, stale_ttl)
+                    CACHE_REQUESTS.labels(self.prefix, "stale_hit").inc()
+                    return value
+            del self._lru[key]
+
+        stored = await self._redis_get(key)
+        if stored is not None:
+            value, loaded_at = stored["v"], stored["t"]
+            age = now - loaded_at
+            if age < ttl + stale_ttl:
+                self._remember(key, value, loaded_at)
+                if age >= ttl:
+                    self._schedule_refresh(key, loader, ttl, stale_ttl)
+                    CACHE_REQUESTS.labels(self.prefix, "stale_hit").inc()
+                else:
+                    CACHE_REQUESTS.labels(self.prefix, "redis_hit").inc()
+                return value
+
+        CACHE_REQUESTS.labels(self.prefix, "miss").inc()
+        return await self._load(key, loader, ttl, stale_ttl)
+
+    async def put(self, method: str, value: Any, expire: float, params: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Запись значения без загрузки (хранится expire секунд)
+        """
+        key = self.make_key(method, params)
+        loaded_at = time.time()
+        self._remember(key, value, loaded_at)
+        await self._redis_set(key, value, loaded_at, expire)
+
+    async def peek(self, method: str, params: Optional[Dict[str, Any]] = None) -> Optional[Tuple[Any, float]]:
+        """
+        Сохранённое значение и время его загрузки независимо от возраста; None - нет.
+        Сначала Redis (там может быть более свежее значение другого воркера),
+        без Redis - копия в памяти процесса.
+        """
+        key = self.make_key(method, params)
+        stored = await self._redis_get(key)
+        if stored is not None:
+            return stored["v"], stored["t"]
+        entry = self._lru.get(key)
+        if entry is not None and time.time() - entry[2] < self.local_ttl:
+            return entry[0], entry[1]
+        return None
+
+    async def invalidate(self, method: Optional[str] = None) -> None:
+        """
+        Сброс кэша метода (или всего префикса, если метод не указан)
+        """
+        pattern = f"{self.prefix}:{method}:" if method else f"{self.prefix}:"
+        for key in [k for k in self._lru if k.startswith(pattern)]:
+            del self._lru[key]
+
+        try:
+            keys = [key async for key in redis_client.scan_iter(match=f"{pattern}*", count=500)]
+            if keys:
+                await redis_client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Не удалось сбросить кэш {pattern} в Redis: {e}")
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float) -> Any:
+        value = await loader()
+        loaded_at = time.time()
+        self._remember(key, value, loaded_at)
+        await self._redis_set(key, value, loaded_at, ttl + stale_ttl)
+        return value
+
+    def _remember(self, key: str, value: Any, loaded_at: float) -> None:
+        self._lru[key] = (value, loaded_at, time.time())
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float) -> None:
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                await self._load(key, loader, ttl, stale_ttl)
+            except Exception as e:
+                logger.warning(f"Фоновое обновление кэша {key} не удалось: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _redis_get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Redis недоступен при чтении кэша {key}: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def _redis_set(self, key: str, value: Any, loaded_at: float, expire: float) -> None:
+        try:
+            await redis_client.set(key, json.dumps({"v": value, "t": loaded_at}, default=str), ex=max(1, int(expire)))
+        except Exception as e:
+            logger.warning(f"Redis недоступен при записи кэша {key}: {e}")
+
+
+# Кэш справочных данных 1С
+onec_cache = CacheService(
+    prefix="onec",
+    max_size=settings.ONEC_CACHE_LRU_SIZE,
+    local_ttl=settings.ONEC_CACHE_LOCAL_TTL
+)
+
+# Последние удачные ответы 1С (для работы при недоступной 1С)
+onec_last_good = CacheService(
+    prefix="onec_last_good",
+    max_size=settings.ONEC_LAST_GOOD_LRU_SIZE,
+    local_ttl=settings.ONEC_LAST_GOOD_TTL
+)
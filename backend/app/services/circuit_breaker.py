@@ -0,0 +1,183 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import ONEC_BREAKER_STATE
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """
+    Запрос не отправлен: предохранитель endpoint'а разомкнут
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"1C endpoint {name} is unavailable (circuit open), retry in {retry_after:.0f} s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Предохранитель одного endpoint'а 1С с адаптивным таймаутом.
+
+    После failure_threshold ошибок подряд (таймаут, обрыв соединения, 5xx)
+    размыкается: запросы сразу получают CircuitOpenError. Через open_seconds
+    пропускается один пробный запрос (half-open): успех замыкает предохранитель,
+    ошибка снова размыкает его на вдвое больший срок (не больше open_max).
+
+    Таймаут запроса - percentile времени последних успешных ответов,
+    умноженный на multiplier, в пределах [min_timeout, max_timeout]. Пока
+    ответов меньше min_samples, и для пробного запроса - max_timeout: если
+    1С стала отвечать медленнее, удачная проба добавит в выборку новое время.
+    Состояние своё у каждого процесса uvicorn.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        open_seconds: float,
+        open_max: float,
+        percentile: float,
+        multiplier: float,
+        min_timeout: float,
+        max_timeout: float,
+        samples: int = 200,
+        min_samples: int = 20
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.open_max = open_max
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_for = open_seconds
+        self.rejected = 0
+        self._probing = False
+        self._latencies: Deque[float] = deque(maxlen=samples)
+
+    def check(self) -> None:
+        """
+        CircuitOpenError, если запрос сейчас не будет пропущен (пробный запрос не занимается)
+        """
+        if self.state == OPEN:
+            retry_after = self.opened_at + self.open_for - time.monotonic()
+            if retry_after > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, retry_after)
+        elif self.state == HALF_OPEN and self._probing:
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.open_seconds)
+
+    def before_call(self) -> float:
+        """
+        Разрешение на запрос; возвращает его таймаут или бросает CircuitOpenError
+        """
+        self.check()
+        if self.state == OPEN:
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            self._probing = True
+            return self.max_timeout
+        return self.timeout()
+
+    def timeout(self) -> float:
+        if len(self._latencies) < self.min_samples:
+            return self.max_timeout
+        latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return min(self.max_timeout, max(self.min_timeout, latencies[index] * self.multiplier))
+
+    def record_success(self, duration: Optional[float] = None) -> None:
+        if duration is not None:
+            self._latencies.append(duration)
+        self.failures = 0
+        if self.state != CLOSED:
+            self._probing = False
+            self.open_for = self.open_seconds
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self._probing = False
+            self.open_for = min(self.open_for * 2, self.open_max)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def release(self) -> None:
+        """
+        Запрос отменён до результата - пробный запрос можно повторить
+        """
+        self._probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        result = {
+            "state": self.state,
+            "failures": self.failures,
+            "timeout": round(self.timeout(), 3),
+            "samples": len(self._latencies),
+            "rejected": self.rejected
+        }
+        if self.state == OPEN:
+            result["retry_after"] = round(max(0.0, self.opened_at + self.open_for - time.monotonic()), 1)
+        return result
+
+    def _open(self) -> None:
+        self.opened_at = time.monotonic()
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        ONEC_BREAKER_STATE.labels(self.name).set(STATE_VALUES[state])
+
+
+class CircuitBreakers:
+    """
+    Предохранители по endpoint'ам 1С (создаются при первом запросе)
+    """
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> Optional[CircuitBreaker]:
+        if not settings.ONEC_BREAKER_ENABLED:
+            return None
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=settings.ONEC_BREAKER_FAILURES,
+                open_seconds=settings.ONEC_BREAKER_OPEN_SECONDS,
+                open_max=settings.ONEC_BREAKER_OPEN_MAX,
+                percentile=settings.ONEC_TIMEOUT_PERCENTILE,
+                multiplier=settings.ONEC_TIMEOUT_MULTIPLIER,
+                min_timeout=settings.ONEC_TIMEOUT_MIN,
+                max_timeout=settings.ONEC_READ_TIMEOUT
+            )
+        return breaker
+
+    def reset(self) -> None:
+        self._breakers.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in sorted(self._breakers.items())}
+
+    def degraded(self) -> bool:
+        return any(breaker.state != CLOSED for breaker in self._breakers.values())
+
+
+onec_breakers = CircuitBreakers()
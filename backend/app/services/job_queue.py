@@ -0,0 +1,395 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.db.redis import redis_client
+from app.schemas.sales import OneCProcessRequest
+from app.services.onec_service import onec_service
+
+DEFAULT_QUEUE = "default"
+FINAL_STATUSES = ("completed", "failed")
+RETRIES_KEY = "jobs:retries"
+WORKERS_KEY = "jobs:workers"
+REAP_LOCK_KEY = "jobs:reap-lock"
+PROCESS_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Возврат задания из списка исполнителя в начало очереди. Задание, которое
+# уже забрал другой (LREM вернул 0) или которое завершено, не возвращается
+REQUEUE = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+local status = redis.call('HGET', KEYS[3], 'status')
+if not status or status == 'completed' or status == 'failed' then
+    return 0
+end
+redis.call('HSET', KEYS[3], 'status', 'pending', 'updated_at', ARGV[2])
+redis.call('RPUSH', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Перенос наступивших повторов из ZSET в очереди; элемент - "<очередь>|<id>"
+DUE_RETRIES = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    local sep = string.find(member, '|', 1, true)
+    redis.call('LPUSH', ARGV[3] .. string.sub(member, 1, sep - 1), string.sub(member, sep + 1))
+end
+return #due
+"""
+
+# Возврат в очередь незавершённого задания, которого нет ни в очереди, ни
+# в повторах, ни в списке какого-либо исполнителя (ZSET jobs:workers) и
+# которое давно не обновлялось. Проверка и возврат - одним шагом, поэтому
+# задание, взятое исполнителем во время проверки, не попадёт в очередь дважды
+REQUEUE_ORPHAN = """
+local status = redis.call('HGET', KEYS[1], 'status')
+if not status or status == 'completed' or status == 'failed' then
+    return 0
+end
+local updated_at = redis.call('HGET', KEYS[1], 'updated_at')
+if updated_at and updated_at > ARGV[2] then
+    return 0
+end
+if redis.call('LPOS', KEYS[2], ARGV[1]) or redis.call('ZSCORE', KEYS[3], ARGV[3]) then
+    return 0
+end
+for _, processing in ipairs(redis.call('ZRANGE', KEYS[4], 0, -1)) do
+    if redis.call('LPOS', processing, ARGV[1]) then
+        return 0
+    end
+end
+redis.call('HSET', KEYS[1], 'status', 'pending', 'updated_at', ARGV[4])
+redis.call('RPUSH', KEYS[2], ARGV[1])
+return 1
+"""
+
+
+class JobQueue:
+    """
+    Очередь фоновых обработок 1С на Redis.
+
+    Задание хранится в хэше jobs:<process_id>, id ждут выполнения в списках
+    jobs:queue:<тип>. На каждый тип обработки с собственным лимитом
+    (JOB_TYPE_CONCURRENCY) заводится своя очередь и столько же исполнителей,
+    остальные типы выполняются из общей очереди. Лимиты действуют в пределах
+    одного процесса uvicorn.
+
+    Исполнитель забирает id через BLMOVE в свой список jobs:processing:<исполнитель>
+    и удаляет его оттуда только после завершения; списки исполнителей
+    перечислены в ZSET jobs:workers (score - последнее обращение к очереди).
+    Если процесс упал или был перезапущен, задание остаётся в этом списке,
+    и периодическая проверка возвращает его в очередь через JOB_VISIBILITY_TIMEOUT. Повторы после
+    ошибки ждут в ZSET jobs:retries (score - время повтора), а не в памяти
+    процесса, поэтому переживают перезапуск.
+    """
+
+    def __init__(self):
+        self._tasks: List[asyncio.Task] = []
+        self._hooks: Dict[str, List[Callable[[Dict[str, Any]], Awaitable[None]]]] = {}
+        self._handlers: Dict[str, Callable[[OneCProcessRequest], Awaitable[Dict[str, Any]]]] = {}
+        self._requeue_script = redis_client.register_script(REQUEUE)
+        self._due_script = redis_client.register_script(DUE_RETRIES)
+        self._orphan_script = redis_client.register_script(REQUEUE_ORPHAN)
+
+    @staticmethod
+    def job_key(process_id: str) -> str:
+        return f"jobs:{process_id}"
+
+    @staticmethod
+    def queue_key(queue: str) -> str:
+        return f"jobs:queue:{queue}"
+
+    @staticmethod
+    def processing_key(worker: str) -> str:
+        return f"jobs:processing:{worker}"
+
+    @staticmethod
+    def dedup_key(process_request: OneCProcessRequest) -> str:
+        payload = json.dumps(process_request.model_dump(), sort_keys=True, default=str)
+        return f"jobs:dedup:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    @staticmethod
+    def queue_for(process_name: str) -> str:
+        return process_name if process_name in settings.JOB_TYPE_CONCURRENCY else DEFAULT_QUEUE
+
+    def on_complete(self, process_name: str, hook: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        """
+        Регистрация обработчика успешного завершения обработки данного типа
+        """
+        self._hooks.setdefault(process_name, []).append(hook)
+
+    def register(self, process_name: str, handler: Callable[[OneCProcessRequest], Awaitable[Dict[str, Any]]]) -> None:
+        """
+        Выполнение обработки данного типа в приложении вместо вызова 1С.
+        Обработчик возвращает результат в том же виде, что run_process.
+        """
+        self._handlers[process_name] = handler
+
+    async def enqueue(self, process_request: OneCProcessRequest) -> Dict[str, Any]:
+        """
+        Постановка обработки в очередь.
+        Если такая же обработка уже ждёт или выполняется, возвращается она.
+        """
+        process_id = uuid.uuid4().hex
+        dedup_key = self.dedup_key(process_request)
+
+        if not await redis_client.set(dedup_key, process_id, nx=True, ex=settings.JOB_TTL):
+            existing_id = await redis_client.get(dedup_key)
+            existing = await self.get(existing_id) if existing_id else None
+            if existing and existing["status"] not in FINAL_STATUSES:
+                logger.info(f"Обработка {process_request.process_name} уже в очереди: {existing_id}")
+                return existing
+            await redis_client.set(dedup_key, process_id, ex=settings.JOB_TTL)
+
+        now = datetime.utcnow().isoformat()
+        job = {
+            "process_id": process_id,
+            "process_name": process_request.process_name,
+            "parameters": json.dumps(process_request.parameters or {}, default=str),
+            "status": "pending",
+            "attempts": 0,
+            "dedup_key": dedup_key,
+            "created_at": now,
+            "updated_at": now
+        }
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(self.job_key(process_id), mapping=job)
+            pipe.expire(self.job_key(process_id), settings.JOB_TTL)
+            pipe.lpush(self.queue_key(self.queue_for(process_request.process_name)), process_id)
+            await pipe.execute()
+
+        logger.info(f"Обработка {process_request.process_name} поставлена в очередь: {process_id}")
+        return self._decode(job)
+
+    async def get(self, process_id: str) -> Optional[Dict[str, Any]]:
+        # Другие ключи jobs:* (очереди, повторы) - не задания
+        if not PROCESS_ID.match(process_id):
+            return None
+        job = await redis_client.hgetall(self.job_key(process_id))
+        return self._decode(job) if job else None
+
+    async def start(self) -> None:
+        """
+        Запуск исполнителей, переноса повторов и проверки зависших заданий
+        (вызывается при старте приложения)
+        """
+        if not settings.JOB_WORKERS_ENABLED or self._tasks:
+            return
+
+        limits = dict(settings.JOB_TYPE_CONCURRENCY)
+        limits[DEFAULT_QUEUE] = settings.JOB_CONCURRENCY
+        prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        for queue, limit in limits.items():
+            for number in range(limit):
+                worker = f"{prefix}:{queue}:{number}"
+                self._tasks.append(asyncio.create_task(self._worker(queue, self.processing_key(worker))))
+        self._tasks.append(asyncio.create_task(self._retry_loop()))
+        self._tasks.append(asyncio.create_task(self._reap_loop()))
+        logger.info(f"Запущены исполнители обработок 1С: {limits}")
+
+    async def stop(self) -> None:
+        # Прерванные обработки исполнители сами возвращают в очередь
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def reap(self) -> int:
+        """
+        Возврат в очередь зависших заданий: взятых исполнителем дольше
+        JOB_VISIBILITY_TIMEOUT назад, а также незавершённых заданий, которых
+        нет ни в одной очереди (например, взятых до перезапуска через BRPOP).
+        Возвращает число возвращённых заданий.
+        """
+        now = time.time()
+        requeued = 0
+
+        for processing, seen in await redis_client.zrange(WORKERS_KEY, 0, -1, withscores=True):
+            if now - seen > settings.JOB_VISIBILITY_TIMEOUT and not await redis_client.exists(processing):
+                # Исполнитель давно не обращался к очереди и ничего не держит - остановлен
+                await redis_client.zrem(WORKERS_KEY, processing)
+                continue
+            for process_id in await redis_client.lrange(processing, 0, -1):
+                job = await redis_client.hmget(self.job_key(process_id), "process_name", "claimed_at")
+                if job[0] is None:
+                    # Хэш задания истёк - в списке исполнителя оно не нужно
+                    await redis_client.lrem(processing, 1, process_id)
+                    continue
+                if job[1] is None:
+                    # Исполнитель не успел отметить взятие - отсчёт с первой проверки
+                    await redis_client.hsetnx(self.job_key(process_id), "claimed_at", now)
+                    continue
+                if now - float(job[1]) > settings.JOB_VISIBILITY_TIMEOUT:
+                    requeued += await self._requeue(processing, process_id, job[0])
+
+        cutoff = datetime.utcfromtimestamp(now - settings.JOB_VISIBILITY_TIMEOUT).isoformat()
+        async for key in redis_client.scan_iter(match=self.job_key("*"), count=500):
+            process_id = key[len("jobs:"):]
+            if not PROCESS_ID.match(process_id):
+                continue
+            process_name, status = await redis_client.hmget(key, "process_name", "status")
+            if process_name is None or status in FINAL_STATUSES:
+                continue
+            queue = self.queue_for(process_name)
+            if await self._orphan_script(
+                keys=[key, self.queue_key(queue), RETRIES_KEY, WORKERS_KEY],
+                args=[process_id, cutoff, f"{queue}|{process_id}", datetime.utcnow().isoformat()]
+            ):
+                logger.warning(f"Обработка {process_id} не найдена ни в одной очереди, возвращена в очередь")
+                requeued += 1
+
+        return requeued
+
+    async def _worker(self, queue: str, processing: str) -> None:
+        while True:
+            try:
+                # Список исполнителя отмечается до BLMOVE: проверка зависших видит взятое задание
+                await redis_client.zadd(WORKERS_KEY, {processing: time.time()})
+                process_id = await redis_client.blmove(self.queue_key(queue), processing, 5, "RIGHT", "LEFT")
+                if process_id:
+                    await self._run(processing, process_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка исполнителя очереди {queue}: {e}")
+                await asyncio.sleep(1)
+
+    async def _run(self, processing: str, process_id: str) -> None:
+        job = await self.get(process_id)
+        if not job or job["status"] in FINAL_STATUSES:
+            await redis_client.lrem(processing, 1, process_id)
+            return
+
+        attempts = job["attempts"] + 1
+        await self._update(process_id, status="running", attempts=attempts, claimed_at=time.time())
+
+        process_request = OneCProcessRequest(process_name=job["process_name"], parameters=job["parameters"])
+        handler = self._handlers.get(job["process_name"])
+        try:
+            result = await asyncio.wait_for(
+                handler(process_request) if handler
+                else onec_service.run_process(process_request, timeout=settings.JOB_TIMEOUT),
+                settings.JOB_TIMEOUT
+            )
+            error = None if result.get("success") else result.get("message", "1C process failed")
+        except asyncio.CancelledError:
+            # Остановка приложения: задание снова ждёт в очереди, дубль не блокируется
+            try:
+                await self._requeue(processing, process_id, job["process_name"])
+                await redis_client.delete(job["dedup_key"])
+            except Exception as e:
+                logger.error(f"Не удалось вернуть обработку {process_id} в очередь: {e}")
+            raise
+        except Exception as e:
+            result, error = None, str(e) or type(e).__name__
+
+        if error is None:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.hset(self.job_key(process_id), mapping=self._stamp(
+                    status="completed",
+                    message=result.get("message") or "",
+                    result=json.dumps(result, default=str)
+                ))
+                pipe.lrem(processing, 1, process_id)
+                pipe.delete(job["dedup_key"])
+                await pipe.execute()
+            for hook in self._hooks.get(job["process_name"], []):
+                try:
+                    await hook(result)
+                except Exception as e:
+                    logger.error(f"Ошибка обработчика завершения {job['process_name']}: {e}")
+            return
+
+        if attempts <= settings.JOB_MAX_RETRIES:
+            delay = settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+            logger.warning(f"Обработка {process_id} не удалась ({error}), повтор через {delay} с")
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.hset(self.job_key(process_id), mapping=self._stamp(status="pending", message=error))
+                pipe.zadd(RETRIES_KEY, {f"{self.queue_for(job['process_name'])}|{process_id}": time.time() + delay})
+                pipe.lrem(processing, 1, process_id)
+                await pipe.execute()
+            return
+
+        logger.error(f"Обработка {process_id} не удалась после {attempts} попыток: {error}")
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(self.job_key(process_id), mapping=self._stamp(status="failed", message=error))
+            pipe.lrem(processing, 1, process_id)
+            pipe.delete(job["dedup_key"])
+            await pipe.execute()
+
+    async def _requeue(self, processing: str, process_id: str, process_name: str) -> int:
+        requeued = await self._requeue_script(
+            keys=[processing, self.queue_key(self.queue_for(process_name)), self.job_key(process_id)],
+            args=[process_id, datetime.utcnow().isoformat()]
+        )
+        if requeued:
+            logger.warning(f"Обработка {process_id} возвращена в очередь")
+        return int(requeued)
+
+    async def _retry_loop(self) -> None:
+        while True:
+            try:
+                moved = await self._due_script(
+                    keys=[RETRIES_KEY],
+                    args=[time.time(), 100, self.queue_key("")]
+                )
+                if moved:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка переноса повторов обработок: {e}")
+            await asyncio.sleep(settings.JOB_RETRY_POLL_INTERVAL)
+
+    async def _reap_loop(self) -> None:
+        interval = settings.JOB_REAP_INTERVAL
+        while True:
+            try:
+                # Проверку выполняет один процесс за интервал; первая - сразу при старте
+                if await redis_client.set(REAP_LOCK_KEY, "1", nx=True, ex=max(1, int(interval) - 1)):
+                    requeued = await self.reap()
+                    if requeued:
+                        logger.warning(f"Возвращено в очередь зависших обработок: {requeued}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка проверки зависших обработок: {e}")
+            await asyncio.sleep(interval)
+
+    async def _update(self, process_id: str, **fields) -> None:
+        await redis_client.hset(self.job_key(process_id), mapping=self._stamp(**fields))
+
+    @staticmethod
+    def _stamp(**fields) -> Dict[str, Any]:
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        return fields
+
+    @staticmethod
+    def _decode(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "process_id": job["process_id"],
+            "process_name": job["process_name"],
+            "parameters": json.loads(job["parameters"]) if job.get("parameters") else None,
+            "status": job["status"],
+            "attempts": int(job.get("attempts", 0)),
+            "message": job.get("message"),
+            "result": json.loads(job["result"]) if job.get("result") else None,
+            "dedup_key": job.get("dedup_key"),
+            "created_at": job.get("created_at"),
+            "updated_at": job.get("updated_at")
+        }
+
+
+job_queue = JobQueue()
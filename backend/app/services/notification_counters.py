@@ -0,0 +1,209 @@
+import asyncio
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal
+from app.db.redis import redis_client
+from app.models.user import Notification
+
+# Увеличение счётчиков только для уже заполненного хэша: иначе частичный
+# хэш, созданный HINCRBY, выглядел бы как полный и давал неверные итоги
+INCR_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    for i = 1, #ARGV, 2 do
+        redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+return 0
+"""
+
+RECONCILE_LOCK_KEY = "notifications:reconcile-lock"
+
+
+class NotificationCounters:
+    """
+    Приблизительные счётчики уведомлений пользователя в Redis-хэше.
+
+    Поля хэша: "all" - всего уведомлений, "cat:<категория>" - по категориям,
+    "unread" и "unread:<категория>" - непрочитанные.
+    Хэш заполняется одним GROUP BY при первом обращении и дальше
+    поддерживается инкрементально; периодическая сверка пересчитывает
+    все хэши по PostgreSQL.
+    """
+
+    def __init__(self):
+        self._incr_script = redis_client.register_script(INCR_IF_EXISTS)
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"notifications:counts:{user_id}"
+
+    async def get_total(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        category: Optional[str] = None,
+        is_read: Optional[bool] = None
+    ) -> Optional[int]:
+        """
+        Число уведомлений пользователя с учётом фильтров (или None, если Redis недоступен)
+        """
+        counts = await self._get(db, user_id)
+        if counts is None:
+            return None
+        total = int(counts.get(f"cat:{category}" if category else "all", 0))
+        unread = int(counts.get(f"unread:{category}" if category else "unread", 0))
+        if is_read is None:
+            return max(total, 0)
+        return max(total - unread if is_read else unread, 0)
+
+    async def get_unread(self, db: AsyncSession, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Непрочитанные уведомления пользователя: всего и по категориям
+        """
+        counts = await self._get(db, user_id)
+        if counts is None:
+            return None
+        categories = {
+            field[len("unread:"):]: int(value)
+            for field, value in counts.items()
+            if field.startswith("unread:") and int(value) > 0
+        }
+        return {"total": max(int(counts.get("unread", 0)), 0), "categories": categories}
+
+    async def on_created(self, rows: Iterable[Tuple[int, Optional[str]]]) -> None:
+        """
+        Новые (непрочитанные) уведомления: пары (user_id, category)
+        """
+        await self._apply((user_id, category, False, 1) for user_id, category in rows)
+
+    async def on_read(self, rows: Iterable[Tuple[int, Optional[str]]]) -> None:
+        """
+        Уведомления, помеченные прочитанными: пары (user_id, category)
+        """
+        changes: Dict[int, Counter] = {}
+        for user_id, category in rows:
+            fields = changes.setdefault(user_id, Counter())
+            fields["unread"] -= 1
+            if category:
+                fields[f"unread:{category}"] -= 1
+        await self._execute(changes)
+
+    async def on_deleted(self, rows: Iterable[Tuple[int, Optional[str], bool]]) -> None:
+        """
+        Удалённые уведомления: тройки (user_id, category, is_read)
+        """
+        await self._apply((user_id, category, is_read, -1) for user_id, category, is_read in rows)
+
+    async def rebuild(self, db: AsyncSession) -> int:
+        """
+        Сверка: пересчёт счётчиков всех пользователей по PostgreSQL.
+        Хэши пользователей без уведомлений удаляются и заполнятся при обращении.
+        """
+        result = await db.execute(
+            select(Notification.user_id, Notification.category, Notification.is_read, func.count())
+            .group_by(Notification.user_id, Notification.category, Notification.is_read)
+        )
+        per_user: Dict[int, Dict[str, int]] = {}
+        for user_id, category, is_read, count in result.all():
+            counts = per_user.setdefault(user_id, {"all": 0, "unread": 0})
+            self._add(counts, category, bool(is_read), count)
+
+        stale = [key async for key in redis_client.scan_iter(match=self.key("*"), count=1000)]
+        async with redis_client.pipeline(transaction=False) as pipe:
+            if stale:
+                pipe.delete(*stale)
+            for user_id, counts in per_user.items():
+                pipe.hset(self.key(user_id), mapping=counts)
+            await pipe.execute()
+
+        return len(per_user)
+
+    async def start(self) -> None:
+        """
+        Запуск периодической сверки (вызывается при старте приложения)
+        """
+        if settings.NOTIFICATION_COUNTERS_RECONCILE_INTERVAL > 0 and self._task is None:
+            self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _reconcile_loop(self) -> None:
+        interval = settings.NOTIFICATION_COUNTERS_RECONCILE_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Сверку выполняет один воркер за интервал
+                if not await redis_client.set(RECONCILE_LOCK_KEY, "1", nx=True, ex=max(1, int(interval) - 1)):
+                    continue
+                async with AsyncSessionLocal() as db:
+                    users = await self.rebuild(db)
+                logger.info(f"Счётчики уведомлений сверены для {users} пользователей")
+            except Exception as e:
+                logger.warning(f"Не удалось сверить счётчики уведомлений: {e}")
+
+    async def _get(self, db: AsyncSession, user_id: int) -> Optional[Dict[str, str]]:
+        try:
+            counts = await redis_client.hgetall(self.key(user_id))
+            if not counts:
+                counts = await self._seed(db, user_id)
+        except Exception as e:
+            logger.warning(f"Счётчики уведомлений недоступны: {e}")
+            return None
+        return counts
+
+    async def _apply(self, rows: Iterable[Tuple[int, Optional[str], bool, int]]) -> None:
+        changes: Dict[int, Counter] = {}
+        for user_id, category, is_read, delta in rows:
+            self._add(changes.setdefault(user_id, Counter()), category, is_read, delta)
+        await self._execute(changes)
+
+    @staticmethod
+    def _add(fields: Dict[str, int], category: Optional[str], is_read: bool, delta: int) -> None:
+        names: List[str] = ["all"]
+        if category:
+            names.append(f"cat:{category}")
+        if not is_read:
+            names.append("unread")
+            if category:
+                names.append(f"unread:{category}")
+        for name in names:
+            fields[name] = fields.get(name, 0) + delta
+
+    async def _execute(self, changes: Dict[int, Counter]) -> None:
+        if not changes:
+            return
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for user_id, fields in changes.items():
+                    args = [item for pair in fields.items() for item in pair]
+                    await self._incr_script(keys=[self.key(user_id)], args=args, client=pipe)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Не удалось обновить счётчики уведомлений: {e}")
+
+    async def _seed(self, db: AsyncSession, user_id: int) -> Dict[str, int]:
+        result = await db.execute(
+            select(Notification.category, Notification.is_read, func.count())
+            .where(Notification.user_id == user_id)
+            .group_by(Notification.category, Notification.is_read)
+        )
+        counts = {"all": 0, "unread": 0}
+        for category, is_read, count in result.all():
+            self._add(counts, category, bool(is_read), count)
+
+        await redis_client.hset(self.key(user_id), mapping=counts)
+        return counts
+
+
+notification_counters = NotificationCounters()
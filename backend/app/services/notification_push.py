@@ -0,0 +1,181 @@
+import asyncio
+import json
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import select, or_
+
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal
+from app.db.redis import redis_client
+from app.models.user import Notification
+from app.schemas.user import Notification as NotificationSchema
+
+CHANNEL = "notifications:events"
+PUBLISH_CHUNK = 1000
+
+
+class Subscription:
+    """
+    Подписка одного соединения; очередь ограничена, при переполнении
+    соединение закрывается и клиент догоняет пропущенное через Last-Event-ID
+    """
+
+    def __init__(self, max_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.overflowed = False
+
+    def push(self, event: Dict[str, Any]) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class NotificationPush:
+    """
+    Доставка новых уведомлений подключённым клиентам (Server-Sent Events).
+
+    Уведомления публикуются в канал Redis pub/sub, каждый воркер uvicorn
+    слушает канал и раздаёт события своим соединениям, поэтому клиент
+    может быть подключён к любому воркеру.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, template: Dict[str, Any], targets: List[Tuple[int, int]]) -> None:
+        """
+        Публикация уведомления с общим содержимым (template) для пар (user_id, notification_id)
+        """
+        try:
+            for start in range(0, len(targets), PUBLISH_CHUNK):
+                message = {"template": template, "targets": targets[start:start + PUBLISH_CHUNK]}
+                await redis_client.publish(CHANNEL, json.dumps(message, default=str))
+        except Exception as e:
+            logger.warning(f"Не удалось опубликовать уведомление: {e}")
+
+    async def start(self) -> None:
+        """
+        Подписка воркера на канал уведомлений (вызывается при старте приложения)
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def stream(self, user_id: int, last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Поток SSE для пользователя. После переподключения сначала отдаются
+        уведомления из БД после last_event_id, затем новые.
+
+        id берутся из последовательности, а транзакции коммитятся не по порядку
+        id, поэтому уведомление с меньшим id может появиться позже большего.
+        Такие события не отбрасываются: при переподключении досылаются и
+        уведомления с меньшим id, созданные в пределах NOTIFICATION_PUSH_RESUME_GRACE
+        до last_event_id (клиент может получить одно событие повторно и
+        сверяет их по id), а из живого потока убираются только повторы
+        уже досланных из БД.
+        """
+        subscription = Subscription(settings.NOTIFICATION_PUSH_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield f"retry: {settings.NOTIFICATION_PUSH_RETRY_MS}\n\n"
+
+            # Подписка оформлена до чтения из БД, поэтому между ними ничего не теряется
+            replayed: Set[int] = set()
+            if last_event_id is not None:
+                async with AsyncSessionLocal() as db:
+                    missed_filter = Notification.id > last_event_id
+                    last_created_at = await db.scalar(
+                        select(Notification.created_at)
+                        .where(Notification.user_id == user_id, Notification.id == last_event_id)
+                    )
+                    if last_created_at is not None:
+                        since = last_created_at - timedelta(seconds=settings.NOTIFICATION_PUSH_RESUME_GRACE)
+                        missed_filter = or_(
+                            missed_filter,
+                            (Notification.id < last_event_id) & (Notification.created_at >= since)
+                        )
+                    result = await db.scalars(
+                        select(Notification)
+                        .where(Notification.user_id == user_id, missed_filter)
+                        .order_by(Notification.id)
+                        .limit(settings.NOTIFICATION_PUSH_RESUME_LIMIT)
+                    )
+                    missed = result.all()
+                for notification in missed:
+                    replayed.add(notification.id)
+                    yield self._format(NotificationSchema.model_validate(notification).model_dump(mode="json"))
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(),
+                        timeout=settings.NOTIFICATION_PUSH_HEARTBEAT
+                    )
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+
+                if event is None:
+                    # Клиент не успевает читать - закрываем, он переподключится
+                    return
+                if event["id"] in replayed:
+                    # Уже отдано из БД
+                    replayed.discard(event["id"])
+                    continue
+                yield self._format(event)
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def connections(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._dispatch(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Подписка на уведомления прервана: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        template = message["template"]
+        for user_id, notification_id in message["targets"]:
+            subscribers = self._subscribers.get(user_id)
+            if not subscribers:
+                continue
+            event = {**template, "id": notification_id, "user_id": user_id}
+            for subscription in list(subscribers):
+                subscription.push(event)
+
+    @staticmethod
+    def _format(event: Dict[str, Any]) -> str:
+        return f"id: {event['id']}\nevent: notification\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+
+notification_push = NotificationPush()
@@ -1,14 +1,47 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
-from sqlalchemy.orm import Session
+import base64
+from sqlalchemy import select, insert, update, delete, func, tuple_, literal
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
 from app.models.user import Notification, User
 from app.schemas.user import NotificationCreate, NotificationUpdate
+from app.services.notification_counters import notification_counters
+from app.services.notification_push import notification_push
 
 logger = logging.getLogger(__name__)
 
 
+def encode_cursor(notification: Notification) -> str:
+    """
+    Курсор страницы: позиция последнего уведомления (created_at, id)
+    """
+    raw = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def notification_template(category: str, title: str, message: str, created_at: datetime) -> Dict[str, Any]:
+    """
+    Общая часть push-события о новом уведомлении
+    """
+    return {
+        "category": category,
+        "title": title,
+        "message": message,
+        "is_read": False,
+        "created_at": created_at.isoformat() if created_at else None
+    }
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
 class NotificationService:
     """
     Сервис для работы с уведомлениями пользователей
@@ -16,38 +49,61 @@ class NotificationService:
     
     @staticmethod
     async def get_notifications(
-        db: Session, 
+        db: AsyncSession, 
         user_id: int, 
         skip: int = 0, 
         limit: int = 100, 
         category: Optional[str] = None, 
-        is_read: Optional[bool] = None
+        is_read: Optional[bool] = None,
+        cursor: Optional[str] = None,
+        count: str = "approximate"
     ) -> Dict[str, Any]:
         """
-        Получение списка уведомлений для пользователя с фильтрацией
+        Получение списка уведомлений для пользователя с фильтрацией.
+        
+        Если передан cursor, используется keyset-пагинация по (created_at, id)
+        вместо OFFSET. count задаёт способ подсчёта total: approximate - счётчики
+        в Redis (None, если Redis недоступен), exact - COUNT(*), none - без подсчёта.
         """
-        query = db.query(Notification).filter(Notification.user_id == user_id)
+        query = select(Notification).where(Notification.user_id == user_id)
         
         # Применяем фильтры, если они указаны
         if category:
-            query = query.filter(Notification.category == category)
+            query = query.where(Notification.category == category)
             
         if is_read is not None:
-            query = query.filter(Notification.is_read == is_read)
+            query = query.where(Notification.is_read == is_read)
         
         # Получаем общее количество уведомлений
-        total = query.count()
+        total = None
+        if count == "exact":
+            total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        elif count == "approximate":
+            total = await notification_counters.get_total(db, user_id, category, is_read)
+        
+        # Сортировка по дате (сначала новые), id - для однозначного порядка
+        query = query.order_by(Notification.created_at.desc(), Notification.id.desc())
+        if cursor:
+            created_at, notification_id = decode_cursor(cursor)
+            query = query.where(tuple_(Notification.created_at, Notification.id) < (created_at, notification_id))
+        else:
+            query = query.offset(skip)
+        
+        result = await db.scalars(query.limit(limit))
+        notifications = result.all()
         
-        # Применяем пагинацию и сортировку по дате (сначала новые)
-        notifications = query.order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
+        next_cursor = None
+        if len(notifications) == limit:
+            next_cursor = encode_cursor(notifications[-1])
         
         return {
             "notifications": notifications,
-            "total": total
+            "total": total,
+            "next_cursor": next_cursor
         }
     
     @staticmethod
-    async def create_notification(db: Session, notification: NotificationCreate) -> Notification:
+    async def create_notification(db: AsyncSession, notification: NotificationCreate) -> Notification:
         """
         Создание нового уведомления
         """
@@ -59,117 +115,157 @@ class NotificationService:
         )
         
         db.add(db_notification)
-        db.commit()
-        db.refresh(db_notification)
+        await db.commit()
+        await db.refresh(db_notification)
+        
+        await notification_counters.on_created([(db_notification.user_id, db_notification.category)])
+        await notification_push.publish(
+            notification_template(db_notification.category, db_notification.title, db_notification.message, db_notification.created_at),
+            [(db_notification.user_id, db_notification.id)]
+        )
         
         return db_notification
     
     @staticmethod
     async def create_notifications_for_role(
-        db: Session,
+        db: AsyncSession,
         role: str,
         category: str,
         title: str,
         message: str
-    ) -> List[Notification]:
+    ) -> List[int]:
         """
-        Создание уведомлений для всех пользователей с определенной ролью
+        Создание уведомлений для всех пользователей с определенной ролью.
+        Один INSERT ... SELECT из users без загрузки пользователей в приложение,
+        возвращает id созданных уведомлений.
         """
-        users = db.query(User).filter(User.role == role, User.is_active == True).all()
+        recipients = select(
+            User.id,
+            literal(category),
+            literal(title),
+            literal(message),
+            literal(False)
+        ).where(User.role == role, User.is_active == True)
         
-        notifications = []
-        for user in users:
-            notification = Notification(
-                user_id=user.id,
-                category=category,
-                title=title,
-                message=message
-            )
-            db.add(notification)
-            notifications.append(notification)
+        result = await db.execute(
+            insert(Notification)
+            .from_select(["user_id", "category", "title", "message", "is_read"], recipients)
+            .returning(Notification.id, Notification.user_id, Notification.created_at)
+        )
+        created = result.all()
+        await db.commit()
         
-        db.commit()
-        for notification in notifications:
-            db.refresh(notification)
+        await notification_counters.on_created((user_id, category) for _, user_id, _ in created)
+        if created:
+            await notification_push.publish(
+                notification_template(category, title, message, created[0].created_at),
+                [(user_id, notification_id) for notification_id, user_id, _ in created]
+            )
         
-        return notifications
+        return [notification_id for notification_id, _, _ in created]
     
     @staticmethod
     async def mark_notification_as_read(
-        db: Session, 
+        db: AsyncSession, 
         notification_id: int, 
         user_id: int
     ) -> Optional[Notification]:
         """
         Пометка уведомления как прочитанного
         """
-        notification = db.query(Notification).filter(
+        notification = await db.scalar(select(Notification).where(
             Notification.id == notification_id,
             Notification.user_id == user_id
-        ).first()
+        ))
         
         if notification:
+            was_unread = not notification.is_read
             notification.is_read = True
-            db.commit()
-            db.refresh(notification)
+            await db.commit()
+            await db.refresh(notification)
+            
+            if was_unread:
+                await notification_counters.on_read([(user_id, notification.category)])
             
         return notification
     
     @staticmethod
-    async def mark_all_as_read(db: Session, user_id: int, category: Optional[str] = None) -> int:
+    async def mark_all_as_read(db: AsyncSession, user_id: int, category: Optional[str] = None) -> int:
         """
         Пометка всех уведомлений пользователя как прочитанных
         Возвращает количество обновленных уведомлений
         """
-        query = db.query(Notification).filter(
+        query = update(Notification).where(
             Notification.user_id == user_id,
             Notification.is_read == False
         )
         
         if category:
-            query = query.filter(Notification.category == category)
+            query = query.where(Notification.category == category)
         
-        count = query.count()
+        # Одно UPDATE вместо COUNT + UPDATE, категории помеченных - для счётчиков
+        result = await db.execute(query.values(is_read=True).returning(Notification.category))
+        categories = result.scalars().all()
+        await db.commit()
         
-        if count > 0:
-            query.update({"is_read": True})
-            db.commit()
+        await notification_counters.on_read((user_id, category) for category in categories)
         
-        return count
+        return len(categories)
     
     @staticmethod
-    async def delete_notification(db: Session, notification_id: int, user_id: int) -> bool:
+    async def delete_notification(db: AsyncSession, notification_id: int, user_id: int) -> bool:
         """
         Удаление уведомления
         """
-        notification = db.query(Notification).filter(
+        notification = await db.scalar(select(Notification).where(
             Notification.id == notification_id,
             Notification.user_id == user_id
-        ).first()
+        ))
         
         if notification:
-            db.delete(notification)
-            db.commit()
+            await db.delete(notification)
+            await db.commit()
+            await notification_counters.on_deleted([(user_id, notification.category, notification.is_read)])
             return True
         
         return False
     
     @staticmethod
-    async def delete_old_notifications(db: Session, days: int = 30) -> int:
+    async def get_unread_counts(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+        """
+        Количество непрочитанных уведомлений по категориям (из счётчиков в Redis).
+        Если Redis недоступен, считается по БД.
+        """
+        counts = await notification_counters.get_unread(db, user_id)
+        if counts is not None:
+            return counts
+        
+        result = await db.execute(
+            select(Notification.category, func.count())
+            .where(Notification.user_id == user_id, Notification.is_read == False)
+            .group_by(Notification.category)
+        )
+        categories = {category: count for category, count in result.all() if category}
+        return {"total": sum(categories.values()), "categories": categories}
+    
+    @staticmethod
+    async def delete_old_notifications(db: AsyncSession, days: int = 30) -> int:
         """
         Удаление старых прочитанных уведомлений
         """
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
         # Удаляем прочитанные уведомления старше указанного срока
-        result = db.query(Notification).filter(
+        result = await db.execute(delete(Notification).where(
             Notification.is_read == True,
             Notification.created_at < cutoff_date
-        ).delete()
+        ).returning(Notification.user_id, Notification.category))
+        deleted = result.all()
         
-        db.commit()
+        await db.commit()
+        await notification_counters.on_deleted((user_id, category, True) for user_id, category in deleted)
         
-        return result
+        return len(deleted)
 
 
 # Создаем экземпляр сервиса для уведомлений
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.metrics import ONEC_SINGLE_FLIGHT
+
+
+class BatchLoader:
+    """
+    Пакетирование запросов (DataLoader).
+
+    Вызовы load(), сделанные в течение window секунд после первого, копятся
+    и передаются в dispatch одним списком; пакет уходит раньше, если набралось
+    max_size запросов. dispatch возвращает результаты в том же порядке
+    (исключение на месте результата - ошибка только этого запроса).
+    Одинаковые ключи внутри пакета выполняются один раз.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        dispatch: Callable[[List[Any]], Awaitable[List[Any]]],
+        window: float,
+        max_size: int
+    ):
+        self.name = name
+        self.window = window
+        self.max_size = max_size
+        self._dispatch = dispatch
+        self._pending: Dict[str, Tuple[Any, asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.calls = 0
+        self.batches = 0
+        self.coalesced = 0
+
+    async def load(self, key: str, payload: Any) -> Any:
+        self.calls += 1
+        entry = self._pending.get(key)
+        if entry is not None:
+            self.coalesced += 1
+            ONEC_SINGLE_FLIGHT.labels(self.name, "coalesced").inc()
+            return await asyncio.shield(entry[1])
+
+        future = asyncio.get_running_loop().create_future()
+        # Ошибку забирает dispatch-задача, даже если ждавшие вызовы отменены
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending[key] = (payload, future)
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "batches": self.batches,
+            "coalesced": self.coalesced,
+            "pending": len(self._pending)
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = list(self._pending.values()), {}
+        if not batch:
+            return
+        self.batches += 1
+        ONEC_SINGLE_FLIGHT.labels(self.name, "executed").inc(len(batch))
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self._dispatch([payload for payload, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: {len(results)} results for {len(batch)} requests")
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -1,101 +1,753 @@
-import requests
+import asyncio
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiohttp
 from loguru import logger
+
 from app.core.config import settings
+from app.core.metrics import ONEC_BATCH_SIZE, ONEC_FALLBACKS, ONEC_REQUEST_DURATION, ONEC_REQUEST_ERRORS, SALES_READS
+from app.core.responses import json_loads
+from app.db.base import AsyncSessionLocal
+from app.schemas.sales import SalesFilter, OneCProcessRequest
+from app.services.cache_service import onec_cache, onec_last_good
+from app.services.circuit_breaker import HALF_OPEN, CircuitOpenError, onec_breakers
+from app.services.onec_batch import BatchLoader
+from app.services.response_cache import response_cache
+from app.services.sales_aggregation import PeriodWindow, aggregate_sales, merge_columns, period_window
+from app.services.sales_rollups import sales_rollups
+from app.services.sales_store import sales_store
+from app.services.single_flight import SingleFlight
+
 
 class OneCService:
     def __init__(self):
-        self.base_url = settings.ONEC_API_URL
+        self.base_url = settings.ONEC_API_URL.rstrip("/")
         self.username = settings.ONEC_API_USER
         self.password = settings.ONEC_API_PASSWORD
-        self.auth = (self.username, self.password)
-        
-    async def get_sales_data(self, period="today", store_id=None, warehouse_id=None, category_id=None):
+        self.auth = aiohttp.BasicAuth(self.username, self.password)
+        self.use_mock = settings.ONEC_USE_MOCK
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._sales_flight = SingleFlight("get_sales_data")
+        self._batch = BatchLoader(
+            "onec_batch",
+            self._send_batch,
+            window=settings.ONEC_BATCH_WINDOW_MS / 1000,
+            max_size=settings.ONEC_BATCH_MAX_SIZE
+        )
+        self._batch_semaphore = asyncio.Semaphore(settings.ONEC_BATCH_CONCURRENCY)
+        # None - ещё неизвестно, поддерживает ли 1С пакетные запросы
+        self._batch_supported: Optional[bool] = None if settings.ONEC_BATCH_ENDPOINT else False
+
+    async def startup(self):
+        """
+        Открытие общей keep-alive сессии к 1С (вызывается при старте приложения)
+        """
+        if self._session is not None and not self._session.closed:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=settings.ONEC_POOL_LIMIT,
+            limit_per_host=settings.ONEC_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=settings.ONEC_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=settings.ONEC_CONNECT_TIMEOUT,
+            sock_read=settings.ONEC_READ_TIMEOUT,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            auth=self.auth,
+            headers={"Accept": "application/json", "Accept-Encoding": "gzip, deflate"},
+            auto_decompress=True,
+            raise_for_status=True,
+        )
+        logger.info(f"HTTP-сессия 1С открыта: {self.base_url}")
+
+    async def shutdown(self):
         """
-        Получение данных о продажах из 1С
+        Закрытие HTTP-сессии к 1С (вызывается при остановке приложения)
         """
-        logger.info(f"Запрос данных о продажах: период={period}, магазин={store_id}, склад={warehouse_id}")
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("HTTP-сессия 1С закрыта")
+        self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # Скрипты могут работать с сервисом без старта приложения
+        if self._session is None or self._session.closed:
+            await self.startup()
+        return self._session
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """
+        Выполнение HTTP-запроса к API 1С через общую сессию.
+        timeout переопределяет таймаут чтения (для долгих обработок),
+        иначе действует адаптивный таймаут предохранителя endpoint'а.
+        """
+        session = await self._get_session()
+        url = f"{self.base_url}/{endpoint}"
+        async with self._call(endpoint, timeout) as request_timeout:
+            async with session.request(method, url, params=params, json=json, timeout=request_timeout) as response:
+                return await response.json(content_type=None, loads=json_loads)
+
+    @asynccontextmanager
+    async def _call(
+        self,
+        endpoint: str,
+        timeout: Optional[float] = None,
+        sample: bool = True,
+        use_breaker: bool = True
+    ):
+        """
+        Учёт запроса к endpoint: предохранитель, метрики времени и ошибок.
+        Открытый предохранитель - CircuitOpenError без обращения к 1С.
+        Отдаёт таймаут запроса (None - таймауты сессии). Ошибками для
+        предохранителя считаются таймауты, обрывы соединения и ответы 5xx;
+        sample=False - время не попадает в выборку адаптивного таймаута
+        (потоковые ответы, чья длительность зависит от объёма).
+        use_breaker=False - только метрики (пакетный запрос: предохранители
+        ведутся по endpoint'ам его подзапросов).
+        """
+        breaker = onec_breakers.get(endpoint) if use_breaker else None
+        limit = None
+        if breaker is not None:
+            try:
+                limit = breaker.before_call()
+            except CircuitOpenError:
+                ONEC_REQUEST_ERRORS.labels(endpoint, "CircuitOpenError").inc()
+                raise
+        probe = breaker is not None and breaker.state == HALF_OPEN
+
+        request_timeout = None
+        if timeout is not None:
+            request_timeout = aiohttp.ClientTimeout(total=None, connect=settings.ONEC_CONNECT_TIMEOUT, sock_read=timeout)
+        elif limit is not None and limit < settings.ONEC_READ_TIMEOUT:
+            request_timeout = aiohttp.ClientTimeout(total=limit, connect=settings.ONEC_CONNECT_TIMEOUT)
+
+        start = time.perf_counter()
         try:
-            # В демонстрационных целях возвращаем тестовые данные
-            return {
-                "sales": [
-                    {"date": "2025-04-18", "amount": 15000, "items_count": 45},
-                    {"date": "2025-04-17", "amount": 12500, "items_count": 38},
-                    {"date": "2025-04-16", "amount": 18200, "items_count": 52}
-                ],
-                "total": {
-                    "amount": 45700,
-                    "items_count": 135
-                }
-            }
+            yield request_timeout
+        except aiohttp.ClientResponseError as e:
+            ONEC_REQUEST_ERRORS.labels(endpoint, f"http_{e.status}").inc()
+            if breaker is not None:
+                # 4xx - 1С отвечает, ошибка в самом запросе
+                if e.status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            raise
         except Exception as e:
+            ONEC_REQUEST_ERRORS.labels(endpoint, type(e).__name__).inc()
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+        except BaseException:
+            # Отмена или закрытие потока до результата: пробный запрос можно повторить
+            if probe:
+                breaker.release()
+            raise
+        else:
+            if breaker is not None:
+                breaker.record_success(time.perf_counter() - start if sample and timeout is None else None)
+        finally:
+            ONEC_REQUEST_DURATION.labels(endpoint).observe(time.perf_counter() - start)
+
+    async def _get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        GET-запрос к 1С через пакетирование: запросы за ONEC_BATCH_WINDOW_MS
+        отправляются вместе (см. _send_batch), одинаковые - один раз.
+        """
+        if settings.ONEC_BATCH_WINDOW_MS <= 0:
+            return await self._request("GET", endpoint, params=params)
+        # При разомкнутом предохранителе endpoint'а запрос не ждёт пакета
+        breaker = onec_breakers.get(endpoint)
+        if breaker is not None:
+            try:
+                breaker.check()
+            except CircuitOpenError:
+                ONEC_REQUEST_ERRORS.labels(endpoint, "CircuitOpenError").inc()
+                raise
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        key = f"{endpoint}?{sorted(params.items())}"
+        return await self._batch.load(key, {"method": "GET", "endpoint": endpoint, "params": params})
+
+    async def _send_batch(self, requests: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Отправка пакета: одним POST ONEC_BATCH_ENDPOINT, если 1С его поддерживает,
+        иначе по одному параллельно (не больше ONEC_BATCH_CONCURRENCY одновременно).
+        Результаты - в порядке запросов, исключение - ошибка отдельного запроса.
+        """
+        if len(requests) > 1 and self._batch_supported is not False:
+            results = await self._send_combined(requests)
+            if results is not None:
+                return results
+
+        async def send(request):
+            async with self._batch_semaphore:
+                return await self._request(request["method"], request["endpoint"], params=request["params"])
+
+        ONEC_BATCH_SIZE.labels("concurrent").observe(len(requests))
+        return await asyncio.gather(*(send(request) for request in requests), return_exceptions=True)
+
+    async def _send_combined(self, requests: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        """
+        Пакет одним POST ONEC_BATCH_ENDPOINT; None - 1С пакеты не поддерживает.
+
+        Каждый подзапрос проходит предохранитель своего endpoint'а: при
+        разомкнутом он не отправляется (результат - CircuitOpenError), ответ
+        5xx, таймаут или обрыв пакета - ошибка, остальное - успех со временем
+        ответа пакета в выборке адаптивного таймаута. Таймаут пакета -
+        наибольший из таймаутов его подзапросов.
+        """
+        results: List[Any] = [None] * len(requests)
+        admitted = []
+        for index, request in enumerate(requests):
+            breaker = onec_breakers.get(request["endpoint"])
+            limit = None
+            if breaker is not None:
+                try:
+                    limit = breaker.before_call()
+                except CircuitOpenError as e:
+                    ONEC_REQUEST_ERRORS.labels(request["endpoint"], "CircuitOpenError").inc()
+                    results[index] = e
+                    continue
+            admitted.append((index, request, breaker, limit))
+        if not admitted:
+            return results
+
+        limits = [limit for _, _, _, limit in admitted]
+        request_timeout = None
+        if None not in limits and max(limits) < settings.ONEC_READ_TIMEOUT:
+            request_timeout = aiohttp.ClientTimeout(total=max(limits), connect=settings.ONEC_CONNECT_TIMEOUT)
+
+        session = await self._get_session()
+        url = f"{self.base_url}/{settings.ONEC_BATCH_ENDPOINT}"
+        start = time.perf_counter()
+        try:
+            async with self._call(settings.ONEC_BATCH_ENDPOINT, use_breaker=False):
+                async with session.post(
+                    url,
+                    json={"requests": [request for _, request, _, _ in admitted]},
+                    timeout=request_timeout
+                ) as response:
+                    items = (await response.json(content_type=None, loads=json_loads))["responses"]
+            if len(items) != len(admitted):
+                raise RuntimeError(f"1C batch: {len(items)} responses for {len(admitted)} requests")
+        except aiohttp.ClientResponseError as e:
+            if e.status in (404, 405, 501):
+                logger.warning(f"1С не поддерживает пакетные запросы (HTTP {e.status}), запросы выполняются по одному")
+                self._batch_supported = False
+                self._release(admitted)
+                return None
+            self._fail(admitted, results, e)
+            return results
+        except Exception as e:
+            self._fail(admitted, results, e)
+            return results
+        except BaseException:
+            self._release(admitted)
+            raise
+
+        elapsed = time.perf_counter() - start
+        self._batch_supported = True
+        ONEC_BATCH_SIZE.labels("combined").observe(len(admitted))
+        for (index, request, breaker, _), item in zip(admitted, items):
+            results[index] = self._batch_result(request, item)
+            ONEC_REQUEST_DURATION.labels(request["endpoint"]).observe(elapsed)
+            if breaker is None:
+                continue
+            status = item.get("status", 200)
+            if status >= 500:
+                breaker.record_failure()
+            else:
+                # 4xx - 1С отвечает, ошибка в самом запросе
+                breaker.record_success(elapsed if status < 400 else None)
+        return results
+
+    @staticmethod
+    def _fail(admitted: List[Any], results: List[Any], error: Exception) -> None:
+        """
+        Пакет не выполнен: ошибка у каждого отправленного подзапроса
+        """
+        for index, request, breaker, _ in admitted:
+            ONEC_REQUEST_ERRORS.labels(request["endpoint"], type(error).__name__).inc()
+            results[index] = error
+            if breaker is not None:
+                breaker.record_failure()
+
+    @staticmethod
+    def _release(admitted: List[Any]) -> None:
+        """
+        Подзапросы не отправлены: занятые пробные запросы можно повторить
+        """
+        for _, _, breaker, _ in admitted:
+            if breaker is not None and breaker.state == HALF_OPEN:
+                breaker.release()
+
+    @staticmethod
+    def _batch_result(request: Dict[str, Any], item: Dict[str, Any]) -> Any:
+        status = item.get("status", 200)
+        if status >= 400:
+            ONEC_REQUEST_ERRORS.labels(request["endpoint"], f"http_{status}").inc()
+            return RuntimeError(f"1C {request['endpoint']}: HTTP {status} {item.get('body')}")
+        return item.get("body")
+
+    async def get_sales_data(self, filter_params: SalesFilter, items_limit: Optional[int] = None):
+        """
+        Получение данных о продажах из 1С.
+        Одинаковые параллельные запросы объединяются в один вызов 1С.
+        items_limit - товаров в ответе (по умолчанию SALES_ITEMS_LIMIT).
+        """
+        items_limit = items_limit or settings.SALES_ITEMS_LIMIT
+        params = dict(filter_params.model_dump(), items_limit=items_limit)
+        try:
+            return await self._sales_flight.do(
+                f"{filter_params.model_dump_json()}:{items_limit}",
+                lambda: self._remember("get_sales_data", params, lambda: self._load_sales_data(filter_params, items_limit))
+            )
+        except Exception as e:
+            fallback = await self._fallback("get_sales_data", params, e)
+            if fallback is not None:
+                return fallback
             logger.error(f"Ошибка получения данных о продажах: {str(e)}")
-            return {"error": str(e)}
-            
+            return error_result(e)
+
+    async def get_sales_batch(self, filters: List[SalesFilter], warehouses: bool = False) -> List[Dict[str, Any]]:
+        """
+        Продажи по нескольким наборам фильтров (например, по каждому магазину) одним вызовом.
+        Наборы считаются параллельно, их запросы к 1С уходят общими пакетами.
+        warehouses - добавить к результатам с магазином его склады.
+        Ошибка одного набора не мешает остальным: она попадает в его поле error.
+        """
+        store_ids = sorted({f.store_id for f in filters if f.store_id}) if warehouses else []
+        sales, store_warehouses = await asyncio.gather(
+            asyncio.gather(*(self.get_sales_data(f) for f in filters)),
+            asyncio.gather(*(self.get_warehouses(store_id) for store_id in store_ids))
+        )
+        store_warehouses = dict(zip(store_ids, store_warehouses))
+
+        results = []
+        for filter_params, data in zip(filters, sales):
+            result = {"filter": filter_params}
+            if "error" in data:
+                result["error"] = data["error"]
+            else:
+                result["sales"] = data
+            if filter_params.store_id in store_warehouses:
+                found = store_warehouses[filter_params.store_id]
+                if isinstance(found, dict) and "error" in found:
+                    result.setdefault("error", found["error"])
+                else:
+                    result["warehouses"] = found
+            results.append(result)
+        return results
+
+    async def _load_sales_data(self, filter_params: SalesFilter, items_limit: Optional[int] = None):
+        logger.info(
+            f"Запрос данных о продажах: период={filter_params.period}, "
+            f"магазин={filter_params.store_id}, склад={filter_params.warehouse_id}"
+        )
+        now = datetime.now()
+        window = period_window(filter_params.period, now)
+        # Строки чеков за период и такой же предыдущий (для сравнения); если есть
+        # предрасчитанные итоги - только за не покрытые ими интервалы
+        base, segments = await self._load_sales_rollups(filter_params, window)
+        parts = await asyncio.gather(*(
+            self._load_sales_window(filter_params, date_from, date_to) for date_from, date_to in segments
+        ))
+        data = parts[0] if len(parts) == 1 else merge_columns(*parts)
+
+        # Агрегация сотен тысяч строк занимает десятки миллисекунд - не держим цикл событий
+        return await asyncio.to_thread(
+            aggregate_sales,
+            data,
+            filter_params.period,
+            group_by=filter_params.group_by,
+            items_limit=items_limit or settings.SALES_ITEMS_LIMIT,
+            now=now,
+            base=base
+        )
+
+    async def _load_sales_rollups(self, filter_params: SalesFilter, window: PeriodWindow):
+        """
+        Итоги периода из sales_rollup_* и интервалы, которые остаётся посчитать по строкам.
+        Без итогов (выключены, не построены, недоступны) - весь период по строкам.
+        """
+        if settings.SALES_LOCAL_STORE_ENABLED and settings.SALES_ROLLUPS_ENABLED:
+            try:
+                async with AsyncSessionLocal() as db:
+                    rolled = await sales_rollups.load(db, filter_params, window)
+                if rolled is not None:
+                    SALES_READS.labels("rollup").inc()
+                    return rolled
+            except Exception as e:
+                logger.warning(f"Итоги продаж недоступны, агрегация по строкам: {e}")
+        return None, [(window.prev_start, window.current_end)]
+
+    async def _load_sales_window(self, filter_params: SalesFilter, date_from: datetime, date_to: datetime):
+        """
+        Строки за [date_from, date_to): синхронизированная часть - из локальной
+        таблицы, в 1С запрашивается только ещё не синхронизированный хвост.
+        Если таблица недоступна или не покрывает начало окна - всё из 1С.
+        """
+        local, synced_until = None, None
+        if settings.SALES_LOCAL_STORE_ENABLED:
+            try:
+                async with AsyncSessionLocal() as db:
+                    state = await sales_store.get_state(db)
+                    if state and state.synced_from and state.synced_until and state.synced_from <= date_from:
+                        synced_until = min(state.synced_until, date_to)
+                        local = await sales_store.load_columns(db, filter_params, date_from, synced_until)
+            except Exception as e:
+                logger.warning(f"Локальная таблица продаж недоступна, запрос в 1С: {e}")
+                local = None
+
+        if local is None:
+            SALES_READS.labels("onec").inc()
+            return await self.fetch_sales_lines(filter_params, date_from, date_to)
+        if synced_until >= date_to:
+            SALES_READS.labels("local").inc()
+            return local
+
+        SALES_READS.labels("mixed").inc()
+        return merge_columns(local, await self.fetch_sales_lines(filter_params, synced_until, date_to))
+
+    async def fetch_sales_lines(self, filter_params: SalesFilter, date_from: datetime, date_to: datetime):
+        """
+        Строки чеков из 1С за [date_from, date_to) с фильтрами по магазину, складу и категории.
+        У 1С запрашивается колоночный формат ({поле: [значения]}), он разбирается без
+        создания словаря на каждую строку; список строк тоже поддерживается.
+        Ошибки пробрасываются.
+        """
+        if not self.use_mock:
+            params = filter_params.model_dump(exclude_none=True, exclude={"period", "group_by"})
+            params["date_from"] = date_from.isoformat(timespec="seconds")
+            params["date_to"] = date_to.isoformat(timespec="seconds")
+            params["format"] = "columns"
+            return await self._get("sales", params=params)
+
+        # В демонстрационных целях возвращаем тестовые данные
+        lines = mock_sales_lines(date_from, date_to)
+        for field in ("store_id", "warehouse_id", "category_id"):
+            value = getattr(filter_params, field)
+            if value:
+                lines = [line for line in lines if line[field] == value]
+        return lines
+
+    async def stream_sales_lines(
+        self,
+        filter_params: SalesFilter,
+        date_from: datetime,
+        date_to: datetime,
+        batch_size: int = 1000
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Строки чеков из 1С за [date_from, date_to) порциями по мере получения:
+        у 1С запрашивается NDJSON (format=ndjson, строка чека на строку ответа),
+        тело читается частями, поэтому в памяти не больше порции. Ошибки пробрасываются.
+        """
+        if self.use_mock:
+            # В демонстрационных целях возвращаем тестовые данные
+            lines = await self.fetch_sales_lines(filter_params, date_from, date_to)
+            for start in range(0, len(lines), batch_size):
+                yield lines[start:start + batch_size]
+            return
+
+        endpoint = "sales/stream"
+        params = filter_params.model_dump(exclude_none=True, exclude={"period", "group_by"})
+        params["date_from"] = date_from.isoformat(timespec="seconds")
+        params["date_to"] = date_to.isoformat(timespec="seconds")
+        params["format"] = "ndjson"
+        session = await self._get_session()
+        async with self._call(endpoint, sample=False):
+            async with session.get(f"{self.base_url}/sales", params=params) as response:
+                batch, tail = [], b""
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    *complete, tail = (tail + chunk).split(b"\n")
+                    batch.extend(json_loads(line) for line in complete if line.strip())
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+                if tail.strip():
+                    batch.append(json_loads(tail))
+                if batch:
+                    yield batch
+
+    async def fetch_sales_changes(
+        self,
+        changed_after: datetime,
+        after_line_id: str,
+        changed_to: datetime,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Лента изменений строк чеков для синхронизации: строки с
+        (changed_at, line_id) после отметки и changed_at <= changed_to,
+        по возрастанию (changed_at, line_id), не больше limit.
+        Удалённые в 1С строки приходят с is_deleted=true. Ошибки пробрасываются.
+        """
+        if not self.use_mock:
+            return await self._request("GET", "sales/changes", params={
+                "changed_after": changed_after.isoformat(timespec="seconds"),
+                "after_line_id": after_line_id,
+                "changed_to": changed_to.isoformat(timespec="seconds"),
+                "limit": limit
+            })
+
+        # В демонстрационных целях строка меняется только при продаже
+        cursor = (changed_after.isoformat(), after_line_id)
+        lines = []
+        for line in mock_sales_lines(changed_after, changed_to + timedelta(seconds=1)):
+            line["changed_at"] = line["sold_at"]
+            if (line["changed_at"], line["line_id"]) > cursor:
+                lines.append(line)
+        lines.sort(key=lambda line: (line["changed_at"], line["line_id"]))
+        return lines[:limit]
+
     async def get_stores(self):
         """
-        Получение списка магазинов из 1С
+        Получение списка магазинов из 1С (через кэш справочников)
         """
-        logger.info("Запрос списка магазинов")
         try:
-            # В демонстрационных целях возвращаем тестовые данные
-            return [
-                {"id": "1", "name": "Магазин на Невском"},
-                {"id": "2", "name": "Магазин в ТЦ Галерея"},
-                {"id": "3", "name": "Магазин на Московском"}
-            ]
+            return await onec_cache.get_or_load(
+                "get_stores",
+                lambda: self._remember("get_stores", None, self._load_stores),
+                ttl=settings.ONEC_CACHE_TTL_STORES,
+                stale_ttl=settings.ONEC_CACHE_STALE_TTL
+            )
         except Exception as e:
+            fallback = await self._fallback("get_stores", None, e)
+            if fallback is not None:
+                return fallback
             logger.error(f"Ошибка получения списка магазинов: {str(e)}")
-            return {"error": str(e)}
-            
+            return error_result(e)
+
+    async def _load_stores(self):
+        logger.info("Запрос списка магазинов")
+        if not self.use_mock:
+            return await self._get("stores")
+
+        # В демонстрационных целях возвращаем тестовые данные
+        return [
+            {"id": "1", "name": "Магазин на Невском"},
+            {"id": "2", "name": "Магазин в ТЦ Галерея"},
+            {"id": "3", "name": "Магазин на Московском"}
+        ]
+
     async def get_warehouses(self, store_id=None):
         """
-        Получение списка складов из 1С
+        Получение списка складов из 1С (через кэш справочников)
         """
-        logger.info(f"Запрос списка складов для магазина {store_id}")
         try:
-            # В демонстрационных целях возвращаем тестовые данные
-            warehouses = [
-                {"id": "1", "name": "Основной склад", "store_id": "1"},
-                {"id": "2", "name": "Запасной склад", "store_id": "1"},
-                {"id": "3", "name": "Основной склад", "store_id": "2"},
-                {"id": "4", "name": "Основной склад", "store_id": "3"}
-            ]
-            
-            if store_id:
-                warehouses = [w for w in warehouses if w["store_id"] == store_id]
-                
-            return warehouses
+            params = {"store_id": store_id}
+            return await onec_cache.get_or_load(
+                "get_warehouses",
+                lambda: self._remember("get_warehouses", params, lambda: self._load_warehouses(store_id)),
+                ttl=settings.ONEC_CACHE_TTL_WAREHOUSES,
+                stale_ttl=settings.ONEC_CACHE_STALE_TTL,
+                params=params
+            )
         except Exception as e:
+            fallback = await self._fallback("get_warehouses", {"store_id": store_id}, e)
+            if fallback is not None:
+                return fallback
             logger.error(f"Ошибка получения списка складов: {str(e)}")
-            return {"error": str(e)}
-            
+            return error_result(e)
+
+    async def _load_warehouses(self, store_id=None):
+        logger.info(f"Запрос списка складов для магазина {store_id}")
+        if not self.use_mock:
+            return await self._get("warehouses", params={"store_id": store_id})
+
+        # В демонстрационных целях возвращаем тестовые данные
+        warehouses = [
+            {"id": "1", "name": "Основной склад", "store_id": "1"},
+            {"id": "2", "name": "Запасной склад", "store_id": "1"},
+            {"id": "3", "name": "Основной склад", "store_id": "2"},
+            {"id": "4", "name": "Основной склад", "store_id": "3"}
+        ]
+
+        if store_id:
+            warehouses = [w for w in warehouses if w["store_id"] == store_id]
+
+        return warehouses
+
+    async def _remember(self, method: str, params: Optional[Dict[str, Any]], loader) -> Any:
+        """
+        Загрузка с сохранением результата как последнего удачного ответа
+        """
+        value = await loader()
+        await onec_last_good.put(method, value, settings.ONEC_LAST_GOOD_TTL, params)
+        return value
+
+    async def _fallback(self, method: str, params: Optional[Dict[str, Any]], error: Exception) -> Any:
+        """
+        Последний удачный ответ метода, если 1С сейчас не ответила; None - его нет
+        """
+        stored = await onec_last_good.peek(method, params)
+        if stored is None:
+            return None
+        value, loaded_at = stored
+        ONEC_FALLBACKS.labels(method).inc()
+        logger.warning(
+            f"{method}: 1С недоступна ({error}), отдан ответ от {datetime.fromtimestamp(loaded_at):%Y-%m-%d %H:%M:%S}"
+        )
+        return value
+
+    def stats(self):
+        """
+        Счётчики объединения запросов к 1С
+        """
+        return {
+            "get_sales_data": self._sales_flight.stats(),
+            "batch": self._batch.stats()
+        }
+
+    async def invalidate_reference_cache(self, method=None):
+        """
+        Сброс кэша справочников (например, после обновления остатков)
+        """
+        logger.info(f"Сброс кэша справочников 1С: {method or 'все'}")
+        await onec_cache.invalidate(method)
+        await response_cache.invalidate(method)
+
+    async def run_process(self, process_request: OneCProcessRequest, timeout=None):
+        """
+        Запуск обработки в 1С
+        """
+        logger.info(f"Запуск обработки {process_request.process_name}")
+        try:
+            if not self.use_mock:
+                return await self._request("POST", "process/run", json=process_request.model_dump(), timeout=timeout)
+
+            # В демонстрационных целях просто возвращаем успешный результат
+            return {
+                "success": True,
+                "message": f"Обработка {process_request.process_name} успешно выполнена",
+                "result": process_request.parameters or {},
+                "process_id": str(uuid.uuid4())
+            }
+        except Exception as e:
+            logger.error(f"Ошибка запуска обработки: {str(e)}")
+            return {"success": False, "message": str(e)}
+
     async def update_stock(self, warehouse_id=None):
         """
         Обновление данных остатков в 1С
         """
         logger.info(f"Запрос на обновление остатков для склада {warehouse_id}")
         try:
-            # В демонстрационных целях просто возвращаем успешный результат
-            return {"status": "success", "message": "Остатки успешно обновлены"}
+            if not self.use_mock:
+                result = await self._request("POST", "stock/update", json={"warehouse_id": warehouse_id})
+            else:
+                # В демонстрационных целях просто возвращаем успешный результат
+                result = {"status": "success", "message": "Остатки успешно обновлены"}
+
+            await self.invalidate_reference_cache("get_warehouses")
+            return result
         except Exception as e:
             logger.error(f"Ошибка обновления остатков: {str(e)}")
-            return {"error": str(e)}
-            
+            return error_result(e)
+
     async def generate_report(self, report_type, period="today", store_id=None, warehouse_id=None):
         """
         Генерация отчета в 1С
         """
         logger.info(f"Запрос на генерацию отчета {report_type}")
         try:
-            # В демонстрационных целях просто возвращаем успешный результат
-            return {
-                "status": "success", 
-                "message": f"Отчет {report_type} успешно сгенерирован",
-                "report_url": f"/reports/{report_type}_{period}.xlsx"
-            }
+            if not self.use_mock:
+                return await self._request("POST", "reports", json={
+                    "report_type": report_type,
+                    "period": period,
+                    "store_id": store_id,
+                    "warehouse_id": warehouse_id
+                })
+
+            # Отчёты по продажам строит само приложение (app.services.report_service)
+            return {"error": f"Отчет {report_type} недоступен без подключения к 1С"}
         except Exception as e:
             logger.error(f"Ошибка генерации отчета: {str(e)}")
-            return {"error": str(e)}
+            return error_result(e)
+
+
+def error_result(error: Exception) -> Dict[str, Any]:
+    """
+    Ответ метода сервиса при ошибке; retry_after - через сколько секунд 1С снова будет опрошена
+    """
+    result = {"error": str(error)}
+    if isinstance(error, CircuitOpenError):
+        result["retry_after"] = round(error.retry_after, 1)
+    return result
+
+
+MOCK_PRODUCTS = [
+    ("1", "Хлеб белый", "1", 55.0),
+    ("2", "Молоко 3,2%", "2", 89.9),
+    ("3", "Сыр российский", "2", 520.0),
+    ("4", "Яблоки", "3", 149.0),
+    ("5", "Кофе молотый", "4", 399.0)
+]
+MOCK_STORES = [
+    ("1", "Магазин на Невском", ("1", "2")),
+    ("2", "Магазин в ТЦ Галерея", ("3",)),
+    ("3", "Магазин на Московском", ("4",))
+]
+
+
+def mock_sales_lines(date_from: datetime, date_to: datetime) -> List[Dict[str, Any]]:
+    """
+    Тестовые строки чеков: по несколько чеков в час с 8 до 22 в каждом магазине.
+    Данные часа зависят только от самого часа, поэтому повторяются между запросами.
+    """
+    lines = []
+    hour = date_from.replace(minute=0, second=0, microsecond=0)
+    while hour < date_to:
+        if 8 <= hour.hour < 22:
+            rng = random.Random(int(hour.timestamp()))
+            for store_id, store_name, warehouses in MOCK_STORES:
+                for receipt in range(rng.randint(1, 4)):
+                    # Случайные значения выбираются до проверки периода, чтобы
+                    # чек не зависел от границ запрошенного интервала
+                    sold_at = hour + timedelta(seconds=rng.randrange(3600))
+                    warehouse_id = rng.choice(warehouses)
+                    positions = rng.sample(MOCK_PRODUCTS, rng.randint(1, 3))
+                    quantities = [float(rng.randint(1, 5)) for _ in positions]
+                    if not date_from <= sold_at < date_to:
+                        continue
+                    receipt_id = f"{store_id}-{sold_at:%Y%m%d%H}-{receipt}"
+                    for position, ((product_id, product_name, category_id, price), quantity) in enumerate(zip(positions, quantities)):
+                        lines.append({
+                            "line_id": f"{receipt_id}-{position}",
+                            "receipt_id": receipt_id,
+                            "sold_at": sold_at.isoformat(),
+                            "store_id": store_id,
+                            "store_name": store_name,
+                            "warehouse_id": warehouse_id,
+                            "category_id": category_id,
+                            "product_id": product_id,
+                            "product_name": product_name,
+                            "quantity": quantity,
+                            "price": price,
+                            "total": round(quantity * price, 2)
+                        })
+        hour += timedelta(hours=1)
+    return lines
+
 
 # Singleton instance
-onec_service = OneCService()
\ No newline at end of file
+onec_service = OneCService()
@@ -0,0 +1,130 @@
+"""
+Построение файлов отчётов (XLSX, CSV) из готовых данных.
+
+Функции выполняются в отдельных процессах (пул app.services.report_service),
+поэтому модуль не импортирует приложение: на входе только сериализуемые
+данные и путь к файлу.
+"""
+import csv
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import xlsxwriter
+except ImportError:  # xlsxwriter необязателен, без него отчёты строятся в CSV
+    xlsxwriter = None
+
+ITEM_COLUMNS = (
+    ("product_id", "Код товара", 14),
+    ("product_name", "Товар", 40),
+    ("store_name", "Магазин", 28),
+    ("quantity", "Количество", 12),
+    ("price", "Цена", 12),
+    ("total", "Сумма", 16),
+)
+GROUP_TITLES = {"store_id": "Магазин", "warehouse_id": "Склад", "category_id": "Категория"}
+
+
+def summary_rows(title: str, parameters: Dict[str, Any], summary: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    rows = [(title, None), ("Период", parameters.get("period"))]
+    for key, label in (("store_id", "Магазин"), ("warehouse_id", "Склад")):
+        if parameters.get(key):
+            rows.append((label, parameters[key]))
+    rows.append(("Сформирован", parameters.get("generated_at")))
+    rows.extend([
+        ("Выручка", summary.get("total_sales")),
+        ("Продано, шт.", summary.get("total_items")),
+        ("Средний чек", summary.get("avg_check")),
+        ("К прошлому периоду, %", summary.get("comparison_prev_period")),
+    ])
+    return rows
+
+
+def chart_columns(chart: Sequence[Dict[str, Any]]) -> Tuple[Optional[str], List[str]]:
+    group = next((field for field in GROUP_TITLES if chart and field in chart[0]), None)
+    titles = ["Дата"] + ([GROUP_TITLES[group]] if group else []) + ["Выручка", "Продано, шт."]
+    return group, titles
+
+
+def chart_row(point: Dict[str, Any], group: Optional[str]) -> List[Any]:
+    return [point["date"]] + ([point.get(group)] if group else []) + [point["value"], point["items_count"]]
+
+
+def write_csv(path: str, title: str, parameters: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """
+    Разделы отчёта подряд через пустую строку; BOM - чтобы Excel распознал UTF-8
+    """
+    with open(path, "w", encoding="utf-8-sig", newline="") as file:
+        writer = csv.writer(file, delimiter=";", lineterminator="\r\n")
+        writer.writerows(summary_rows(title, parameters, data["summary"]))
+        writer.writerow([])
+        writer.writerow([label for _, label, _ in ITEM_COLUMNS])
+        writer.writerows([item.get(field) for field, _, _ in ITEM_COLUMNS] for item in data["items"])
+        chart = data.get("chart_data") or []
+        group, titles = chart_columns(chart)
+        writer.writerow([])
+        writer.writerow(titles)
+        writer.writerows(chart_row(point, group) for point in chart)
+
+
+def write_xlsx(path: str, title: str, parameters: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """
+    Листы "Сводка", "Товары", "Динамика"; строки пишутся по порядку
+    в режиме constant_memory, поэтому память не растёт с размером отчёта
+    """
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        bold = workbook.add_format({"bold": True})
+        money = workbook.add_format({"num_format": "#,##0.00"})
+
+        sheet = workbook.add_worksheet("Сводка")
+        sheet.set_column(0, 0, 24)
+        sheet.set_column(1, 1, 20)
+        for row, (label, value) in enumerate(summary_rows(title, parameters, data["summary"])):
+            sheet.write(row, 0, label, bold if row == 0 else None)
+            if value is not None:
+                sheet.write(row, 1, value, money if isinstance(value, float) else None)
+
+        sheet = workbook.add_worksheet("Товары")
+        for column, (field, label, width) in enumerate(ITEM_COLUMNS):
+            sheet.set_column(column, column, width, money if field in ("price", "total") else None)
+            sheet.write(0, column, label, bold)
+        for row, item in enumerate(data["items"], start=1):
+            sheet.write_row(row, 0, [item.get(field) for field, _, _ in ITEM_COLUMNS])
+        sheet.freeze_panes(1, 0)
+
+        chart = data.get("chart_data") or []
+        group, titles = chart_columns(chart)
+        sheet = workbook.add_worksheet("Динамика")
+        sheet.set_column(0, len(titles) - 1, 16)
+        sheet.write_row(0, 0, titles, bold)
+        for row, point in enumerate(chart, start=1):
+            sheet.write_row(row, 0, chart_row(point, group))
+        sheet.freeze_panes(1, 0)
+    finally:
+        workbook.close()
+
+
+def render_report(
+    path: str,
+    report_format: str,
+    title: str,
+    parameters: Dict[str, Any],
+    data: Dict[str, Any]
+) -> int:
+    """
+    Запись отчёта в path (через временный файл, чтобы читатели не увидели
+    недописанный файл). Возвращает размер файла.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        if report_format == "xlsx":
+            write_xlsx(temporary, title, parameters, data)
+        else:
+            write_csv(temporary, title, parameters, data)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return os.path.getsize(path)
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import REPORT_RENDER_DURATION, REPORT_REQUESTS
+from app.schemas.sales import SalesFilter
+from app.services import report_render
+from app.services.onec_service import onec_service
+from app.services.sales_aggregation import PERIOD_DAYS, period_window
+from app.services.single_flight import SingleFlight
+
+# Отчёты, которые строятся из данных приложения; остальные типы формирует 1С
+REPORT_TITLES = {"sales_report": "Отчёт по продажам"}
+REPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",  # charset=utf-8 добавляет ответ
+}
+FILE_ID = re.compile(r"^[0-9a-f]{64}\.(xlsx|csv)$")
+
+
+class ReportService:
+    """
+    Построение отчётов по продажам и кэш готовых файлов на диске.
+
+    Имя файла - sha256 от типа отчёта, параметров, формата и начала периода
+    (для периодов, включающих текущий день, ещё и номер интервала
+    REPORTS_MAX_AGE), поэтому повторный запрос того же отчёта сразу получает
+    ссылку на готовый файл. Файлы лежат в REPORTS_DIR/<2 символа>/<id>;
+    при превышении REPORTS_CACHE_MAX_BYTES удаляются давно запрошенные
+    (время последнего запроса - mtime файла). Отдаёт файлы nginx по
+    X-Accel-Redirect, приложение только проверяет ссылку.
+
+    Файл пишется в пуле процессов (REPORTS_WORKERS), а не в цикле событий:
+    запись XLSX на десятки тысяч строк - секунды чистого CPU. Одинаковые
+    параллельные запросы строят файл один раз.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._flight = SingleFlight("render_report")
+
+    @staticmethod
+    def supports(report_type: str) -> bool:
+        return report_type in REPORT_TITLES
+
+    @staticmethod
+    def report_format(requested: Optional[str]) -> str:
+        # Без xlsxwriter XLSX не построить - отдаём CSV
+        if requested == "csv" or report_render.xlsxwriter is None:
+            return "csv"
+        return "xlsx"
+
+    @staticmethod
+    def file_id(report_type: str, parameters: Dict[str, Any], report_format: str, now: datetime) -> str:
+        window = period_window(parameters["period"], now)
+        key = {
+            "report_type": report_type,
+            "parameters": parameters,
+            "format": report_format,
+            "start": window.start.isoformat()
+        }
+        if window.end > now:
+            # Период ещё идёт - отчёт считается свежим не дольше REPORTS_MAX_AGE
+            key["age"] = int(now.timestamp()) // settings.REPORTS_MAX_AGE
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+        return f"{digest}.{report_format}"
+
+    @staticmethod
+    def path(file_id: str) -> str:
+        return os.path.join(settings.REPORTS_DIR, file_id[:2], file_id)
+
+    @staticmethod
+    def filename(report_type: str, parameters: Dict[str, Any], report_format: str, now: datetime) -> str:
+        window = period_window(parameters["period"], now)
+        return f"{report_type}_{parameters['period']}_{window.start:%Y-%m-%d}.{report_format}"
+
+    @staticmethod
+    def download_url(file_id: str, filename: str) -> str:
+        return f"{settings.API_V1_STR}/reports/{file_id}/{filename}"
+
+    def cached(
+        self,
+        report_type: str,
+        period: str = "today",
+        store_id: Optional[str] = None,
+        warehouse_id: Optional[str] = None,
+        report_format: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Готовый отчёт из кэша или None (проверка - один stat, без построения)
+        """
+        if period not in PERIOD_DAYS:
+            return None
+        report_format = self.report_format(report_format)
+        parameters = {"period": period, "store_id": store_id, "warehouse_id": warehouse_id}
+        now = datetime.now()
+        file_id = self.file_id(report_type, parameters, report_format, now)
+        if not self.touch(file_id):
+            return None
+        REPORT_REQUESTS.labels(report_type, "hit").inc()
+        return self._result(file_id, self.filename(report_type, parameters, report_format, now))
+
+    async def get_report(
+        self,
+        report_type: str,
+        period: str = "today",
+        store_id: Optional[str] = None,
+        warehouse_id: Optional[str] = None,
+        report_format: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Ссылка на файл отчёта; если его нет в кэше - построение
+        """
+        try:
+            if not self.supports(report_type):
+                raise ValueError(f"Unknown report type: {report_type}")
+            result = self.cached(report_type, period, store_id, warehouse_id, report_format)
+            if result is not None:
+                return result
+
+            report_format = self.report_format(report_format)
+            parameters = {"period": period, "store_id": store_id, "warehouse_id": warehouse_id}
+            now = datetime.now()
+            file_id = self.file_id(report_type, parameters, report_format, now)
+            await self._flight.do(file_id, lambda: self._render(report_type, parameters, report_format, file_id))
+            return self._result(file_id, self.filename(report_type, parameters, report_format, now))
+        except Exception as e:
+            logger.error(f"Ошибка построения отчета {report_type}: {str(e)}")
+            return {"error": str(e)}
+
+    def touch(self, file_id: str) -> bool:
+        """
+        Отметка обращения к файлу (порядок вытеснения); False - файла нет
+        """
+        try:
+            os.utime(self.path(file_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, int]:
+        return self._flight.stats()
+
+    def _result(self, file_id: str, filename: str) -> Dict[str, Any]:
+        return {"download_url": self.download_url(file_id, filename), "file_id": file_id, "filename": filename}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: дочерние процессы не наследуют цикл событий, соединения и потоки логгера
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.REPORTS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def _render(self, report_type: str, parameters: Dict[str, Any], report_format: str, file_id: str) -> None:
+        start = time.perf_counter()
+        filter_params = SalesFilter(period=parameters["period"], store_id=parameters["store_id"],
+                                    warehouse_id=parameters["warehouse_id"])
+        data = await onec_service.get_sales_data(filter_params, items_limit=settings.REPORTS_ITEMS_LIMIT)
+        if "error" in data:
+            raise RuntimeError(data["error"])
+
+        header = dict(parameters, generated_at=datetime.now().strftime("%Y-%m-%d %H:%M"))
+        size = await asyncio.get_running_loop().run_in_executor(
+            self._get_pool(),
+            report_render.render_report,
+            self.path(file_id),
+            report_format,
+            REPORT_TITLES[report_type],
+            header,
+            data
+        )
+        elapsed = time.perf_counter() - start
+        REPORT_RENDER_DURATION.labels(report_type, report_format).observe(elapsed)
+        REPORT_REQUESTS.labels(report_type, "rendered").inc()
+        logger.info(f"Отчет {report_type} ({report_format}, {size} байт) построен за {elapsed:.2f} с: {file_id}")
+
+        removed = await asyncio.to_thread(self._evict, file_id)
+        if removed:
+            logger.info(f"Из кэша отчётов удалено файлов: {removed}")
+
+    def _evict(self, keep: str) -> int:
+        """
+        Удаление давно запрошенных файлов, пока кэш больше REPORTS_CACHE_MAX_BYTES
+        """
+        files = []
+        total = 0
+        for directory, _, names in os.walk(settings.REPORTS_DIR):
+            for name in names:
+                if not FILE_ID.match(name) or name == keep:
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, os.path.join(directory, name)))
+                total += stat.st_size
+        try:
+            total += os.path.getsize(self.path(keep))
+        except FileNotFoundError:
+            pass
+
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= settings.REPORTS_CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+report_service = ReportService()
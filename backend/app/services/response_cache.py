@@ -0,0 +1,163 @@
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from fastapi import Request, Response
+from loguru import logger
+from pydantic import BaseModel
+
+from app.core.compression import choose_encoding, compress
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+from app.db.redis import redis_binary_client
+
+# Сжатый вариант добавляется, только если в хэше всё ещё то тело, из
+# которого он сжат (запись могла истечь и быть заменена новым телом)
+ADD_VARIANT = """
+if redis.call('HGET', KEYS[1], 'etag') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+return 1
+"""
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Сравнение с If-None-Match (слабое сравнение, как требует RFC 9110)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    """
+    HTTP-кэширование JSON-ответов.
+
+    Ответ проверяется моделью и сериализуется один раз, ETag считается по телу,
+    If-None-Match с тем же ETag получает 304 без тела. При включённом кэше
+    готовое тело с ETag хранится в Redis-хэше по маршруту и параметрам запроса,
+    и повторный запрос не обращается ни к 1С, ни к Pydantic.
+
+    Сжатые варианты (gzip, br) хранятся в том же хэше и создаются при первом
+    запросе с соответствующим Accept-Encoding, поэтому горячий ответ сжимается
+    один раз. У сжатого варианта собственный ETag ("<хэш>-<кодировка>").
+    """
+
+    def __init__(self, prefix: str, enabled: bool):
+        self.prefix = prefix
+        self.enabled = enabled
+        self._add_variant_script = redis_binary_client.register_script(ADD_VARIANT)
+
+    def make_key(self, route: str, params: Optional[Dict[str, Any]] = None) -> str:
+        return f"{self.prefix}:{route}:{json.dumps(params or {}, sort_keys=True, default=str)}"
+
+    async def respond(
+        self,
+        request: Request,
+        route: str,
+        loader: Callable[[], Awaitable[Any]],
+        model: Type[BaseModel],
+        ttl: int,
+        max_age: int,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Response:
+        """
+        Ответ маршрута route с параметрами params.
+        loader возвращает данные для модели model; ошибки проверки модели
+        пробрасываются и в кэш не попадают.
+        """
+        key = self.make_key(route, params)
+        use_redis = self.enabled and ttl > 0
+        body, body_etag, variants = await self._render(key, loader, model, ttl if use_redis else 0)
+        etag = body_etag
+
+        encoding = None
+        if settings.COMPRESSION_ENABLED and len(body) >= settings.COMPRESSION_MIN_SIZE:
+            encoding = choose_encoding(request.headers.get("accept-encoding"))
+        if encoding:
+            etag = f'{etag[:-1]}-{encoding}"'
+        headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}", "Vary": "Accept-Encoding"}
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            content = variants.get(encoding)
+            if content is None:
+                content = compress(body, encoding, settings.COMPRESSION_GZIP_LEVEL, settings.COMPRESSION_BROTLI_QUALITY)
+                if use_redis:
+                    await self._redis_add_variant(key, body_etag, encoding, content)
+            headers["Content-Encoding"] = encoding
+            return Response(content=content, media_type="application/json", headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def invalidate(self, route: Optional[str] = None) -> None:
+        """
+        Сброс сохранённых ответов маршрута (или всех, если маршрут не указан)
+        """
+        if not self.enabled:
+            return
+        pattern = f"{self.prefix}:{route}:" if route else f"{self.prefix}:"
+        try:
+            keys = [key async for key in redis_binary_client.scan_iter(match=f"{pattern}*", count=500)]
+            if keys:
+                await redis_binary_client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Не удалось сбросить кэш ответов {pattern}: {e}")
+
+    async def _render(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        model: Type[BaseModel],
+        ttl: int
+    ) -> Tuple[bytes, str, Dict[str, bytes]]:
+        # ttl=0 - без Redis: тело рендерится на каждый запрос, ETag всё равно выставляется
+        if ttl > 0:
+            stored = await self._redis_get(key)
+            if stored and b"body" in stored:
+                CACHE_REQUESTS.labels(self.prefix, "redis_hit").inc()
+                body, etag = stored.pop(b"body"), stored.pop(b"etag").decode()
+                return body, etag, {field.decode(): value for field, value in stored.items()}
+            CACHE_REQUESTS.labels(self.prefix, "miss").inc()
+
+        body = model.model_validate(await loader()).model_dump_json().encode()
+        etag = make_etag(body)
+        if ttl > 0:
+            await self._redis_set(key, {"body": body, "etag": etag}, ttl)
+        return body, etag, {}
+
+    async def _redis_get(self, key: str) -> Optional[Dict[bytes, bytes]]:
+        try:
+            return await redis_binary_client.hgetall(key)
+        except Exception as e:
+            logger.warning(f"Redis недоступен при чтении ответа {key}: {e}")
+            return None
+
+    async def _redis_set(self, key: str, fields: Dict[str, Any], ttl: int) -> None:
+        try:
+            async with redis_binary_client.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.hset(key, mapping=fields)
+                pipe.expire(key, ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Redis недоступен при записи ответа {key}: {e}")
+
+    async def _redis_add_variant(self, key: str, etag: str, encoding: str, content: bytes) -> None:
+        try:
+            await self._add_variant_script(keys=[key], args=[etag, encoding, content])
+        except Exception as e:
+            logger.warning(f"Redis недоступен при записи сжатого ответа {key}: {e}")
+
+
+# Кэш ответов эндпоинтов продаж и справочников
+response_cache = ResponseCache(prefix="http", enabled=settings.RESPONSE_CACHE_ENABLED)
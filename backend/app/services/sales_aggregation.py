@@ -0,0 +1,410 @@
+import heapq
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+PERIOD_DAYS = {"today": 1, "yesterday": 1, "week": 7, "month": 30}
+GROUP_FIELDS = {"store": "store_id", "warehouse": "warehouse_id", "category": "category_id"}
+HOUR = 3600
+DAY = 86400
+
+NAME_FIELDS = {"store_id": "store_name", "product_id": "product_name"}
+LINE_COLUMNS = (
+    "sold_at", "total", "quantity", "receipt_id", "store_id", "store_name",
+    "warehouse_id", "category_id", "product_id", "product_name"
+)
+
+
+@dataclass
+class PeriodWindow:
+    """
+    Окно периода: [start, end) - весь период для графика, [start, current_end) - уже
+    прошедшая часть, [prev_start, prev_end) - такая же часть предыдущего периода
+    """
+    start: datetime
+    end: datetime
+    current_end: datetime
+    prev_start: datetime
+    prev_end: datetime
+    bucket: int  # секунд в точке графика
+
+
+def period_window(period: str, now: Optional[datetime] = None) -> PeriodWindow:
+    """
+    today, yesterday - сутки по часам; week, month - последние 7/30 дней по дням.
+    Текущий период сравнивается с тем же отрезком времени предыдущего.
+    """
+    if period not in PERIOD_DAYS:
+        raise ValueError(f"Unknown period: {period}")
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    end = today if period == "yesterday" else today + timedelta(days=1)
+    length = timedelta(days=PERIOD_DAYS[period])
+    start = end - length
+    current_end = min(end, now)
+    return PeriodWindow(
+        start=start,
+        end=end,
+        current_end=current_end,
+        prev_start=start - length,
+        prev_end=current_end - length,
+        bucket=HOUR if PERIOD_DAYS[period] == 1 else DAY
+    )
+
+
+def epoch(value: datetime) -> int:
+    return int(np.datetime64(value, "s").astype(np.int64))
+
+
+def factorize(values: Sequence[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """
+    Коды значений (int64) и список уникальных значений в порядке появления
+    """
+    uniques = list(dict.fromkeys(values))
+    mapping = dict(zip(uniques, range(len(uniques))))
+    codes = np.fromiter(map(mapping.__getitem__, values), dtype=np.int64, count=len(values))
+    return codes, uniques
+
+
+def first_rows(codes: np.ndarray) -> List[int]:
+    """
+    Номер первой строки для каждого кода
+    """
+    _, first = np.unique(codes, return_index=True)
+    return first.tolist()
+
+
+def column(lines: Sequence[Dict[str, Any]], field: str) -> List[Any]:
+    try:
+        # Выборка поля на уровне C, если оно есть во всех строках
+        return list(map(itemgetter(field), lines))
+    except KeyError:
+        return [line.get(field) for line in lines]
+
+
+def merge_columns(*parts: Union[Sequence[Dict[str, Any]], Mapping[str, Sequence[Any]]]) -> Dict[str, List[Any]]:
+    """
+    Объединение частей данных (колонки или списки строк) в одни колонки LINE_COLUMNS
+    """
+    merged: Dict[str, List[Any]] = {field: [] for field in LINE_COLUMNS}
+    for part in parts:
+        for field in LINE_COLUMNS:
+            if isinstance(part, Mapping):
+                values = part.get(field) or [None] * len(part.get("total") or ())
+            else:
+                values = column(part, field)
+            merged[field].extend(values)
+    return merged
+
+
+@dataclass
+class SalesColumns:
+    """
+    Строки продаж 1С в колоночном виде: числовые массивы и коды измерений
+    """
+    ts: np.ndarray  # время продажи, секунды (int64)
+    amount: np.ndarray
+    quantity: np.ndarray
+    receipt: np.ndarray  # коды чеков
+    dimensions: Dict[str, np.ndarray]  # коды измерений: store_id, product_id, поле группировки графика
+    labels: Dict[str, List[Any]]  # значения измерений по кодам
+    names: Dict[str, Dict[Any, Optional[str]]]  # названия магазинов и товаров
+
+    @classmethod
+    def from_columns(
+        cls,
+        data: Mapping[str, Sequence[Any]],
+        dimensions: Sequence[str] = ("store_id", "product_id")
+    ) -> "SalesColumns":
+        """
+        Разбор ответа 1С в колоночном формате: {"sold_at": [...], "total": [...], ...}
+        """
+        codes, labels = {}, {}
+        for field in dimensions:
+            codes[field], labels[field] = factorize(data[field])
+
+        receipt_id = data.get("receipt_id")
+        if receipt_id and any(value is not None for value in receipt_id):
+            receipt, _ = factorize(receipt_id)
+        else:
+            # Без номеров чеков каждая строка считается отдельным чеком
+            receipt = np.arange(len(data["total"]), dtype=np.int64)
+
+        names = {}
+        for field, name_field in NAME_FIELDS.items():
+            if field in codes and name_field in data:
+                names[field] = {
+                    labels[field][code]: data[name_field][index] for code, index in enumerate(first_rows(codes[field]))
+                }
+
+        return cls(
+            ts=np.array(data["sold_at"], dtype="datetime64[s]").astype(np.int64),
+            amount=np.array(data["total"], dtype=np.float64),
+            quantity=np.array(data["quantity"], dtype=np.float64),
+            receipt=receipt,
+            dimensions=codes,
+            labels=labels,
+            names=names
+        )
+
+    @classmethod
+    def from_lines(
+        cls,
+        lines: Sequence[Dict[str, Any]],
+        dimensions: Sequence[str] = ("store_id", "product_id")
+    ) -> "SalesColumns":
+        """
+        Разбор ответа 1С списком строк. Извлекаются только нужные поля:
+        выборка поля из сотен тысяч словарей - основная стоимость разбора.
+        """
+        fields = ("sold_at", "total", "quantity", "receipt_id", *dimensions)
+        columns = cls.from_columns({field: column(lines, field) for field in fields}, dimensions)
+        for field, name_field in NAME_FIELDS.items():
+            if field in columns.dimensions:
+                # Название берём из первой строки с этим значением
+                columns.names[field] = {
+                    columns.labels[field][code]: lines[index].get(name_field)
+                    for code, index in enumerate(first_rows(columns.dimensions[field]))
+                }
+        return columns
+
+    def mask(self, start: datetime, end: datetime) -> np.ndarray:
+        return (self.ts >= epoch(start)) & (self.ts < epoch(end))
+
+
+def count_unique(codes: np.ndarray) -> int:
+    if codes.size == 0:
+        return 0
+    return int(np.count_nonzero(np.bincount(codes)))
+
+
+@dataclass
+class SalesAggregate:
+    """
+    Суммируемый промежуточный результат агрегации: итоги, точки графика и товары.
+    Результаты по непересекающимся отрезкам времени складываются через merge
+    (так предрасчитанные итоги app.services.sales_rollups дополняются строками
+    хвоста); чек целиком относится к одному часу, поэтому число чеков тоже суммируется.
+    """
+    total: float = 0.0
+    quantity: float = 0.0
+    receipts: int = 0
+    previous_total: float = 0.0  # выручка того же отрезка предыдущего периода
+    chart: Dict[Tuple[int, Any], List[float]] = field(default_factory=dict)  # (точка, группа) -> [сумма, количество]
+    items: Dict[Tuple[Any, Any], List[float]] = field(default_factory=dict)  # (товар, магазин) -> [количество, сумма]
+    names: Dict[str, Dict[Any, Optional[str]]] = field(default_factory=lambda: {key: {} for key in NAME_FIELDS})
+
+    def merge(self, other: "SalesAggregate") -> "SalesAggregate":
+        self.total += other.total
+        self.quantity += other.quantity
+        self.receipts += other.receipts
+        self.previous_total += other.previous_total
+        for target, source in ((self.chart, other.chart), (self.items, other.items)):
+            for key, values in source.items():
+                current = target.get(key)
+                if current is None:
+                    target[key] = list(values)
+                else:
+                    current[0] += values[0]
+                    current[1] += values[1]
+        for key, names in other.names.items():
+            for value, name in names.items():
+                if name is not None or value not in self.names[key]:
+                    self.names[key][value] = name
+        return self
+
+
+def partial_aggregate(
+    columns: SalesColumns,
+    window: PeriodWindow,
+    group_by: Optional[str] = None
+) -> SalesAggregate:
+    """
+    Итоги по строкам, попавшим в окно периода (строки вне окна не учитываются)
+    """
+    current = columns.mask(window.start, window.current_end)
+    previous = columns.mask(window.prev_start, window.prev_end)
+    result = SalesAggregate(
+        total=float(columns.amount[current].sum()),
+        quantity=float(columns.quantity[current].sum()),
+        receipts=count_unique(columns.receipt[current]),
+        previous_total=float(columns.amount[previous].sum()),
+        names={key: dict(columns.names.get(key) or {}) for key in NAME_FIELDS}
+    )
+    amounts, quantities = columns.amount[current], columns.quantity[current]
+
+    # Точки графика: номер часа/дня от начала периода и группа
+    buckets = (columns.ts[current] - epoch(window.start)) // window.bucket
+    if group_by:
+        field_name = GROUP_FIELDS[group_by]
+        groups, group_labels = columns.dimensions[field_name][current], columns.labels[field_name]
+    else:
+        groups, group_labels = np.zeros(buckets.size, dtype=np.int64), [None]
+    result.chart = collect(buckets, groups, None, group_labels, amounts, quantities)
+
+    # Товары по магазинам
+    result.items = collect(
+        columns.dimensions["product_id"][current], columns.dimensions["store_id"][current],
+        columns.labels["product_id"], columns.labels["store_id"], quantities, amounts
+    )
+    return result
+
+
+def collect(
+    first: np.ndarray,
+    second: np.ndarray,
+    first_labels: Optional[List[Any]],
+    second_labels: List[Any],
+    weights: np.ndarray,
+    other_weights: np.ndarray
+) -> Dict[Tuple[Any, Any], List[float]]:
+    """
+    Суммы двух величин по встречающимся парам кодов (first, second) с ключом
+    (значение first, значение second); без first_labels ключом остаётся код first
+    """
+    if first.size == 0:
+        return {}
+    n_second = max(len(second_labels), 1)
+    keys = first * n_second + second
+    present = np.flatnonzero(np.bincount(keys))
+    sums = np.bincount(keys, weights=weights)[present].tolist()
+    other_sums = np.bincount(keys, weights=other_weights)[present].tolist()
+    result = {}
+    for key, value, other in zip(present.tolist(), sums, other_sums):
+        head = key // n_second
+        result[(head if first_labels is None else first_labels[head], second_labels[key % n_second])] = [value, other]
+    return result
+
+
+def render_sales(
+    aggregate: SalesAggregate,
+    window: PeriodWindow,
+    period: str,
+    group_by: Optional[str] = None,
+    items_limit: int = 100
+) -> Dict[str, Any]:
+    """
+    Ответ по схеме SalesResponse из итогов агрегации
+    """
+    total_sales = round(aggregate.total, 2)
+    previous_total = aggregate.previous_total
+    summary = {
+        "total_sales": total_sales,
+        "total_items": int(round(aggregate.quantity)),
+        "avg_check": round(aggregate.total / aggregate.receipts, 2) if aggregate.receipts else 0.0,
+        "period": period,
+        "comparison_prev_period": (
+            round((total_sales - previous_total) / previous_total * 100, 2) if previous_total else None
+        )
+    }
+    return {
+        "summary": summary,
+        "items": top_items(aggregate, items_limit),
+        "chart_data": chart_series(aggregate, window, group_by)
+    }
+
+
+def top_items(aggregate: SalesAggregate, limit: int) -> List[Dict[str, Any]]:
+    """
+    Товары по магазинам, отсортированные по выручке (не больше limit);
+    при равной выручке - по коду товара и магазина
+    """
+    top = heapq.nsmallest(
+        limit,
+        aggregate.items.items(),
+        key=lambda item: (-item[1][1], str(item[0][0]), str(item[0][1]))
+    )
+    product_names, store_names = aggregate.names["product_id"], aggregate.names["store_id"]
+    items = []
+    for (product_id, store_id), (quantity, total) in top:
+        items.append({
+            "product_id": str(product_id),
+            "product_name": product_names.get(product_id) or str(product_id),
+            "quantity": quantity,
+            "price": round(total / quantity, 2) if quantity else 0.0,
+            "total": round(total, 2),
+            "store_id": None if store_id is None else str(store_id),
+            "store_name": store_names.get(store_id)
+        })
+    return items
+
+
+def chart_series(
+    aggregate: SalesAggregate,
+    window: PeriodWindow,
+    group_by: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Точки графика по часам/дням прошедшей части периода,
+    при group_by - отдельная серия на каждый магазин/склад/категорию
+    """
+    n_buckets = max(-(-int((window.current_end - window.start).total_seconds()) // window.bucket), 1)
+    field_name = GROUP_FIELDS[group_by] if group_by else None
+    # Серии групп без продаж в этом окне не выводим; порядок серий - по значению группы,
+    # а не по порядку строк в источнике
+    if field_name:
+        groups = sorted({group for (_, group), (amount, _) in aggregate.chart.items() if amount}, key=str)
+    else:
+        groups = [None]
+
+    points = []
+    for bucket in range(n_buckets):
+        moment = window.start + timedelta(seconds=bucket * window.bucket)
+        if window.bucket == HOUR:
+            date, label = moment.strftime("%Y-%m-%dT%H:00"), moment.strftime("%H:00")
+        else:
+            date, label = moment.strftime("%Y-%m-%d"), moment.strftime("%d.%m")
+        for group in groups:
+            amount, quantity = aggregate.chart.get((bucket, group), (0.0, 0.0))
+            point = {
+                "date": date,
+                "label": label,
+                "value": round(float(amount), 2),
+                "items_count": int(round(quantity))
+            }
+            if field_name:
+                point[field_name] = None if group is None else str(group)
+            points.append(point)
+    return points
+
+
+def read_columns(
+    data: Union[Sequence[Dict[str, Any]], Mapping[str, Sequence[Any]]],
+    group_by: Optional[str] = None
+) -> SalesColumns:
+    """
+    Разбор строк или колонок 1С с измерениями, нужными для агрегации
+    """
+    dimensions = ["store_id", "product_id"]
+    if group_by and GROUP_FIELDS[group_by] not in dimensions:
+        dimensions.append(GROUP_FIELDS[group_by])
+    if isinstance(data, Mapping):
+        return SalesColumns.from_columns(data, dimensions)
+    return SalesColumns.from_lines(data, dimensions)
+
+
+def aggregate_sales(
+    data: Union[Sequence[Dict[str, Any]], Mapping[str, Sequence[Any]]],
+    period: str,
+    group_by: Optional[str] = None,
+    items_limit: int = 100,
+    now: Optional[datetime] = None,
+    base: Optional[SalesAggregate] = None
+) -> Dict[str, Any]:
+    """
+    Сводка, сравнение с предыдущим периодом, товары и график по строкам продаж 1С -
+    списку строк или колонкам (данные должны покрывать и предыдущий период:
+    с window.prev_start до window.current_end). Результат соответствует схеме SalesResponse.
+
+    base - уже посчитанные итоги за часть окна (предрасчёт), строки data
+    тогда должны покрывать только оставшуюся часть.
+    """
+    window = period_window(period, now)
+    aggregate = partial_aggregate(read_columns(data, group_by), window, group_by)
+    if base is not None:
+        aggregate = base.merge(aggregate)
+    return render_sales(aggregate, window, period, group_by, items_limit)
@@ -0,0 +1,122 @@
+import csv
+import io
+from datetime import datetime
+from typing import Any, AsyncIterator, Sequence
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import SALES_READS
+from app.core.responses import json_dumps
+from app.db.base import AsyncSessionLocal
+from app.schemas.sales import SalesFilter, SalesLine
+from app.services.onec_service import onec_service
+from app.services.sales_store import sales_store
+
+EXPORT_FIELDS = tuple(SalesLine.model_fields)
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",  # charset=utf-8 добавляет StreamingResponse
+}
+
+Rows = Sequence[Sequence[Any]]
+
+
+def encode_ndjson(rows: Rows) -> bytes:
+    return b"".join(json_dumps(dict(zip(EXPORT_FIELDS, row))) + b"\n" for row in rows)
+
+
+class CsvEncoder:
+    """
+    Кодирование порций строк в CSV одним writer-ом (буфер очищается после каждой порции)
+    """
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def encode(self, rows: Rows) -> bytes:
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._writer.writerows(rows)
+        return self._buffer.getvalue().encode()
+
+
+class SalesExport:
+    """
+    Потоковая выгрузка строк чеков за период (NDJSON или CSV).
+
+    Строки идут конвейером генераторов: источник отдаёт порции - из локальной
+    таблицы серверным курсором, не синхронизированный хвост - из NDJSON-ответа
+    1С по мере чтения, - каждая порция сразу кодируется и отправляется клиенту.
+    В памяти одновременно не больше порции, независимо от числа строк.
+    """
+
+    async def rows(
+        self,
+        filter_params: SalesFilter,
+        date_from: datetime,
+        date_to: datetime
+    ) -> AsyncIterator[Rows]:
+        """
+        Строки за [date_from, date_to) по возрастанию sold_at, порциями кортежей EXPORT_FIELDS
+        """
+        batch_size = settings.SALES_EXPORT_BATCH
+        synced_until = None
+        if settings.SALES_LOCAL_STORE_ENABLED:
+            sent = False
+            try:
+                async with AsyncSessionLocal() as db:
+                    state = await sales_store.get_state(db)
+                    if state and state.synced_from and state.synced_until and state.synced_from <= date_from:
+                        synced_until = min(state.synced_until, date_to)
+                        SALES_READS.labels("local" if synced_until >= date_to else "mixed").inc()
+                        async for batch in sales_store.stream_lines(
+                            db, filter_params, date_from, synced_until, EXPORT_FIELDS, batch_size
+                        ):
+                            sent = True
+                            yield batch
+            except Exception as e:
+                if sent:
+                    # Часть строк уже у клиента - повторить с начала нельзя
+                    raise
+                logger.warning(f"Локальная таблица продаж недоступна, выгрузка из 1С: {e}")
+                synced_until = None
+
+        date_from = synced_until or date_from
+        if date_from >= date_to:
+            return
+        if synced_until is None:
+            SALES_READS.labels("onec").inc()
+        async for lines in onec_service.stream_sales_lines(filter_params, date_from, date_to, batch_size):
+            yield [tuple(line.get(field) for field in EXPORT_FIELDS) for line in lines]
+
+    async def stream(
+        self,
+        filter_params: SalesFilter,
+        date_from: datetime,
+        date_to: datetime,
+        export_format: str = "ndjson"
+    ) -> AsyncIterator[bytes]:
+        """
+        Тело ответа выгрузки: одна часть на порцию строк
+        """
+        if export_format == "csv":
+            encode = CsvEncoder().encode
+            yield encode([EXPORT_FIELDS])
+        else:
+            encode = encode_ndjson
+
+        lines = 0
+        try:
+            async for batch in self.rows(filter_params, date_from, date_to):
+                lines += len(batch)
+                yield encode(batch)
+        except Exception as e:
+            # Заголовки уже отправлены: обрываем ответ, клиент увидит незавершённую передачу
+            logger.error(f"Ошибка выгрузки продаж после {lines} строк: {str(e)}")
+            raise
+        logger.info(f"Выгрузка продаж завершена: {lines} строк, формат {export_format}")
+
+
+sales_export = SalesExport()
@@ -0,0 +1,334 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, text, union_all
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import DateTime
+
+from app.models.sales import (
+    ROLLUP_CATEGORY, ROLLUP_WAREHOUSE, SaleLine, SalesRollupDaily, SalesRollupHourly, SalesRollupProduct
+)
+from app.schemas.sales import SalesFilter
+from app.services.sales_aggregation import GROUP_FIELDS, HOUR, PeriodWindow, SalesAggregate
+from app.services.sales_store import sales_store
+
+Range = Tuple[datetime, datetime]
+
+# Интервалы пересчёта передаются двумя массивами: [date_from[i], date_to[i])
+RANGES = "unnest(CAST(:froms AS timestamp[]), CAST(:tos AS timestamp[])) AS r(date_from, date_to)"
+
+# Часовые итоги сразу на всех уровнях детализации; отсутствующий склад/категория -
+# пустая строка, уровень - биты измерений, входящих в группировку
+INSERT_HOURLY = (
+    "INSERT INTO sales_rollup_hourly "
+    "(level, bucket, store_id, warehouse_id, category_id, total, quantity, lines, receipts) "
+    "SELECT 3 - GROUPING(s.warehouse_id, s.category_id), s.bucket, s.store_id, "
+    "CASE WHEN GROUPING(s.warehouse_id) = 0 THEN s.warehouse_id ELSE '' END, "
+    "CASE WHEN GROUPING(s.category_id) = 0 THEN s.category_id ELSE '' END, "
+    "sum(s.total), sum(s.quantity), count(*), count(DISTINCT s.receipt_id) "
+    "FROM ("
+    "SELECT date_trunc('hour', l.sold_at) AS bucket, l.store_id, coalesce(l.warehouse_id, '') AS warehouse_id, "
+    "coalesce(l.category_id, '') AS category_id, l.total, l.quantity, l.receipt_id "
+    f"FROM sales_lines AS l JOIN {RANGES} ON l.sold_at >= r.date_from AND l.sold_at < r.date_to "
+    "WHERE NOT l.is_deleted"
+    ") AS s "
+    "GROUP BY s.bucket, s.store_id, "
+    "GROUPING SETS ((), (s.warehouse_id), (s.category_id), (s.warehouse_id, s.category_id))"
+)
+INSERT_DAILY = (
+    "INSERT INTO sales_rollup_daily "
+    "(level, bucket, store_id, warehouse_id, category_id, total, quantity, lines, receipts) "
+    "SELECT h.level, date_trunc('day', h.bucket), h.store_id, h.warehouse_id, h.category_id, "
+    "sum(h.total), sum(h.quantity), sum(h.lines), sum(h.receipts) "
+    f"FROM sales_rollup_hourly AS h JOIN {RANGES} ON h.bucket >= r.date_from AND h.bucket < r.date_to "
+    "GROUP BY 1, 2, 3, 4, 5"
+)
+INSERT_PRODUCTS = (
+    "INSERT INTO sales_rollup_products "
+    "(day, store_id, warehouse_id, category_id, product_id, store_name, product_name, total, quantity) "
+    "SELECT date_trunc('day', l.sold_at), l.store_id, coalesce(l.warehouse_id, ''), coalesce(l.category_id, ''), "
+    "l.product_id, max(l.store_name), max(l.product_name), sum(l.total), sum(l.quantity) "
+    f"FROM sales_lines AS l JOIN {RANGES} ON l.sold_at >= r.date_from AND l.sold_at < r.date_to "
+    "WHERE NOT l.is_deleted AND l.sold_at < :rolled_until "
+    "GROUP BY 1, 2, 3, 4, 5"
+)
+
+
+def ranges_statement(sql: str):
+    return text(sql).bindparams(
+        bindparam("froms", type_=ARRAY(DateTime)),
+        bindparam("tos", type_=ARRAY(DateTime))
+    )
+
+
+def delete_statement(table: str, column: str):
+    return ranges_statement(
+        f"DELETE FROM {table} AS t USING {RANGES} WHERE t.{column} >= r.date_from AND t.{column} < r.date_to"
+    )
+
+
+def hour_start(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def day_end(value: datetime) -> datetime:
+    """
+    Начало дня, следующего за value (value, если это уже начало дня)
+    """
+    start = day_start(value)
+    return start if start == value else start + timedelta(days=1)
+
+
+def merge_ranges(ranges: Iterable[Range]) -> List[Range]:
+    """
+    Объединение пересекающихся и смежных интервалов, пустые отбрасываются
+    """
+    merged: List[List[datetime]] = []
+    for date_from, date_to in sorted(item for item in ranges if item[0] < item[1]):
+        if merged and date_from <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], date_to)
+        else:
+            merged.append([date_from, date_to])
+    return [(date_from, date_to) for date_from, date_to in merged]
+
+
+def rollup_level(filter_params: SalesFilter, group_by: Optional[str] = None) -> int:
+    """
+    Уровень детализации итогов, достаточный для фильтров (и группировки графика)
+    """
+    level = 0
+    if filter_params.warehouse_id or group_by == "warehouse":
+        level |= ROLLUP_WAREHOUSE
+    if filter_params.category_id or group_by == "category":
+        level |= ROLLUP_CATEGORY
+    return level
+
+
+class SalesRollups:
+    """
+    Предрасчитанные итоги продаж по часам и дням (sales_rollup_hourly/daily) и
+    продажи товаров по дням (sales_rollup_products), построенные по sales_lines.
+
+    Итоги покрывают строки с sold_at до rolled_until (начало часа не позже
+    synced_until) и пересчитываются после каждой синхронизации только для часов,
+    строки которых записаны после прошлого пересчёта (по synced_at), и новых часов.
+    Запросы за период берут из итогов всё до rolled_until и неполный час на
+    границе предыдущего периода добирают по строкам.
+    """
+
+    def __init__(self):
+        self._delete_hourly = delete_statement(SalesRollupHourly.__tablename__, "bucket")
+        self._delete_daily = delete_statement(SalesRollupDaily.__tablename__, "bucket")
+        self._delete_products = delete_statement(SalesRollupProduct.__tablename__, "day")
+        self._insert_hourly = ranges_statement(INSERT_HOURLY)
+        self._insert_daily = ranges_statement(INSERT_DAILY)
+        self._insert_products = ranges_statement(INSERT_PRODUCTS)
+
+    async def refresh(self, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        """
+        Пересчёт итогов по изменившимся часам (без commit; вызывается под
+        блокировкой синхронизации, поэтому строки параллельно не меняются)
+        """
+        state = await sales_store.get_state(db)
+        if state is None or state.synced_from is None or state.synced_until is None:
+            return None
+        rolled_until = hour_start(state.synced_until)
+        rolled_at = await db.scalar(select(func.max(SaleLine.synced_at)))
+
+        if state.rolled_until is None or state.rolled_at is None:
+            # Первый расчёт - весь синхронизированный интервал
+            ranges = merge_ranges([(state.synced_from, rolled_until)])
+        else:
+            hours = await db.scalars(
+                select(func.date_trunc("hour", SaleLine.sold_at))
+                .where(
+                    SaleLine.synced_at > state.rolled_at,
+                    SaleLine.sold_at >= state.synced_from,
+                    SaleLine.sold_at < state.rolled_until
+                )
+                .distinct()
+            )
+            ranges = merge_ranges([
+                *((hour, hour + timedelta(hours=1)) for hour in hours),
+                (state.rolled_until, rolled_until)
+            ])
+        days = merge_ranges((day_start(date_from), day_end(date_to)) for date_from, date_to in ranges)
+
+        if ranges:
+            hour_params = {"froms": [item[0] for item in ranges], "tos": [item[1] for item in ranges]}
+            day_params = {"froms": [item[0] for item in days], "tos": [item[1] for item in days]}
+            await db.execute(self._delete_hourly, hour_params)
+            await db.execute(self._insert_hourly, hour_params)
+            # Дневные итоги - суммы уже пересчитанных часовых за затронутые дни
+            await db.execute(self._delete_daily, day_params)
+            await db.execute(self._insert_daily, day_params)
+            await db.execute(self._delete_products, day_params)
+            await db.execute(self._insert_products, {**day_params, "rolled_until": rolled_until})
+
+        await sales_store.save_state(db, rolled_until=rolled_until, rolled_at=rolled_at)
+        return {
+            "hours": sum(int((date_to - date_from) / timedelta(hours=1)) for date_from, date_to in ranges),
+            "days": sum((date_to - date_from).days for date_from, date_to in days),
+            "rolled_until": rolled_until.isoformat()
+        }
+
+    async def load(
+        self,
+        db: AsyncSession,
+        filter_params: SalesFilter,
+        window: PeriodWindow
+    ) -> Optional[Tuple[SalesAggregate, List[Range]]]:
+        """
+        Итоги периода из предрасчёта и интервалы, которые нужно досчитать по
+        строкам (хвост после rolled_until и неполный час в конце предыдущего
+        периода). None - итоги не покрывают начало предыдущего периода.
+        """
+        state = await sales_store.get_state(db)
+        if (
+            state is None or state.rolled_until is None
+            or state.synced_from is None or state.synced_from > window.prev_start
+        ):
+            return None
+        current_to = min(window.current_end, state.rolled_until)
+        previous_to = min(hour_start(window.prev_end), state.rolled_until)
+        level = rollup_level(filter_params)
+        aggregate = SalesAggregate()
+
+        if current_to > window.start:
+            aggregate.total, aggregate.quantity, aggregate.receipts = await self._totals(
+                db, level, window.start, current_to, filter_params
+            )
+            aggregate.chart = await self._chart(db, window, current_to, filter_params)
+            await self._load_items(db, aggregate, window.start, current_to, filter_params)
+        if previous_to > window.prev_start:
+            aggregate.previous_total = (
+                await self._totals(db, level, window.prev_start, previous_to, filter_params)
+            )[0]
+
+        segments = [
+            (max(window.prev_start, previous_to), window.prev_end),
+            (max(window.start, current_to), window.current_end)
+        ]
+        return aggregate, [(date_from, date_to) for date_from, date_to in segments if date_from < date_to]
+
+    @staticmethod
+    def _parts(date_from: datetime, date_to: datetime, daily: bool) -> List[Tuple[Any, datetime, datetime]]:
+        """
+        Интервал по таблицам итогов: полные дни - из дневных, остаток - из часовых
+        """
+        day_from, day_to = day_end(date_from), day_start(date_to)
+        if not daily or day_from >= day_to:
+            return [(SalesRollupHourly, date_from, date_to)]
+        parts = [(SalesRollupDaily, day_from, day_to)]
+        if date_from < day_from:
+            parts.append((SalesRollupHourly, date_from, day_from))
+        if day_to < date_to:
+            parts.append((SalesRollupHourly, day_to, date_to))
+        return parts
+
+    @staticmethod
+    def _filtered(stmt, model, level: int, date_from: datetime, date_to: datetime, filter_params: SalesFilter):
+        stmt = stmt.where(model.level == level, model.bucket >= date_from, model.bucket < date_to)
+        for field in ("store_id", "warehouse_id", "category_id"):
+            value = getattr(filter_params, field)
+            if value:
+                stmt = stmt.where(getattr(model, field) == value)
+        return stmt
+
+    async def _totals(
+        self,
+        db: AsyncSession,
+        level: int,
+        date_from: datetime,
+        date_to: datetime,
+        filter_params: SalesFilter
+    ) -> Tuple[float, float, int]:
+        """
+        Выручка, количество и число чеков за интервал (одним запросом по частям)
+        """
+        stmt = union_all(*(
+            self._filtered(
+                select(func.sum(model.total), func.sum(model.quantity), func.sum(model.receipts)),
+                model, level, part_from, part_to, filter_params
+            )
+            for model, part_from, part_to in self._parts(date_from, date_to, daily=True)
+        ))
+        total = quantity = 0.0
+        receipts = 0
+        for part_total, part_quantity, part_receipts in (await db.execute(stmt)).all():
+            total += part_total or 0.0
+            quantity += part_quantity or 0.0
+            receipts += part_receipts or 0
+        return total, quantity, int(receipts)
+
+    async def _chart(
+        self,
+        db: AsyncSession,
+        window: PeriodWindow,
+        date_to: datetime,
+        filter_params: SalesFilter
+    ) -> Dict[Tuple[int, Any], List[float]]:
+        """
+        Точки графика за [window.start, date_to): (номер точки, группа) -> [сумма, количество]
+        """
+        group_by = filter_params.group_by
+        level = rollup_level(filter_params, group_by)
+        unit = "hour" if window.bucket == HOUR else "day"
+        selects = []
+        for model, part_from, part_to in self._parts(window.start, date_to, daily=unit == "day"):
+            bucket = func.date_trunc(unit, model.bucket)
+            group = getattr(model, GROUP_FIELDS[group_by]) if group_by else None
+            columns = [bucket, func.sum(model.total), func.sum(model.quantity)]
+            if group is not None:
+                columns.append(group)
+            stmt = self._filtered(select(*columns), model, level, part_from, part_to, filter_params)
+            selects.append(stmt.group_by(bucket, *([group] if group is not None else [])))
+
+        chart: Dict[Tuple[int, Any], List[float]] = {}
+        for row in (await db.execute(union_all(*selects))).all():
+            index = int((row[0] - window.start).total_seconds()) // window.bucket
+            key = (index, (row[3] or None) if group_by else None)
+            point = chart.setdefault(key, [0.0, 0.0])
+            point[0] += row[1]
+            point[1] += row[2]
+        return chart
+
+    async def _load_items(
+        self,
+        db: AsyncSession,
+        aggregate: SalesAggregate,
+        date_from: datetime,
+        date_to: datetime,
+        filter_params: SalesFilter
+    ) -> None:
+        """
+        Продажи всех товаров по магазинам за дни [date_from, date_to): выбор
+        первых по выручке - после сложения с хвостом по строкам
+        """
+        model = SalesRollupProduct
+        stmt = (
+            select(
+                model.product_id, model.store_id, func.max(model.product_name), func.max(model.store_name),
+                func.sum(model.quantity), func.sum(model.total)
+            )
+            .where(model.day >= date_from, model.day < date_to)
+            .group_by(model.product_id, model.store_id)
+        )
+        for field in ("store_id", "warehouse_id", "category_id"):
+            value = getattr(filter_params, field)
+            if value:
+                stmt = stmt.where(getattr(model, field) == value)
+
+        product_names, store_names = aggregate.names["product_id"], aggregate.names["store_id"]
+        for product_id, store_id, product_name, store_name, quantity, total in await sales_store.fetch_records(db, stmt):
+            aggregate.items[(product_id, store_id)] = [quantity, total]
+            product_names[product_id] = product_name
+            store_names[store_id] = store_name
+
+
+sales_rollups = SalesRollups()
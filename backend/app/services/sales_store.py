@@ -0,0 +1,245 @@
+import time
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import BigInteger, any_, bindparam, cast, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import DateTime, String
+
+from app.core.metrics import DB_QUERY_DURATION
+from app.db.base import AsyncSessionLocal
+from app.models.sales import SaleLine, SalesSyncState
+from app.schemas.sales import SalesFilter
+from app.services.sales_aggregation import GROUP_FIELDS, NAME_FIELDS
+
+SYNC_SOURCE = "sales"
+NAMES_TTL = 3600  # с, названия магазинов и товаров перечитываются не чаще
+
+# Строка могла перейти в другой день или месяц: её копия с прежней датой помечается
+# удалённой (а не удаляется), чтобы пересчёт итогов увидел изменённый час по synced_at
+MARK_MOVED = text(
+    "UPDATE sales_lines AS s SET is_deleted = true, synced_at = now() "
+    "FROM unnest(:line_ids, :sold_ats) AS b(line_id, sold_at) "
+    "WHERE s.line_id = b.line_id AND s.sold_at <> b.sold_at AND NOT s.is_deleted"
+).bindparams(
+    bindparam("line_ids", type_=ARRAY(String)),
+    bindparam("sold_ats", type_=ARRAY(DateTime))
+)
+UPSERT_FIELDS = (
+    "line_id", "sold_at", "receipt_id", "store_id", "store_name", "warehouse_id", "category_id",
+    "product_id", "product_name", "quantity", "price", "total", "is_deleted", "changed_at"
+)
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value: datetime) -> datetime:
+    return value.replace(year=value.year + 1, month=1) if value.month == 12 else value.replace(month=value.month + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{SaleLine.__tablename__}_{month:%Y_%m}"
+
+
+class SalesStore:
+    """
+    Локальная таблица строк чеков (sales_lines), наполняемая синхронизацией из 1С.
+
+    Чтение отдаёт строки в колоночном формате ({поле: [значения]}) для
+    app.services.sales_aggregation; запись - пакетный upsert по (line_id, sold_at)
+    с созданием месячных секций по мере надобности.
+    """
+
+    def __init__(self):
+        self._partitions: Set[datetime] = set()  # секции, уже созданные этим процессом
+        self._names: Dict[str, Dict[Any, Optional[str]]] = {field: {} for field in NAME_FIELDS}
+        self._names_loaded_at = time.monotonic()
+
+    async def get_state(self, db: AsyncSession) -> Optional[SalesSyncState]:
+        return await db.get(SalesSyncState, SYNC_SOURCE)
+
+    async def load_columns(
+        self,
+        db: AsyncSession,
+        filter_params: SalesFilter,
+        date_from: datetime,
+        date_to: datetime
+    ) -> Dict[str, List[Any]]:
+        """
+        Строки за [date_from, date_to) с фильтрами запроса, по колонкам.
+        Читаются только нужные агрегации поля (стоимость чтения растёт с числом
+        значений): время - секундами эпохи, склад и категория - только для
+        группировки графика, названия - из словаря по кодам.
+        """
+        fields = ["total", "quantity", "receipt_id", "store_id", "product_id"]
+        if filter_params.group_by:
+            fields.append(GROUP_FIELDS[filter_params.group_by])
+        stmt = select(cast(func.extract("epoch", SaleLine.sold_at), BigInteger), *(getattr(SaleLine, field) for field in fields))
+        rows = await self.fetch_records(db, self._filtered(stmt, filter_params, date_from, date_to))
+        columns = {field: list(map(itemgetter(index), rows)) for index, field in enumerate(["sold_at", *fields])}
+        for field, name_field in NAME_FIELDS.items():
+            names = await self._get_names(db, field, columns[field], date_from, date_to)
+            columns[name_field] = list(map(names.get, columns[field]))
+        return columns
+
+    async def stream_lines(
+        self,
+        db: AsyncSession,
+        filter_params: SalesFilter,
+        date_from: datetime,
+        date_to: datetime,
+        fields: Sequence[str],
+        batch_size: int
+    ) -> AsyncIterator[Sequence[Sequence[Any]]]:
+        """
+        Строки за [date_from, date_to) по возрастанию sold_at порциями по batch_size
+        (значения полей fields по порядку). Читаются серверным курсором, поэтому
+        в памяти не больше одной порции; соединение занято до конца чтения.
+        sold_at отдаётся строкой ISO 8601, как в ответах 1С.
+        """
+        columns = [
+            func.to_char(SaleLine.sold_at, 'YYYY-MM-DD"T"HH24:MI:SS') if field == "sold_at" else getattr(SaleLine, field)
+            for field in fields
+        ]
+        stmt = self._filtered(select(*columns), filter_params, date_from, date_to).order_by(SaleLine.sold_at)
+        result = await db.stream(stmt.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+
+    @staticmethod
+    def _filtered(stmt, filter_params: SalesFilter, date_from: datetime, date_to: datetime):
+        stmt = stmt.where(SaleLine.sold_at >= date_from, SaleLine.sold_at < date_to, SaleLine.is_deleted.is_(False))
+        for field in ("store_id", "warehouse_id", "category_id"):
+            value = getattr(filter_params, field)
+            if value:
+                stmt = stmt.where(getattr(SaleLine, field) == value)
+        return stmt
+
+    @staticmethod
+    async def fetch_records(db: AsyncSession, stmt) -> List[Any]:
+        """
+        Выполнение запроса напрямую драйвером asyncpg: на сотнях тысяч строк
+        создание Row в SQLAlchemy стоит дороже самого чтения
+        """
+        connection = await db.connection()
+        compiled = stmt.compile(dialect=connection.dialect)
+        raw = await connection.get_raw_connection()
+        # События движка (метрики SQL) при прямом вызове драйвера не срабатывают
+        with DB_QUERY_DURATION.labels("SELECT").time():
+            return await raw.driver_connection.fetch(
+                str(compiled),
+                *(compiled.params[name] for name in compiled.positiontup)
+            )
+
+    async def _get_names(
+        self,
+        db: AsyncSession,
+        field: str,
+        values: List[Any],
+        date_from: datetime,
+        date_to: datetime
+    ) -> Dict[Any, Optional[str]]:
+        """
+        Названия магазинов/товаров по кодам; в таблице ищутся только новые коды
+        """
+        if time.monotonic() - self._names_loaded_at > NAMES_TTL:
+            self._names = {field: {} for field in NAME_FIELDS}
+            self._names_loaded_at = time.monotonic()
+        names = self._names[field]
+        missing = [value for value in dict.fromkeys(values) if value not in names]
+        if missing:
+            key, name = getattr(SaleLine, field), getattr(SaleLine, NAME_FIELDS[field])
+            result = await db.execute(
+                select(key, func.max(name))
+                .where(key == any_(bindparam("ids", missing, type_=ARRAY(String))))
+                .where(SaleLine.sold_at >= date_from, SaleLine.sold_at < date_to)
+                .group_by(key)
+            )
+            names.update(result.all())
+        return names
+
+    async def upsert(self, db: AsyncSession, lines: Sequence[Dict[str, Any]]) -> int:
+        """
+        Запись пакета строк из ленты изменений 1С (без commit).
+        Строка обновляется, только если изменение не старше сохранённого;
+        строка, перенесённая в другой день/месяц, помечается удалённой на старом месте.
+        """
+        if not lines:
+            return 0
+        rows = [self._row(line) for line in lines]
+        await self.ensure_partitions(row["sold_at"] for row in rows)
+
+        await db.execute(MARK_MOVED, {
+            "line_ids": [row["line_id"] for row in rows],
+            "sold_ats": [row["sold_at"] for row in rows]
+        })
+
+        stmt = pg_insert(SaleLine)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SaleLine.line_id, SaleLine.sold_at],
+            set_={**{field: stmt.excluded[field] for field in UPSERT_FIELDS[2:]}, "synced_at": func.now()},
+            where=SaleLine.changed_at <= stmt.excluded.changed_at
+        )
+        await db.execute(stmt, rows)
+        return len(rows)
+
+    async def ensure_partitions(self, moments: Iterable[datetime]) -> None:
+        """
+        Создание месячных секций для дат продаж, которых ещё нет.
+        Секция создаётся в отдельной короткой транзакции: блокировка таблицы
+        не держится до конца записи пакета, а откат пакета не отменяет секцию.
+        """
+        months = sorted({month_start(moment) for moment in moments} - self._partitions)
+        if not months:
+            return
+        async with AsyncSessionLocal() as db:
+            for month in months:
+                await db.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF "{SaleLine.__tablename__}" '
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+                ))
+            await db.commit()
+        self._partitions.update(months)
+
+    async def save_state(
+        self,
+        db: AsyncSession,
+        changed_at: Optional[datetime] = None,
+        line_id: Optional[str] = None,
+        synced_from: Optional[datetime] = None,
+        synced_until: Optional[datetime] = None,
+        rolled_until: Optional[datetime] = None,
+        rolled_at: Optional[datetime] = None
+    ) -> None:
+        """
+        Обновление отметки синхронизации (без commit), переданные поля перезаписываются
+        """
+        values = {
+            key: value for key, value in (
+                ("changed_at", changed_at), ("line_id", line_id),
+                ("synced_from", synced_from), ("synced_until", synced_until),
+                ("rolled_until", rolled_until), ("rolled_at", rolled_at)
+            ) if value is not None
+        }
+        if not values:
+            return
+        stmt = pg_insert(SalesSyncState).values(source=SYNC_SOURCE, **values)
+        await db.execute(stmt.on_conflict_do_update(index_elements=[SalesSyncState.source], set_=values))
+
+    @staticmethod
+    def _row(line: Dict[str, Any]) -> Dict[str, Any]:
+        row = {field: line.get(field) for field in UPSERT_FIELDS}
+        for field in ("sold_at", "changed_at"):
+            if isinstance(row[field], str):
+                row[field] = datetime.fromisoformat(row[field])
+        row["changed_at"] = row["changed_at"] or row["sold_at"]
+        row["is_deleted"] = bool(row["is_deleted"])
+        return row
+
+
+sales_store = SalesStore()
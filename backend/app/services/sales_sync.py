@@ -0,0 +1,131 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import SALES_SYNC_LINES
+from app.db.base import AsyncSessionLocal
+from app.db.redis import redis_client
+from app.services.onec_service import onec_service
+from app.services.sales_rollups import sales_rollups
+from app.services.sales_store import sales_store
+
+SYNC_LOCK_KEY = "sales:sync-lock"
+
+# Снятие блокировки только её владельцем
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SalesSync:
+    """
+    Инкрементальная синхронизация строк чеков из 1С в таблицу sales_lines.
+
+    Лента изменений 1С читается страницами после отметки (changed_at, line_id)
+    до момента "сейчас минус SALES_SYNC_LAG"; каждая страница записывается
+    upsert-ом и сдвигает отметку в одной транзакции, поэтому прерванная
+    синхронизация продолжается с места остановки. По завершении synced_until
+    сдвигается на этот момент: продажи до него есть в таблице, и запросы
+    обращаются к 1С только за более поздним хвостом. Затем пересчитываются
+    итоги по затронутым часам (app.services.sales_rollups).
+    """
+
+    def __init__(self):
+        self._release_script = redis_client.register_script(RELEASE_LOCK)
+        self._task: Optional[asyncio.Task] = None
+
+    async def sync(self) -> Dict[str, Any]:
+        """
+        Один проход синхронизации (без блокировки - её берёт вызывающий)
+        """
+        changed_to = (datetime.now() - timedelta(seconds=settings.SALES_SYNC_LAG)).replace(microsecond=0)
+        async with AsyncSessionLocal() as db:
+            state = await sales_store.get_state(db)
+            if state is None or state.changed_at is None:
+                # Первая загрузка: продажи за последние SALES_SYNC_INITIAL_DAYS
+                synced_from = (changed_to - timedelta(days=settings.SALES_SYNC_INITIAL_DAYS)).replace(
+                    hour=0, minute=0, second=0
+                )
+                changed_at, line_id = synced_from, ""
+                await sales_store.save_state(db, changed_at=changed_at, line_id=line_id, synced_from=synced_from)
+                await db.commit()
+            else:
+                changed_at, line_id = state.changed_at, state.line_id or ""
+
+            lines_synced = 0
+            while True:
+                lines = await onec_service.fetch_sales_changes(changed_at, line_id, changed_to, settings.SALES_SYNC_BATCH)
+                if lines:
+                    await sales_store.upsert(db, lines)
+                    last = lines[-1]
+                    changed_at = last["changed_at"]
+                    if isinstance(changed_at, str):
+                        changed_at = datetime.fromisoformat(changed_at)
+                    line_id = last["line_id"]
+                    await sales_store.save_state(db, changed_at=changed_at, line_id=line_id)
+                    await db.commit()
+                    lines_synced += len(lines)
+                    SALES_SYNC_LINES.inc(len(lines))
+                if len(lines) < settings.SALES_SYNC_BATCH:
+                    break
+
+            await sales_store.save_state(db, synced_until=changed_to)
+            await db.commit()
+
+            rollups = None
+            if settings.SALES_ROLLUPS_ENABLED:
+                rollups = await sales_rollups.refresh(db)
+                await db.commit()
+
+        return {"lines": lines_synced, "synced_until": changed_to.isoformat(), "rollups": rollups}
+
+    async def sync_locked(self) -> Optional[Dict[str, Any]]:
+        """
+        Синхронизация, если её сейчас не выполняет другой воркер (иначе None)
+        """
+        token = uuid.uuid4().hex
+        if not await redis_client.set(SYNC_LOCK_KEY, token, nx=True, ex=settings.SALES_SYNC_LOCK_TTL):
+            return None
+        try:
+            return await self.sync()
+        finally:
+            await self._release_script(keys=[SYNC_LOCK_KEY], args=[token])
+
+    async def start(self) -> None:
+        """
+        Запуск периодической синхронизации (вызывается при старте приложения)
+        """
+        if (
+            settings.SALES_LOCAL_STORE_ENABLED
+            and settings.SALES_SYNC_INTERVAL > 0
+            and self._task is None
+        ):
+            self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sync_loop(self) -> None:
+        while True:
+            try:
+                result = await self.sync_locked()
+                if result is not None:
+                    logger.info(f"Продажи синхронизированы из 1С: {result['lines']} строк, до {result['synced_until']}")
+                    if result["rollups"]:
+                        logger.info(f"Итоги продаж пересчитаны: {result['rollups']['hours']} ч, до {result['rollups']['rolled_until']}")
+            except Exception as e:
+                logger.warning(f"Не удалось синхронизировать продажи из 1С: {e}")
+            await asyncio.sleep(settings.SALES_SYNC_INTERVAL)
+
+
+sales_sync = SalesSync()
@@ -0,0 +1,44 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from app.core.metrics import ONEC_SINGLE_FLIGHT
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых параллельных запросов (single-flight).
+
+    Пока запрос с данным ключом выполняется, повторные вызовы не идут в 1С,
+    а ждут результат уже запущенного. Запрос выполняется в отдельной задаче,
+    поэтому отмена первого вызывающего (обрыв соединения клиента) не отменяет
+    его для остальных.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            ONEC_SINGLE_FLIGHT.labels(self.name, "executed").inc()
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+            ONEC_SINGLE_FLIGHT.labels(self.name, "coalesced").inc()
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight)
+        }
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set
+
+import redis
+from loguru import logger
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+from app.db.redis import redis_client
+from app.models.user import User
+
+FIELDS = ("id", "telegram_id", "username", "full_name", "role", "is_active", "created_at", "updated_at")
+DATETIME_FIELDS = ("created_at", "updated_at")
+PENDING_KEY = "user_cache_invalidate"
+
+
+class UserCache:
+    """
+    Пользователи (с ролью и признаком активности) в Redis по telegram_id,
+    чтобы проверка авторизации не обращалась к БД на каждый запрос.
+
+    Запись сбрасывается после коммита, изменившего или удалившего пользователя
+    через ORM (события сессии SQLAlchemy). Изменения в обход ORM становятся
+    видны не позже USER_CACHE_TTL.
+    """
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def key(telegram_id: str) -> str:
+        return f"users:tg:{telegram_id}"
+
+    async def get(self, db: AsyncSession, telegram_id: str) -> Optional[User]:
+        """
+        Пользователь по telegram_id. Из кэша возвращается объект, не связанный
+        с сессией: он только для чтения, сохранять его через db.add нельзя.
+        """
+        user = await self.get_cached(telegram_id)
+        if user is not None:
+            return user
+
+        user = await db.scalar(select(User).where(User.telegram_id == telegram_id))
+        if user is not None:
+            await self.set(user)
+        return user
+
+    async def get_cached(self, telegram_id: str) -> Optional[User]:
+        """
+        Пользователь только из кэша (None при промахе или недоступности Redis)
+        """
+        try:
+            raw = await redis_client.get(self.key(telegram_id))
+        except Exception as e:
+            logger.warning(f"Redis недоступен при чтении пользователя {telegram_id}: {e}")
+            raw = None
+
+        if raw:
+            CACHE_REQUESTS.labels("users", "redis_hit").inc()
+            return self._decode(raw)
+        CACHE_REQUESTS.labels("users", "miss").inc()
+        return None
+
+    async def set(self, user: User) -> None:
+        try:
+            await redis_client.set(self.key(user.telegram_id), self._encode(user), ex=settings.USER_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Redis недоступен при записи пользователя {user.telegram_id}: {e}")
+
+    async def invalidate(self, *telegram_ids: str) -> None:
+        if not telegram_ids:
+            return
+        try:
+            await redis_client.delete(*[self.key(telegram_id) for telegram_id in telegram_ids])
+        except Exception as e:
+            logger.warning(f"Не удалось сбросить кэш пользователей {telegram_ids}: {e}")
+
+    def schedule_invalidate(self, telegram_ids: Iterable[str]) -> None:
+        """
+        Сброс из синхронного кода (события сессии SQLAlchemy)
+        """
+        telegram_ids = list(telegram_ids)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Синхронные скрипты работают без цикла событий
+            self._invalidate_sync(telegram_ids)
+            return
+
+        task = loop.create_task(self.invalidate(*telegram_ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _invalidate_sync(self, telegram_ids: Iterable[str]) -> None:
+        try:
+            with redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0) as client:
+                client.delete(*[self.key(telegram_id) for telegram_id in telegram_ids])
+        except Exception as e:
+            logger.warning(f"Не удалось сбросить кэш пользователей {telegram_ids}: {e}")
+
+    @staticmethod
+    def _encode(user: User) -> str:
+        data: Dict[str, Any] = {field: getattr(user, field) for field in FIELDS}
+        for field in DATETIME_FIELDS:
+            if data[field] is not None:
+                data[field] = data[field].isoformat()
+        return json.dumps(data)
+
+    @staticmethod
+    def _decode(raw: str) -> User:
+        data = json.loads(raw)
+        for field in DATETIME_FIELDS:
+            if data.get(field):
+                data[field] = datetime.fromisoformat(data[field])
+        return User(**data)
+
+
+user_cache = UserCache()
+
+
+@event.listens_for(Session, "after_flush")
+def collect_changed_users(session: Session, flush_context) -> None:
+    users = [obj for obj in session.dirty if isinstance(obj, User) and session.is_modified(obj)]
+    users += [obj for obj in session.deleted if isinstance(obj, User)]
+    if not users:
+        return
+
+    changed = session.info.setdefault(PENDING_KEY, set())
+    for user in users:
+        # Старый telegram_id тоже сбрасываем, если он менялся
+        history = inspect(user).attrs.telegram_id.history
+        changed.update(value for value in (*history.unchanged, *history.deleted, *history.added) if value)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_changed_users(session: Session) -> None:
+    changed = session.info.pop(PENDING_KEY, None)
+    if changed:
+        user_cache.schedule_invalidate(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_changed_users(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
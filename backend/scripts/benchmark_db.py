@@ -0,0 +1,96 @@
+"""
+Сравнение задержки запросов к PostgreSQL под параллельной нагрузкой:
+синхронная Session внутри async-обработчика (как было) против AsyncSession (asyncpg).
+
+Каждый "запрос" выполняет выборку уведомлений пользователя с небольшой задержкой
+на стороне БД (pg_sleep), параллельно измеряется задержка цикла событий.
+
+    python scripts/benchmark_db.py --concurrency 100 --requests 1000
+"""
+import sys
+import os
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select, text
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.base import SessionLocal, AsyncSessionLocal, engine, async_engine
+from app.models.user import Notification
+
+QUERY = select(Notification).where(Notification.user_id == 1).order_by(Notification.created_at.desc()).limit(20)
+
+
+async def sync_request(sleep: float):
+    # Блокирующий вызов прямо в цикле событий - так работал get_db до перехода на asyncpg
+    with SessionLocal() as db:
+        db.execute(text("SELECT pg_sleep(:s)"), {"s": sleep})
+        db.scalars(QUERY).all()
+
+
+async def async_request(sleep: float):
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT pg_sleep(:s)"), {"s": sleep})
+        (await db.scalars(QUERY)).all()
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(mode: str, concurrency: int, total: int, sleep: float):
+    handler = sync_request if mode == "sync" else async_request
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, lags = [], []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(sleep)
+            latencies.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await lag_task
+
+    print(
+        f"{mode:>5}: {total / elapsed:8.1f} запросов/с, "
+        f"p50={percentile(latencies, 50) * 1000:.1f} мс, p95={percentile(latencies, 95) * 1000:.1f} мс, "
+        f"макс. задержка цикла событий={max(lags, default=0) * 1000:.1f} мс"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк sync Session vs AsyncSession")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--sleep", type=float, default=0.005, help="Задержка на стороне БД, с")
+    args = parser.parse_args()
+
+    try:
+        await run("sync", args.concurrency, args.requests, args.sleep)
+        await run("async", args.concurrency, args.requests, args.sleep)
+    finally:
+        engine.dispose()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+Нагрузочный тест входа через Telegram (/api/v1/auth/telegram-auth):
+N одновременных входов с подписанными initData.
+
+По умолчанию каждый вход - новый пользователь (upsert создаёт строку);
+с --users меньше --logins часть входов повторяет уже существующих
+пользователей, а с --same-init-data повторные входы идут с той же initData
+(проверка берётся из кэша).
+
+Пример:
+    TELEGRAM_BOT_TOKEN=123:bench uvicorn app.main:app --port 8000 --workers 4 &
+    python scripts/benchmark_login.py --bot-token 123:bench --logins 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import aiohttp
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.auth import sign_telegram_data  # noqa: E402
+
+
+def make_init_data(bot_token, user_id, auth_date):
+    return sign_telegram_data(bot_token, {
+        "query_id": f"bench{user_id}",
+        "user": json.dumps({
+            "id": user_id,
+            "first_name": "Bench",
+            "last_name": str(user_id),
+            "username": f"bench_{user_id}"
+        }, separators=(",", ":")),
+        "auth_date": str(auth_date)
+    })
+
+
+async def login(session, url, init_data, latencies, statuses):
+    start = time.perf_counter()
+    try:
+        async with session.post(url, data={"_auth": init_data}) as response:
+            await response.read()
+            statuses[response.status] += 1
+            if response.status == 200:
+                latencies.append(time.perf_counter() - start)
+    except aiohttp.ClientError as e:
+        statuses[type(e).__name__] += 1
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк входа через Telegram")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/api/v1/auth/telegram-auth")
+    parser.add_argument("--bot-token", required=True, help="TELEGRAM_BOT_TOKEN сервера")
+    parser.add_argument("--logins", type=int, default=5000, help="Одновременных входов")
+    parser.add_argument("--users", type=int, default=None, help="Разных пользователей (по умолчанию = --logins)")
+    parser.add_argument("--first-id", type=int, default=9_000_000_000)
+    parser.add_argument("--same-init-data", action="store_true", help="Повторные входы с той же initData")
+    args = parser.parse_args()
+
+    users = args.users or args.logins
+    now = int(time.time())
+    payloads = []
+    for i in range(args.logins):
+        user_id = args.first_id + i % users
+        # Без --same-init-data повторный вход подписан заново (другой auth_date)
+        auth_date = now if args.same_init_data else now - i // users
+        payloads.append(make_init_data(args.bot_token, user_id, auth_date))
+
+    latencies, statuses = [], Counter()
+    connector = aiohttp.TCPConnector(limit=args.logins)
+    timeout = aiohttp.ClientTimeout(total=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            login(session, args.url, init_data, latencies, statuses)
+            for init_data in payloads
+        ])
+        elapsed = time.perf_counter() - start
+
+    print(f"Входов: {args.logins}, пользователей: {users}, за {elapsed:.2f} с")
+    print(f"Статусы ответов: {dict(statuses)}")
+    print(f"Пропускная способность: {len(latencies) / elapsed:.1f} входов/с")
+    print(
+        f"Задержка p50={percentile(latencies, 50) * 1000:.1f} мс, "
+        f"p95={percentile(latencies, 95) * 1000:.1f} мс, "
+        f"p99={percentile(latencies, 99) * 1000:.1f} мс"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
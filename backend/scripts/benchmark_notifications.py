@@ -0,0 +1,109 @@
+"""
+Бенчмарк пагинации уведомлений на 1 млн строк: OFFSET + COUNT(*) против
+keyset-пагинации по (created_at, id) с total из счётчика в Redis.
+
+Заполняет таблицу уведомлений для одного пользователя (generate_series),
+затем измеряет время получения страниц на разной глубине.
+Требует применённых миграций (alembic upgrade head).
+
+    python scripts/benchmark_notifications.py --rows 1000000 --seed
+"""
+import sys
+import os
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.base import AsyncSessionLocal, async_engine, engine
+from app.db.redis import redis_client
+from app.services.notification_service import notification_service
+
+BENCH_USER_ID = 999999
+
+
+def seed(rows: int):
+    print(f"Заполнение {rows} уведомлений для пользователя {BENCH_USER_ID}...")
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM notifications WHERE user_id = :u"), {"u": BENCH_USER_ID})
+        conn.execute(text("DELETE FROM users WHERE id = :u"), {"u": BENCH_USER_ID})
+        conn.execute(
+            text("INSERT INTO users (id, telegram_id, role, is_active) VALUES (:u, :t, 'employee', true)"),
+            {"u": BENCH_USER_ID, "t": f"bench-{BENCH_USER_ID}"}
+        )
+        conn.execute(text("""
+            INSERT INTO notifications (user_id, category, title, message, is_read, created_at)
+            SELECT :u,
+                   (ARRAY['price_change', 'stock', 'returns', 'sales_plan'])[1 + g % 4],
+                   'Уведомление ' || g,
+                   'Текст уведомления',
+                   g % 3 = 0,
+                   now() - make_interval(secs => g)
+            FROM generate_series(1, :rows) AS g
+        """), {"u": BENCH_USER_ID, "rows": rows})
+        conn.execute(text("ANALYZE notifications"))
+
+
+async def timed(label: str, coro):
+    start = time.perf_counter()
+    result = await coro
+    print(f"{label:<45} {(time.perf_counter() - start) * 1000:8.2f} мс")
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк пагинации уведомлений")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", action="store_true", help="Заполнить таблицу перед замером")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.rows)
+        await redis_client.delete(f"notifications:counts:{BENCH_USER_ID}")
+
+    try:
+        async with AsyncSessionLocal() as db:
+            for depth in (0, 1_000, 100_000, args.rows - args.limit * 2):
+                await timed(
+                    f"OFFSET {depth} + COUNT(*)",
+                    notification_service.get_notifications(db, BENCH_USER_ID, skip=depth, limit=args.limit, count="exact")
+                )
+
+            # Первое обращение заполняет счётчик, дальше total берётся из Redis
+            page = await timed(
+                "keyset, первая страница (заполнение счётчика)",
+                notification_service.get_notifications(db, BENCH_USER_ID, limit=args.limit, count="approximate")
+            )
+            pages = 0
+            start = time.perf_counter()
+            while page["next_cursor"] and pages < 1000:
+                page = await notification_service.get_notifications(
+                    db, BENCH_USER_ID, limit=args.limit, cursor=page["next_cursor"], count="approximate"
+                )
+                pages += 1
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{'keyset, следующие страницы (среднее)':<45} {elapsed / max(pages, 1):8.2f} мс ({pages} стр.)")
+            print(f"total из счётчика: {page['total']}")
+
+            unread = await timed(
+                "keyset, непрочитанные, первая страница",
+                notification_service.get_notifications(db, BENCH_USER_ID, limit=args.limit, is_read=False, count="none")
+            )
+            await timed(
+                "keyset, непрочитанные, следующая страница",
+                notification_service.get_notifications(
+                    db, BENCH_USER_ID, limit=args.limit, is_read=False, cursor=unread["next_cursor"], count="none"
+                )
+            )
+    finally:
+        await async_engine.dispose()
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Бенчмарк отчётов (app.services.report_service): построение файла в пуле
+процессов при пустом кэше, повторный запрос того же отчёта (готовый файл)
+и параллельные одинаковые запросы (файл строится один раз).
+
+Во время построения замеряется задержка цикла событий - она должна
+оставаться порядка миллисекунд, так как запись файла идёт в других процессах.
+Источник данных - как у приложения (локальная таблица продаж и/или 1С).
+Кэш отчётов - во временном каталоге, если не задан --dir.
+
+Пример:
+    python scripts/benchmark_reports.py --periods today month --format xlsx
+"""
+import sys
+import os
+import argparse
+import asyncio
+import tempfile
+import time
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.config import settings
+from app.db.base import async_engine
+from app.services.onec_service import onec_service
+from app.services.report_service import report_service
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.005):
+    """
+    Максимальная задержка пробуждения корутины относительно заданного интервала
+    """
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return time.perf_counter() - start, result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк отчётов")
+    parser.add_argument("--periods", nargs="+", default=["today", "week", "month"],
+                        choices=["today", "yesterday", "week", "month"])
+    parser.add_argument("--format", dest="report_format", default="xlsx", choices=["xlsx", "csv"])
+    parser.add_argument("--parallel", type=int, default=10, help="одинаковых параллельных запросов")
+    parser.add_argument("--dir", default=None, help="каталог кэша отчётов")
+    args = parser.parse_args()
+
+    settings.REPORTS_DIR = args.dir or tempfile.mkdtemp(prefix="reports_")
+    print(f"Кэш отчётов: {settings.REPORTS_DIR}")
+    try:
+        print(f"  {'период':<10} {'построение':>11} {'задержка цикла':>15} {'из кэша':>10} {'файл':>10}")
+        for period in args.periods:
+            stop = asyncio.Event()
+            lag = asyncio.create_task(loop_lag(stop))
+            cold, result = await timed(report_service.get_report("sales_report", period, report_format=args.report_format))
+            stop.set()
+            worst = await lag
+
+            warm, _ = await timed(report_service.get_report("sales_report", period, report_format=args.report_format))
+            size = os.path.getsize(report_service.path(result["file_id"]))
+            print(
+                f"  {period:<10} {cold:10.2f}с {worst * 1000:13.1f}мс {warm * 1000:8.2f}мс "
+                f"{size / 2 ** 10:8.0f}КБ"
+            )
+
+        # Одинаковые параллельные запросы при пустом кэше
+        for name in os.listdir(settings.REPORTS_DIR):
+            for file in os.listdir(os.path.join(settings.REPORTS_DIR, name)):
+                os.remove(os.path.join(settings.REPORTS_DIR, name, file))
+        before = report_service.stats()["executions"]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            report_service.get_report("sales_report", args.periods[0], report_format=args.report_format)
+            for _ in range(args.parallel)
+        ))
+        elapsed = time.perf_counter() - start
+        built = report_service.stats()["executions"] - before
+        same = len({result.get("file_id") for result in results}) == 1
+        print(f"\n{args.parallel} одинаковых запросов: {elapsed:.2f} с, построений: {built}, один файл: {same}")
+    finally:
+        await report_service.shutdown()
+        await onec_service.shutdown()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
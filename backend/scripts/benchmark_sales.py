@@ -0,0 +1,66 @@
+"""
+Нагрузочный тест /api/v1/sales/: N параллельных клиентов в течение заданного времени.
+
+Пример:
+    python scripts/fake_onec_server.py --delay 0.05 &
+    ONEC_USE_MOCK=false ONEC_API_URL=http://127.0.0.1:8090/api uvicorn app.main:app --port 8000 &
+    python scripts/benchmark_sales.py --url http://127.0.0.1:8000/api/v1/sales/ --clients 100
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+
+async def client(session, url, params, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            async with session.get(url, params=params) as response:
+                await response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+                    continue
+        except aiohttp.ClientError as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк эндпоинта продаж")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/api/v1/sales/")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность, с")
+    parser.add_argument("--period", default="today")
+    args = parser.parse_args()
+
+    latencies, errors = [], []
+    connector = aiohttp.TCPConnector(limit=args.clients)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*[
+            client(session, args.url, {"period": args.period}, deadline, latencies, errors)
+            for _ in range(args.clients)
+        ])
+
+    print(f"Клиентов: {args.clients}, длительность: {args.duration:.0f} с")
+    print(f"Успешных запросов: {len(latencies)}, ошибок: {len(errors)}")
+    print(f"Пропускная способность: {len(latencies) / args.duration:.1f} запросов/с")
+    print(
+        f"Задержка p50={percentile(latencies, 50) * 1000:.1f} мс, "
+        f"p95={percentile(latencies, 95) * 1000:.1f} мс, "
+        f"p99={percentile(latencies, 99) * 1000:.1f} мс"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
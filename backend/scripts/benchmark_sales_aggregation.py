@@ -0,0 +1,129 @@
+"""
+Бенчмарк агрегации продаж по строкам чеков 1С на синтетических данных.
+
+Для каждого объёма (строк за период и предыдущий период) сравниваются,
+начиная с тела ответа 1С (разбор JSON входит в замер):
+  - построчная агрегация словарями на чистом Python;
+  - колоночная агрегация (app.services.sales_aggregation) по списку строк;
+  - колоночная агрегация по ответу в колоночном формате (format=columns),
+    и отдельно она же по уже разобранным колонкам.
+
+Пример:
+    python scripts/benchmark_sales_aggregation.py --lines 100000 300000 500000 --period month
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_onec_server import build_sales_lines, to_columns  # noqa: E402
+from app.core.responses import json_loads, orjson  # noqa: E402
+from app.services.sales_aggregation import aggregate_sales, period_window, GROUP_FIELDS  # noqa: E402
+
+
+def python_aggregate(lines, period, group_by=None, items_limit=100, now=None):
+    """
+    Та же агрегация построчно, для сравнения и сверки результатов
+    """
+    window = period_window(period, now)
+    start, current_end = window.start.isoformat(), window.current_end.isoformat()
+    prev_start, prev_end = window.prev_start.isoformat(), window.prev_end.isoformat()
+    bucket_format = "%Y-%m-%dT%H:00" if window.bucket == 3600 else "%Y-%m-%d"
+    field = GROUP_FIELDS.get(group_by)
+
+    total = previous = quantity = 0.0
+    receipts = set()
+    items = defaultdict(lambda: [0.0, 0.0])
+    chart = defaultdict(float)
+    for line in lines:
+        sold_at = line["sold_at"]
+        if prev_start <= sold_at < prev_end:
+            previous += line["total"]
+        if not start <= sold_at < current_end:
+            continue
+        total += line["total"]
+        quantity += line["quantity"]
+        receipts.add(line["receipt_id"])
+        item = items[(line["product_id"], line["store_id"])]
+        item[0] += line["quantity"]
+        item[1] += line["total"]
+        bucket = datetime.fromisoformat(sold_at).strftime(bucket_format)
+        chart[(bucket, line[field] if field else None)] += line["total"]
+
+    top = sorted(items.items(), key=lambda item: -item[1][1])[:items_limit]
+    return {
+        "total_sales": round(total, 2),
+        "total_items": int(round(quantity)),
+        "avg_check": round(total / len(receipts), 2) if receipts else 0.0,
+        "comparison_prev_period": round((total - previous) / previous * 100, 2) if previous else None,
+        "items": len(top),
+        "chart_points": len(chart)
+    }
+
+
+def measure(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк агрегации продаж")
+    parser.add_argument("--lines", type=int, nargs="+", default=[100_000, 300_000, 500_000])
+    parser.add_argument("--period", default="month", choices=["today", "yesterday", "week", "month"])
+    parser.add_argument("--group-by", default=None, choices=list(GROUP_FIELDS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson не установлен: JSON разбирается стандартным json")
+
+    now = datetime.now().replace(microsecond=0)
+    window = period_window(args.period, now)
+    hours = (window.current_end - window.prev_start) / timedelta(hours=1)
+
+    for count in args.lines:
+        lines = build_sales_lines(window.prev_start, window.current_end, lines_per_hour=max(int(count / hours), 1))
+        print(f"\nСтрок: {len(lines)}, период: {args.period}, группировка: {args.group_by or 'нет'}")
+
+        rows_body = json.dumps(lines).encode()
+        columns = to_columns(lines)
+        columns_body = json.dumps(columns).encode()
+        print(f"  тело ответа 1С: строками {len(rows_body) / 2 ** 20:.1f} МБ, колонками {len(columns_body) / 2 ** 20:.1f} МБ")
+
+        cases = [
+            ("построчно на Python", lambda: python_aggregate(json_loads(rows_body), args.period, args.group_by, now=now)),
+            ("колоночно, ответ строками", lambda: aggregate_sales(json_loads(rows_body), args.period, args.group_by, now=now)),
+            ("колоночно, ответ колонками", lambda: aggregate_sales(json_loads(columns_body), args.period, args.group_by, now=now)),
+            ("  из них без разбора JSON", lambda: aggregate_sales(columns, args.period, args.group_by, now=now)),
+        ]
+        baseline, expected = None, None
+        for label, fn in cases:
+            elapsed, result = measure(fn, args.repeat)
+            baseline = baseline or elapsed
+            print(f"  {label:<30} {elapsed * 1000:9.1f} мс  x{baseline / elapsed:5.1f}")
+            if expected is None:
+                expected = result
+                continue
+            summary = result["summary"]
+            for key in ("total_sales", "total_items", "avg_check", "comparison_prev_period"):
+                if summary[key] != expected[key]:
+                    print(f"    РАСХОЖДЕНИЕ {key}: {summary[key]} != {expected[key]}")
+
+        print(
+            f"  сумма {summary['total_sales']:.2f}, средний чек {summary['avg_check']:.2f}, "
+            f"к прошлому периоду {summary['comparison_prev_period']}%, "
+            f"точек графика {len(result['chart_data'])}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Память и скорость потоковой выгрузки продаж (app.services.sales_export)
+в сравнении со сборкой всего ответа в памяти (список строк и один JSON).
+
+Пиковая память Python считается через tracemalloc для периодов разной
+длины: у потоковой выгрузки она должна оставаться постоянной (порядка
+одной порции), у сборки целиком - расти с числом строк.
+Источник строк - как у приложения: локальная таблица (нужна PostgreSQL с
+синхронизированными продажами) и/или 1С (ONEC_USE_MOCK, ONEC_API_URL).
+
+Пример:
+    python scripts/benchmark_sales_export.py --periods today week month --format ndjson
+"""
+import sys
+import os
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.responses import json_dumps
+from app.db.base import async_engine
+from app.schemas.sales import SalesFilter
+from app.services.onec_service import onec_service
+from app.services.sales_aggregation import period_window
+from app.services.sales_export import EXPORT_FIELDS, sales_export
+
+
+async def streamed(filter_params, window, export_format):
+    """
+    Потоковая выгрузка: части тела сразу отбрасываются, как после отправки клиенту
+    """
+    size = 0
+    async for chunk in sales_export.stream(filter_params, window.start, window.current_end, export_format):
+        size += len(chunk)
+    return size
+
+
+async def materialized(filter_params, window, export_format):
+    """
+    Сборка всех строк в список и одного JSON-документа
+    """
+    lines = []
+    async for batch in sales_export.rows(filter_params, window.start, window.current_end):
+        lines.extend(dict(zip(EXPORT_FIELDS, row)) for row in batch)
+    return len(json_dumps({"lines": lines}))
+
+
+async def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = await fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк потоковой выгрузки продаж")
+    parser.add_argument("--periods", nargs="+", default=["today", "week", "month"],
+                        choices=["today", "yesterday", "week", "month"])
+    parser.add_argument("--format", dest="export_format", default="ndjson", choices=["ndjson", "csv"])
+    parser.add_argument("--store-id", default=None)
+    args = parser.parse_args()
+
+    try:
+        print(f"  {'период':<10} {'способ':<12} {'время':>9} {'пик памяти':>12} {'тело':>10}")
+        for period in args.periods:
+            filter_params = SalesFilter(period=period, store_id=args.store_id)
+            window = period_window(period)
+            for label, fn in (("поток", streamed), ("целиком", materialized)):
+                elapsed, peak, size = await measure(fn, filter_params, window, args.export_format)
+                print(
+                    f"  {period:<10} {label:<12} {elapsed:8.2f}с {peak / 2 ** 20:10.1f}МБ "
+                    f"{size / 2 ** 20:8.1f}МБ"
+                )
+    finally:
+        await onec_service.shutdown()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Бенчмарк запросов продаж за период: предрасчитанные итоги (sales_rollup_*)
+против агрегации строк чеков из локальной таблицы sales_lines.
+
+Нужна PostgreSQL с синхронизированными продажами (scripts/sync_sales.py) и
+те же настройки 1С, что при синхронизации: хвост после synced_until
+запрашивается у 1С в обоих вариантах. Для каждого набора фильтров
+сравниваются время ответа и результат (сводка, товары, график).
+Отдельно замеряется пересчёт итогов - полный и инкрементальный
+(в транзакции, которая откатывается).
+
+Пример:
+    python scripts/benchmark_sales_rollups.py --period month --repeat 5
+"""
+import sys
+import os
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import update
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal, async_engine
+from app.models.sales import SalesSyncState
+from app.schemas.sales import SalesFilter
+from app.services.onec_service import onec_service
+from app.services.sales_rollups import sales_rollups
+from app.services.sales_store import SYNC_SOURCE
+
+FILTERS = [
+    {},
+    {"group_by": "store"},
+    {"group_by": "category"},
+    {"store_id": "1"},
+    {"store_id": "1", "group_by": "warehouse"},
+    {"warehouse_id": "1", "category_id": "1"},
+]
+
+
+def differences(expected, actual, path="", tolerance=0.011):
+    """
+    Расхождения результатов; суммы сложены в другом порядке, поэтому
+    числа сравниваются с точностью до копейки
+    """
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        if expected.keys() != actual.keys():
+            return [f"{path}: поля {sorted(expected)} != {sorted(actual)}"]
+        return [diff for key in expected for diff in differences(expected[key], actual[key], f"{path}.{key}")]
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}: {len(expected)} != {len(actual)} элементов"]
+        return [diff for index, (a, b) in enumerate(zip(expected, actual)) for diff in differences(a, b, f"{path}[{index}]")]
+    if isinstance(expected, float) and isinstance(actual, float):
+        return [] if abs(expected - actual) <= tolerance else [f"{path}: {expected} != {actual}"]
+    return [] if expected == actual else [f"{path}: {expected} != {actual}"]
+
+
+async def measure(filter_params: SalesFilter, rollups: bool, repeat: int):
+    settings.SALES_ROLLUPS_ENABLED = rollups
+    result = await onec_service._load_sales_data(filter_params)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = await onec_service._load_sales_data(filter_params)
+    return (time.perf_counter() - start) / repeat, result
+
+
+async def measure_refresh():
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        result = await sales_rollups.refresh(db)
+        incremental = time.perf_counter() - start
+        if result is None:
+            print("Продажи не синхронизированы: сначала запустите scripts/sync_sales.py")
+            return False
+
+        await db.execute(
+            update(SalesSyncState).where(SalesSyncState.source == SYNC_SOURCE).values(rolled_until=None, rolled_at=None)
+        )
+        start = time.perf_counter()
+        full = await sales_rollups.refresh(db)
+        elapsed = time.perf_counter() - start
+        await db.rollback()
+
+    print(f"Пересчёт итогов: полный {elapsed:.2f} с ({full['hours']} ч, {full['days']} дн.), "
+          f"инкрементальный {incremental * 1000:.0f} мс ({result['hours']} ч)")
+    return True
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк итогов продаж")
+    parser.add_argument("--period", default="month", choices=["today", "yesterday", "week", "month"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        if not await measure_refresh():
+            return
+        print(f"\nПериод: {args.period}, повторов: {args.repeat}")
+        print(f"  {'фильтры':<40} {'строки':>10} {'итоги':>10}")
+        for params in FILTERS:
+            filter_params = SalesFilter(period=args.period, **params)
+            raw_time, expected = await measure(filter_params, False, args.repeat)
+            rollup_time, actual = await measure(filter_params, True, args.repeat)
+            label = ", ".join(f"{key}={value}" for key, value in params.items()) or "без фильтров"
+            print(
+                f"  {label:<40} {raw_time * 1000:8.1f}мс {rollup_time * 1000:8.1f}мс  x{raw_time / rollup_time:5.1f}"
+            )
+            for diff in differences(expected, actual)[:5]:
+                print(f"    РАСХОЖДЕНИЕ {diff}")
+    finally:
+        await onec_service.shutdown()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+"""
+Бенчмарк сериализации ответов на реалистичных объёмах
+(SalesResponse с позициями и графиком, NotificationList).
+
+Сравниваются:
+  - путь FastAPI по умолчанию: проверка response_model + стандартный json;
+  - проверка response_model + orjson (FastJSONResponse);
+  - проверка + model_dump_json (рендер кэша ответов при промахе);
+  - доверенные данные без проверки (trusted_response).
+
+Пример:
+    python scripts/benchmark_serialization.py --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.responses import FastJSONResponse, orjson  # noqa: E402
+from app.schemas.sales import SalesResponse  # noqa: E402
+from app.schemas.user import NotificationList  # noqa: E402
+
+STDLIB = JSONResponse(None)
+FAST = FastJSONResponse(None)
+
+
+def sales_payload(items: int, days: int) -> dict:
+    start = datetime(2025, 1, 1)
+    return {
+        "summary": {"period": "month", "total_sales": 1234567.89, "total_items": items * 3, "avg_check": 512.4},
+        "items": [
+            {
+                "product_id": str(i),
+                "product_name": f"Товар номер {i}",
+                "quantity": i % 50 + 1,
+                "price": 99.9 + i % 300,
+                "total": (i % 50 + 1) * (99.9 + i % 300),
+                "store_id": str(i % 12),
+                "store_name": f"Магазин {i % 12}"
+            }
+            for i in range(items)
+        ],
+        "chart_data": [
+            {"date": (start + timedelta(days=d)).date().isoformat(), "amount": 10000.0 + d * 13.7, "items_count": 40 + d % 17}
+            for d in range(days)
+        ]
+    }
+
+
+def notifications_payload(count: int) -> dict:
+    now = datetime(2025, 4, 18, 12, 0, 0)
+    return {
+        "notifications": [
+            {
+                "id": i,
+                "user_id": 1,
+                "category": ("price_change", "stock", "returns", "sales_plan")[i % 4],
+                "title": f"Уведомление {i}",
+                "message": "Изменилась цена на товар из вашего ассортимента, проверьте остатки",
+                "is_read": i % 3 == 0,
+                "created_at": now - timedelta(minutes=i)
+            }
+            for i in range(count)
+        ],
+        "total": count * 10,
+        "next_cursor": "MjAyNS0wNC0xOFQxMjowMDowMHwx"
+    }
+
+
+def default_path(model, data):
+    return STDLIB.render(model.model_validate(data).model_dump(mode="json"))
+
+
+def orjson_path(model, data):
+    return FAST.render(model.model_validate(data).model_dump(mode="json"))
+
+
+def dump_json_path(model, data):
+    return model.model_validate(data).model_dump_json().encode()
+
+
+def trusted_path(model, data):
+    return FAST.render(data)
+
+
+def measure(fn, model, data, repeat):
+    fn(model, data)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn(model, data)
+    return (time.perf_counter() - start) / repeat, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации ответов")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson не установлен: FastJSONResponse использует стандартный json")
+
+    cases = [
+        ("SalesResponse 100 позиций, 30 дней", SalesResponse, sales_payload(100, 30)),
+        ("SalesResponse 1000 позиций, 90 дней", SalesResponse, sales_payload(1000, 90)),
+        ("SalesResponse 10000 позиций, 365 дней", SalesResponse, sales_payload(10000, 365)),
+        ("NotificationList 20", NotificationList, notifications_payload(20)),
+        ("NotificationList 100", NotificationList, notifications_payload(100)),
+    ]
+    paths = [
+        ("FastAPI по умолчанию (json)", default_path),
+        ("проверка + orjson", orjson_path),
+        ("проверка + model_dump_json", dump_json_path),
+        ("доверенные данные + orjson", trusted_path),
+    ]
+
+    for name, model, data in cases:
+        print(f"\n{name}")
+        baseline = None
+        for label, fn in paths:
+            # Доверенный путь получает данные, уже приведённые к JSON-типам (как из кэша)
+            payload = model.model_validate(data).model_dump(mode="json") if fn is trusted_path else data
+            elapsed, size = measure(fn, model, payload, args.repeat)
+            baseline = baseline or elapsed
+            print(f"  {label:<32} {elapsed * 1000:9.3f} мс  x{baseline / elapsed:5.1f}  {size / 1024:8.1f} КБ")
+
+
+if __name__ == "__main__":
+    main()
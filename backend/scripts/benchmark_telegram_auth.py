@@ -0,0 +1,81 @@
+"""
+Микробенчмарк проверки initData Telegram Mini App (verify_telegram_data).
+
+Сравнивает проверку с заранее вычисленным секретом, вычисление секрета
+на каждый вызов и отклонение поддельной подписи.
+
+Пример:
+    python scripts/benchmark_telegram_auth.py --iterations 200000
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from urllib.parse import parse_qsl
+
+BOT_TOKEN = "123456:benchmark-token"
+
+# Токен бота должен быть задан до импорта настроек приложения
+os.environ["TELEGRAM_BOT_TOKEN"] = BOT_TOKEN
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.auth import sign_telegram_data, verify_telegram_data  # noqa: E402
+
+
+def verify_without_precomputed_secret(init_data: str) -> bool:
+    # Эталон для сравнения: секрет вычисляется при каждой проверке
+    params = dict(parse_qsl(init_data, keep_blank_values=True))
+    received_hash = params.pop("hash", "")
+    secret_key = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    data_check_string = "\n".join(f"{key}={params[key]}" for key in sorted(params))
+    expected_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected_hash, received_hash)
+
+
+def measure(name, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<40} {iterations / elapsed:>12,.0f} проверок/с  {elapsed / iterations * 1e6:>7.2f} мкс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк проверки initData Telegram")
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    fields = {
+        "query_id": "AAHdF6IQAAAAAN0XohDhrOrc",
+        "user": json.dumps({
+            "id": 555299761,
+            "first_name": "Rus",
+            "last_name": "Daurenov",
+            "username": "rususer",
+            "language_code": "ru"
+        }, separators=(",", ":"), ensure_ascii=False),
+        "auth_date": str(int(time.time())),
+    }
+    init_data = sign_telegram_data(BOT_TOKEN, fields)
+    forged = init_data[:-4] + "0000"
+
+    assert verify_telegram_data(init_data)["id"] == "555299761"
+
+    def reject():
+        try:
+            verify_telegram_data(forged)
+        except ValueError:
+            return
+        raise AssertionError("Поддельная подпись принята")
+
+    print(f"Длина initData: {len(init_data)} байт, итераций: {args.iterations}")
+    measure("verify_telegram_data", lambda: verify_telegram_data(init_data), args.iterations)
+    measure("секрет на каждый вызов (без разбора user)", lambda: verify_without_precomputed_secret(init_data), args.iterations)
+    measure("отклонение поддельной подписи", reject, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Локальный имитатор HTTP-сервиса 1С для тестов и бенчмарков.
+
+Запуск:
+    python scripts/fake_onec_server.py --port 8090 --delay 0.05
+Бэкенд направляется на него через переменные окружения:
+    ONEC_USE_MOCK=false ONEC_API_URL=http://127.0.0.1:8090/api
+С --no-batch пакетные запросы (POST /api/batch) не поддерживаются, как у 1С
+без соответствующего HTTP-сервиса.
+
+Сбои включаются на ходу (для тестов отказоустойчивости):
+    curl -X POST localhost:8090/_faults -d '{"delay": 5, "error_rate": 0.5, "status": 503}'
+delay - добавка к задержке ответа, error_rate - доля ответов с ошибкой status,
+paths - только для этих путей (по умолчанию для всех /api/...; в пакете -
+по путям подзапросов); {} - сбросить.
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+
+from aiohttp import web
+from multidict import MultiDict
+
+STORES = [
+    {"id": "1", "name": "Магазин на Невском", "address": "Невский пр., 1"},
+    {"id": "2", "name": "Магазин в ТЦ Галерея", "address": "Лиговский пр., 30"},
+    {"id": "3", "name": "Магазин на Московском", "address": "Московский пр., 100"}
+]
+
+WAREHOUSES = [
+    {"id": "1", "name": "Основной склад", "store_id": "1"},
+    {"id": "2", "name": "Запасной склад", "store_id": "1"},
+    {"id": "3", "name": "Основной склад", "store_id": "2"},
+    {"id": "4", "name": "Основной склад", "store_id": "3"}
+]
+
+
+def build_sales_lines(
+    date_from: datetime,
+    date_to: datetime,
+    lines_per_hour: float = 50,
+    store_id=None,
+    warehouse_id=None,
+    category_id=None,
+    products: int = 500,
+    categories: int = 12,
+    seed: int = 0
+) -> list:
+    """
+    Строки чеков за [date_from, date_to): в среднем lines_per_hour строк в час,
+    по 1-5 строк в чеке, склад - один из складов магазина чека.
+    Строки каждого часа зависят только от часа и seed, поэтому разные
+    запросы (по датам или по ленте изменений) видят одни и те же продажи.
+    """
+    lines = []
+    hour = date_from.replace(minute=0, second=0, microsecond=0)
+    while hour < date_to:
+        rng = random.Random(f"{seed}:{int(hour.timestamp())}")
+        receipts = lines_per_hour / 3
+        count = int(receipts) + (rng.random() < receipts - int(receipts))
+        for number, offset in enumerate(sorted(rng.randrange(3600) for _ in range(count))):
+            sold_at = hour + timedelta(seconds=offset)
+            store = STORES[(number + hour.hour) % len(STORES)]
+            warehouse = rng.choice([w for w in WAREHOUSES if w["store_id"] == store["id"]])
+            receipt_id = f"R{int(hour.timestamp())}-{number}"
+            for position in range(rng.randint(1, 5)):
+                product = rng.randrange(products)
+                quantity = float(rng.randint(1, 7))
+                price = float(50 + (product * 37) % 900)
+                if not date_from <= sold_at < date_to:
+                    continue
+                lines.append({
+                    "line_id": f"{receipt_id}-{position}",
+                    "receipt_id": receipt_id,
+                    "sold_at": sold_at.isoformat(timespec="seconds"),
+                    "store_id": store["id"],
+                    "store_name": store["name"],
+                    "warehouse_id": warehouse["id"],
+                    "category_id": str(product % categories),
+                    "product_id": str(product),
+                    "product_name": f"Товар {product}",
+                    "quantity": quantity,
+                    "price": price,
+                    "total": quantity * price
+                })
+        hour += timedelta(hours=1)
+
+    for field, value in (("store_id", store_id), ("warehouse_id", warehouse_id), ("category_id", category_id)):
+        if value:
+            lines = [line for line in lines if line[field] == value]
+    return lines
+
+
+def build_sales_changes(changed_after: datetime, after_line_id: str, changed_to: datetime, limit: int, lines_per_hour: float = 50) -> list:
+    """
+    Лента изменений: строка меняется только при продаже (changed_at = sold_at).
+    Строки генерируются по суткам, пока не наберётся страница.
+    """
+    cursor = (changed_after.isoformat(timespec="seconds"), after_line_id)
+    end = changed_to + timedelta(seconds=1)
+    changes = []
+    day = changed_after
+    while day < end and len(changes) < limit:
+        next_day = min(day.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1), end)
+        for line in build_sales_lines(day, next_day, lines_per_hour):
+            line["changed_at"] = line["sold_at"]
+            line["is_deleted"] = False
+            if (line["changed_at"], line["line_id"]) > cursor:
+                changes.append(line)
+        day = next_day
+    changes.sort(key=lambda line: (line["changed_at"], line["line_id"]))
+    return changes[:limit]
+
+
+def to_columns(lines: list) -> dict:
+    """
+    Колоночный формат ответа (format=columns): {поле: [значения по строкам]}
+    """
+    fields = lines[0].keys() if lines else ("sold_at", "total", "quantity")
+    return {field: [line[field] for line in lines] for field in fields}
+
+
+class SubRequest:
+    """
+    Подзапрос пакета для обработчиков GET: им нужны только параметры
+    """
+
+    def __init__(self, params: dict):
+        self.query = MultiDict({key: str(value) for key, value in (params or {}).items()})
+
+
+def create_app(delay: float = 0.0, jitter: float = 0.0, lines: int = 50, batch: bool = True) -> web.Application:
+    """
+    Создание приложения-имитатора 1С.
+    delay/jitter задают искусственную задержку ответа в секундах,
+    lines - строк чеков в час в ответе на продажи,
+    batch - поддержка пакетных запросов.
+    """
+    app = web.Application()
+    app["calls"] = {}
+    app["faults"] = {}
+
+    async def fault(path):
+        """
+        Сбой из app["faults"] для пути: задержка и ответ с ошибкой (или None)
+        """
+        faults = app["faults"]
+        if faults and path.startswith("/api/") and path in faults.get("paths", [path]):
+            if faults.get("delay"):
+                await asyncio.sleep(faults["delay"])
+            if random.random() < faults.get("error_rate", 0):
+                return web.json_response({"error": "injected fault"}, status=faults.get("status", 500))
+        return None
+
+    @web.middleware
+    async def latency(request, handler):
+        app["calls"][request.path] = app["calls"].get(request.path, 0) + 1
+        if delay or jitter:
+            await asyncio.sleep(delay + random.uniform(0, jitter))
+        # Для пакета сбои применяются к каждому подзапросу по его пути
+        if request.path != "/api/batch":
+            error = await fault(request.path)
+            if error is not None:
+                return error
+        return await handler(request)
+
+    app.middlewares.append(latency)
+
+    async def sales(request):
+        query = request.query
+        date_to = datetime.fromisoformat(query["date_to"]) if "date_to" in query else datetime.now()
+        date_from = datetime.fromisoformat(query["date_from"]) if "date_from" in query else date_to - timedelta(days=1)
+        filters = (query.get("store_id"), query.get("warehouse_id"), query.get("category_id"))
+        if query.get("format") == "ndjson":
+            # Строка чека на строку ответа, отправка по дням - без сборки всего ответа
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            day = date_from
+            while day < date_to:
+                day_end = min(day + timedelta(days=1), date_to)
+                chunk = build_sales_lines(day, day_end, lines, *filters)
+                await response.write("".join(json.dumps(line, ensure_ascii=False) + "\n" for line in chunk).encode())
+                day = day_end
+            await response.write_eof()
+            return response
+
+        result = build_sales_lines(date_from, date_to, lines, *filters)
+        if query.get("format") == "columns":
+            result = to_columns(result)
+        return web.json_response(result)
+
+    async def sales_changes(request):
+        query = request.query
+        return web.json_response(build_sales_changes(
+            datetime.fromisoformat(query["changed_after"]),
+            query.get("after_line_id", ""),
+            datetime.fromisoformat(query["changed_to"]),
+            int(query.get("limit", 5000)),
+            lines
+        ))
+
+    async def stores(request):
+        return web.json_response(STORES)
+
+    async def warehouses(request):
+        store_id = request.query.get("store_id")
+        return web.json_response([w for w in WAREHOUSES if not store_id or w["store_id"] == store_id])
+
+    async def run_process(request):
+        data = await request.json()
+        return web.json_response({
+            "success": True,
+            "message": f"Обработка {data.get('process_name')} выполнена",
+            "result": data.get("parameters") or {},
+            "process_id": f"fake-{random.randint(0, 10 ** 9)}"
+        })
+
+    async def run_batch(request):
+        """
+        Пакет GET-запросов: {"requests": [{"method", "endpoint", "params"}]} ->
+        {"responses": [{"status", "body"}]} в том же порядке
+        """
+        async def run(item):
+            path = f"/api/{item.get('endpoint')}"
+            handler = handlers.get(path) if item.get("method", "GET") == "GET" else None
+            if handler is None:
+                return {"status": 404, "body": {"error": f"Unknown endpoint {path}"}}
+            response = await fault(path)
+            if response is None:
+                response = await handler(SubRequest(item.get("params")))
+            return {"status": response.status, "body": json.loads(response.text)}
+
+        items = (await request.json()).get("requests", [])
+        return web.json_response({"responses": await asyncio.gather(*(run(item) for item in items))})
+
+    async def stats(request):
+        return web.json_response(app["calls"])
+
+    async def set_faults(request):
+        faults = await request.json()
+        app["faults"].clear()
+        app["faults"].update(faults)
+        return web.json_response(app["faults"])
+
+    handlers = {"/api/sales": sales, "/api/stores": stores, "/api/warehouses": warehouses}
+
+    app.router.add_get("/api/sales", sales)
+    app.router.add_get("/api/sales/changes", sales_changes)
+    app.router.add_get("/api/stores", stores)
+    app.router.add_get("/api/warehouses", warehouses)
+    app.router.add_post("/api/process/run", run_process)
+    if batch:
+        app.router.add_post("/api/batch", run_batch)
+    app.router.add_get("/_stats", stats)
+    app.router.add_post("/_faults", set_faults)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Имитатор HTTP-сервиса 1С")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--delay", type=float, default=0.05, help="Задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Случайная добавка к задержке, с")
+    parser.add_argument("--lines", type=int, default=50, help="Строк чеков в час в ответе на продажи")
+    parser.add_argument("--no-batch", action="store_true", help="Без поддержки пакетных запросов")
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.delay, args.jitter, args.lines, not args.no_batch), host=args.host, port=args.port)
@@ -0,0 +1,72 @@
+"""
+Нагрузочный тест объединения одинаковых запросов к 1С (single-flight).
+
+Имитирует начало смены: N пользователей одновременно запрашивают продажи
+с небольшим числом различных фильтров. Запускает локальный имитатор 1С
+и показывает, что 1С получает O(различных фильтров) запросов, а не O(пользователей).
+
+    python scripts/loadtest_coalescing.py --users 500 --filters 5
+"""
+import sys
+import os
+import argparse
+import asyncio
+import time
+
+from aiohttp import web
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_onec_server import create_app
+from app.services.onec_service import OneCService
+from app.schemas.sales import SalesFilter
+
+PERIODS = ["today", "yesterday", "week", "month"]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест single-flight")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--filters", type=int, default=5, help="Число различных фильтров")
+    parser.add_argument("--delay", type=float, default=0.2, help="Задержка ответа 1С, с")
+    parser.add_argument("--port", type=int, default=8091)
+    args = parser.parse_args()
+
+    fake_app = create_app(delay=args.delay)
+    runner = web.AppRunner(fake_app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    service = OneCService()
+    service.base_url = f"http://127.0.0.1:{args.port}/api"
+    service.use_mock = False
+    await service.startup()
+
+    filters = [
+        SalesFilter(period=PERIODS[i % len(PERIODS)], store_id=str(i // len(PERIODS) + 1))
+        for i in range(args.filters)
+    ]
+
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            service.get_sales_data(filters[i % len(filters)]) for i in range(args.users)
+        ])
+        elapsed = time.perf_counter() - start
+    finally:
+        await service.shutdown()
+        await runner.cleanup()
+
+    errors = sum(1 for r in results if "error" in r)
+    upstream_calls = fake_app["calls"].get("/api/sales", 0)
+    stats = service.stats()["get_sales_data"]
+
+    print(f"Пользователей: {args.users}, различных фильтров: {len(filters)}, ошибок: {errors}")
+    print(f"Запросов в 1С: {upstream_calls}")
+    print(f"Счётчики single-flight: {stats}")
+    print(f"Время: {elapsed:.3f} с")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+Нагрузочный тест пакетных запросов к 1С (OneCService._get, BatchLoader).
+
+Имитирует сводку руководителя по N магазинам: для каждого магазина
+склады и ещё не синхронизированный хвост продаж (последний час) - 2N
+запросов. Запускает локальный имитатор 1С с задержкой ответа и сравнивает
+число HTTP-запросов к 1С и время в трёх режимах: без пакетирования,
+пакет одним запросом batch и 1С без поддержки batch (параллельно с
+ограничением ONEC_BATCH_CONCURRENCY).
+
+    python scripts/loadtest_onec_batch.py --stores 20 --delay 0.1
+"""
+import sys
+import os
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_onec_server import create_app
+from app.core.config import settings
+from app.services.onec_service import OneCService
+from app.schemas.sales import SalesFilter
+
+MODES = [
+    ("по одному", 0, True),
+    ("batch", 5, True),
+    ("без batch в 1С", 5, False),
+]
+
+
+async def dashboard(service: OneCService, stores: int):
+    date_to = datetime.now().replace(microsecond=0)
+    date_from = date_to - timedelta(hours=1)
+    requests = []
+    for store in range(1, stores + 1):
+        requests.append(service._load_warehouses(str(store)))
+        requests.append(service.fetch_sales_lines(SalesFilter(store_id=str(store)), date_from, date_to))
+    return await asyncio.gather(*requests, return_exceptions=True)
+
+
+async def run_mode(window_ms: float, batch: bool, args):
+    settings.ONEC_BATCH_WINDOW_MS = window_ms
+    fake_app = create_app(delay=args.delay, batch=batch)
+    runner = web.AppRunner(fake_app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    service = OneCService()
+    service.base_url = f"http://127.0.0.1:{args.port}/api"
+    service.use_mock = False
+    await service.startup()
+    try:
+        # Первый прогон выясняет поддержку batch и открывает соединения
+        await dashboard(service, args.stores)
+        fake_app["calls"].clear()
+        start = time.perf_counter()
+        results = await dashboard(service, args.stores)
+        elapsed = time.perf_counter() - start
+    finally:
+        await service.shutdown()
+        await runner.cleanup()
+
+    errors = sum(1 for result in results if isinstance(result, Exception))
+    return elapsed, sum(fake_app["calls"].values()), errors
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест пакетных запросов к 1С")
+    parser.add_argument("--stores", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.1, help="Задержка ответа 1С, с")
+    parser.add_argument("--port", type=int, default=8092)
+    args = parser.parse_args()
+
+    print(f"Магазинов: {args.stores}, запросов к 1С в сводке: {2 * args.stores}, "
+          f"ограничение параллельности: {settings.ONEC_BATCH_CONCURRENCY}")
+    print(f"  {'режим':<16} {'HTTP-запросов':>14} {'время':>9} {'ошибок':>7}")
+    for label, window_ms, batch in MODES:
+        elapsed, calls, errors = await run_mode(window_ms, batch, args)
+        print(f"  {label:<16} {calls:>14} {elapsed * 1000:7.0f}мс {errors:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
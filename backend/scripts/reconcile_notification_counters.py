@@ -0,0 +1,28 @@
+import sys
+import os
+import asyncio
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.base import AsyncSessionLocal, async_engine
+from app.db.redis import redis_client
+from app.services.notification_counters import notification_counters
+
+
+async def main():
+    """
+    Пересчёт счётчиков уведомлений в Redis по данным PostgreSQL
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            users = await notification_counters.rebuild(db)
+        print(f"Счётчики пересчитаны для {users} пользователей")
+    finally:
+        await async_engine.dispose()
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    print("Сверка счётчиков уведомлений...")
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+import sys
+import os
+import asyncio
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.base import async_engine
+from app.db.redis import redis_client
+from app.services.onec_service import onec_service
+from app.services.sales_sync import sales_sync
+
+
+async def main():
+    """
+    Синхронизация продаж из 1С в таблицу sales_lines (первая загрузка или догрузка)
+    """
+    try:
+        result = await sales_sync.sync_locked()
+        if result is None:
+            print("Синхронизация уже выполняется другим процессом")
+        else:
+            print(f"Загружено строк: {result['lines']}, продажи синхронизированы до {result['synced_until']}")
+            if result["rollups"]:
+                rollups = result["rollups"]
+                print(f"Итоги пересчитаны: часов {rollups['hours']}, дней {rollups['days']}, до {rollups['rolled_until']}")
+    finally:
+        await onec_service.shutdown()
+        await async_engine.dispose()
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    print("Синхронизация продаж из 1С...")
+    asyncio.run(main())
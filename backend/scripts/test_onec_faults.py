@@ -0,0 +1,298 @@
+"""
+Проверка отказоустойчивости запросов к 1С (предохранители, адаптивные
+таймауты, последние удачные ответы) на локальном имитаторе 1С со сбоями.
+
+Имитатор запускается в этом же процессе; сбои (задержка, ответы 5xx/4xx)
+включаются через его настройку faults. Каждый сценарий печатает OK или
+FAIL с причиной, при любом FAIL код выхода 1. Redis не обязателен:
+последние удачные ответы хранятся и в памяти процесса.
+
+    python scripts/test_onec_faults.py
+"""
+import sys
+import os
+import argparse
+import asyncio
+import time
+
+from aiohttp import web
+from loguru import logger
+
+# Добавляем родительскую директорию в путь
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_onec_server import create_app
+from app.core.config import settings
+from app.schemas.sales import SalesFilter
+from app.services.circuit_breaker import CLOSED, OPEN, CircuitOpenError, onec_breakers
+from app.services.onec_service import OneCService
+
+# Быстрые настройки, чтобы сценарии занимали секунды
+settings.ONEC_BREAKER_FAILURES = 3
+settings.ONEC_BREAKER_OPEN_SECONDS = 1
+settings.ONEC_BREAKER_OPEN_MAX = 4
+settings.ONEC_TIMEOUT_MIN = 0.2
+settings.ONEC_READ_TIMEOUT = 5
+settings.ONEC_BATCH_WINDOW_MS = 0
+settings.SALES_LOCAL_STORE_ENABLED = False
+
+
+class Check:
+    def __init__(self):
+        self.errors = []
+
+    def __call__(self, condition: bool, message: str):
+        if not condition:
+            self.errors.append(message)
+
+
+async def call(service: OneCService, endpoint: str = "stores"):
+    """
+    Запрос к 1С: (результат или исключение, время)
+    """
+    start = time.perf_counter()
+    try:
+        result = await service._request("GET", endpoint)
+    except Exception as e:
+        result = e
+    return result, time.perf_counter() - start
+
+
+def set_faults(fake_app, faults: dict):
+    fake_app["faults"].clear()
+    fake_app["faults"].update(faults)
+
+
+async def warm_up(service: OneCService, count: int = 30):
+    for _ in range(count):
+        await call(service)
+
+
+async def call_batched(service: OneCService):
+    """
+    Запросы stores и warehouses одним пакетом (POST /api/batch): [(результат или исключение, время)]
+    """
+    async def one(endpoint):
+        start = time.perf_counter()
+        try:
+            result = await service._get(endpoint)
+        except Exception as e:
+            result = e
+        return result, time.perf_counter() - start
+
+    return await asyncio.gather(one("stores"), one("warehouses"))
+
+
+def enable_batching(service: OneCService):
+    settings.ONEC_BATCH_WINDOW_MS = 5
+    service._batch.window = settings.ONEC_BATCH_WINDOW_MS / 1000
+
+
+async def adaptive_timeout(service, fake_app, check):
+    await warm_up(service)
+    state = onec_breakers.get("stores").snapshot()
+    check(state["state"] == CLOSED, f"состояние {state['state']}")
+    check(state["samples"] >= 20, f"мало замеров: {state['samples']}")
+    check(state["timeout"] < settings.ONEC_READ_TIMEOUT, f"таймаут не адаптировался: {state['timeout']}")
+
+
+async def slow_upstream(service, fake_app, check):
+    await warm_up(service)
+    set_faults(fake_app, {"delay": 3})
+    timings = []
+    for _ in range(settings.ONEC_BREAKER_FAILURES):
+        result, elapsed = await call(service)
+        check(isinstance(result, asyncio.TimeoutError), f"ожидался таймаут, получено {result!r}")
+        timings.append(elapsed)
+    check(max(timings) < 1, f"таймаут не адаптивный: {max(timings):.2f} с при ответе 1С за 3 с")
+    check(onec_breakers.get("stores").state == OPEN, "предохранитель не разомкнулся")
+
+    upstream = fake_app["calls"].get("/api/stores", 0)
+    result, elapsed = await call(service)
+    check(isinstance(result, CircuitOpenError), f"ожидался CircuitOpenError, получено {result!r}")
+    check(elapsed < 0.01, f"отказ не мгновенный: {elapsed * 1000:.1f} мс")
+    check(fake_app["calls"].get("/api/stores", 0) == upstream, "запрос ушёл в 1С при разомкнутом предохранителе")
+
+
+async def half_open_probe(service, fake_app, check):
+    await warm_up(service)
+    set_faults(fake_app, {"error_rate": 1, "status": 503})
+    for _ in range(settings.ONEC_BREAKER_FAILURES):
+        await call(service)
+    check(onec_breakers.get("stores").state == OPEN, "предохранитель не разомкнулся")
+
+    set_faults(fake_app, {"delay": 0.2})
+    await asyncio.sleep(settings.ONEC_BREAKER_OPEN_SECONDS)
+    upstream = fake_app["calls"].get("/api/stores", 0)
+    results = await asyncio.gather(*(call(service) for _ in range(10)))
+    probes = fake_app["calls"].get("/api/stores", 0) - upstream
+    rejected = sum(isinstance(result, CircuitOpenError) for result, _ in results)
+    check(probes == 1, f"пробных запросов в 1С: {probes}, ожидался 1")
+    check(rejected == 9, f"отклонено {rejected} из 10")
+    check(onec_breakers.get("stores").state == CLOSED, "предохранитель не замкнулся после удачной пробы")
+    result, _ = await call(service)
+    check(not isinstance(result, Exception), f"после восстановления: {result!r}")
+
+
+async def failed_probe_backoff(service, fake_app, check):
+    set_faults(fake_app, {"error_rate": 1, "status": 500})
+    for _ in range(settings.ONEC_BREAKER_FAILURES):
+        await call(service)
+    breaker = onec_breakers.get("stores")
+    await asyncio.sleep(settings.ONEC_BREAKER_OPEN_SECONDS)
+    result, _ = await call(service)
+    check(breaker.state == OPEN, f"после неудачной пробы: {breaker.state}")
+    check(breaker.open_for == 2 * settings.ONEC_BREAKER_OPEN_SECONDS, f"срок размыкания {breaker.open_for} с")
+    result, _ = await call(service)
+    check(isinstance(result, CircuitOpenError) and result.retry_after > settings.ONEC_BREAKER_OPEN_SECONDS,
+          f"ожидался CircuitOpenError с retry_after > {settings.ONEC_BREAKER_OPEN_SECONDS}, получено {result!r}")
+
+
+async def client_errors(service, fake_app, check):
+    set_faults(fake_app, {"error_rate": 1, "status": 404})
+    for _ in range(settings.ONEC_BREAKER_FAILURES * 2):
+        await call(service)
+    check(onec_breakers.get("stores").state == CLOSED, "предохранитель разомкнулся от ответов 4xx")
+
+
+async def endpoints_isolated(service, fake_app, check):
+    set_faults(fake_app, {"error_rate": 1, "status": 500, "paths": ["/api/stores"]})
+    for _ in range(settings.ONEC_BREAKER_FAILURES):
+        await call(service)
+    result, _ = await call(service, "warehouses")
+    check(onec_breakers.get("stores").state == OPEN, "предохранитель stores не разомкнулся")
+    check(not isinstance(result, Exception), f"warehouses пострадал от сбоя stores: {result!r}")
+
+
+async def last_good_fallback(service, fake_app, check):
+    filter_params = SalesFilter(period="today", store_id="1")
+    good = await service.get_sales_data(filter_params)
+    check("error" not in good, f"первый запрос: {good}")
+
+    set_faults(fake_app, {"error_rate": 1, "status": 502})
+    for _ in range(settings.ONEC_BREAKER_FAILURES):
+        await call(service, "sales")
+    check(onec_breakers.get("sales").state == OPEN, "предохранитель sales не разомкнулся")
+
+    fallback = await service.get_sales_data(filter_params)
+    check(fallback == good, "при недоступной 1С не отдан последний удачный ответ")
+    missing = await service.get_sales_data(SalesFilter(period="today", store_id="2"))
+    check("error" in missing and "retry_after" in missing, f"без сохранённого ответа: {missing}")
+
+
+async def health_snapshot(service, fake_app, check):
+    await warm_up(service, 5)
+    set_faults(fake_app, {"error_rate": 1, "status": 500, "paths": ["/api/stores"]})
+    for _ in range(settings.ONEC_BREAKER_FAILURES):
+        await call(service)
+    snapshot = onec_breakers.snapshot()
+    check(snapshot.get("stores", {}).get("state") == OPEN, f"stores: {snapshot.get('stores')}")
+    check("retry_after" in snapshot.get("stores", {}), "нет retry_after у разомкнутого")
+    check(onec_breakers.degraded(), "degraded() при разомкнутом предохранителе")
+    await asyncio.sleep(settings.ONEC_BREAKER_OPEN_SECONDS)
+    set_faults(fake_app, {})
+    await call(service)
+    check(not onec_breakers.degraded(), f"после восстановления: {onec_breakers.snapshot()}")
+
+
+async def batched_slow_upstream(service, fake_app, check):
+    enable_batching(service)
+    for _ in range(30):
+        await call_batched(service)
+    check(fake_app["calls"].get("/api/batch", 0) >= 25, f"пакетов: {fake_app['calls'].get('/api/batch', 0)}")
+    check(onec_breakers.get("stores").snapshot()["samples"] >= 20, "нет замеров stores по пакетам")
+    check("batch" not in onec_breakers.snapshot(), "предохранитель на пакетный endpoint вместо подзапросов")
+
+    set_faults(fake_app, {"delay": 3})
+    timings = []
+    for _ in range(settings.ONEC_BREAKER_FAILURES):
+        for result, elapsed in await call_batched(service):
+            check(isinstance(result, asyncio.TimeoutError), f"ожидался таймаут, получено {result!r}")
+            timings.append(elapsed)
+    check(max(timings) < 1, f"таймаут пакета не адаптивный: {max(timings):.2f} с при ответе 1С за 3 с")
+    for endpoint in ("stores", "warehouses"):
+        check(onec_breakers.get(endpoint).state == OPEN, f"предохранитель {endpoint} не разомкнулся")
+
+
+async def batched_endpoints_isolated(service, fake_app, check):
+    enable_batching(service)
+    await call_batched(service)
+    set_faults(fake_app, {"error_rate": 1, "status": 500, "paths": ["/api/stores"]})
+    for _ in range(settings.ONEC_BREAKER_FAILURES):
+        (stores, _), (warehouses, _) = await call_batched(service)
+        check(isinstance(stores, RuntimeError), f"stores: ожидалась ошибка 500, получено {stores!r}")
+        check(not isinstance(warehouses, Exception), f"warehouses пострадал от сбоя stores: {warehouses!r}")
+    check(onec_breakers.get("stores").state == OPEN, "5xx в подзапросах не разомкнули предохранитель stores")
+    check(onec_breakers.get("warehouses").state == CLOSED, "предохранитель warehouses разомкнулся")
+
+    batches = fake_app["calls"].get("/api/batch", 0)
+    (stores, elapsed), (warehouses, _) = await call_batched(service)
+    check(isinstance(stores, CircuitOpenError), f"ожидался CircuitOpenError, получено {stores!r}")
+    check(elapsed < 0.005, f"отказ ждал пакета: {elapsed * 1000:.1f} мс")
+    check(not isinstance(warehouses, Exception), f"warehouses при разомкнутом stores: {warehouses!r}")
+    check(fake_app["calls"].get("/api/warehouses", 0) + fake_app["calls"].get("/api/batch", 0) - batches == 1,
+          "лишние запросы в 1С")
+
+
+SCENARIOS = [
+    ("адаптивный таймаут по времени ответов", adaptive_timeout),
+    ("медленная 1С: быстрый таймаут и размыкание", slow_upstream),
+    ("half-open: один пробный запрос", half_open_probe),
+    ("неудачная проба удваивает срок", failed_probe_backoff),
+    ("ответы 4xx не размыкают", client_errors),
+    ("предохранители независимы по endpoint'ам", endpoints_isolated),
+    ("последний удачный ответ при разомкнутом", last_good_fallback),
+    ("состояние для /health", health_snapshot),
+    ("пакетные запросы: медленная 1С", batched_slow_upstream),
+    ("пакетные запросы: предохранители по endpoint'ам", batched_endpoints_isolated),
+]
+
+
+async def run_scenario(fn, port: int) -> list:
+    fake_app = create_app(delay=0.01)
+    runner = web.AppRunner(fake_app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    onec_breakers.reset()
+    settings.ONEC_BATCH_WINDOW_MS = 0
+    service = OneCService()
+    service.base_url = f"http://127.0.0.1:{port}/api"
+    service.use_mock = False
+    await service.startup()
+    check = Check()
+    try:
+        await fn(service, fake_app, check)
+    except Exception as e:
+        check(False, f"исключение {e!r}")
+    finally:
+        await service.shutdown()
+        await runner.cleanup()
+    return check.errors
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Проверка отказоустойчивости запросов к 1С")
+    parser.add_argument("--port", type=int, default=8093)
+    parser.add_argument("--verbose", action="store_true", help="Логи сервиса (предупреждения о сбоях)")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.remove()
+
+    failed = 0
+    for label, fn in SCENARIOS:
+        start = time.perf_counter()
+        errors = await run_scenario(fn, args.port)
+        status = "FAIL" if errors else "OK"
+        print(f"  {status:<5} {label} ({time.perf_counter() - start:.1f} с)")
+        for error in errors:
+            print(f"        {error}")
+        failed += bool(errors)
+
+    print(f"\nСценариев: {len(SCENARIOS)}, не прошло: {failed}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -17,7 +17,8 @@ import {
     updateStock, 
     generateReport, 
     getStores, 
-    getWarehouses 
+    getWarehouses,
+    waitForProcess
 } from '../services/api.js';
 
 // Состояние страницы обработок
@@ -263,6 +264,19 @@ async function loadWarehouses() {
     }
 }
 
+// Обработки выполняются в фоне: дожидаемся завершения и возвращаем ответ 1С
+async function waitProcessResult(queued) {
+    if (!queued || !queued.success || !queued.process_id) {
+        return queued;
+    }
+    
+    const status = await waitForProcess(queued.process_id);
+    if (status.status === 'failed') {
+        return { success: false, message: status.message };
+    }
+    return status.result;
+}
+
 // Запуск обработки обновления остатков
 async function runUpdateStock() {
     if (processesState.isLoading) return;
@@ -271,7 +285,8 @@ async function runUpdateStock() {
         processesState.isLoading = true;
         showNotification('Запуск обработки...');
         
-        const result = await updateStock(processesState.selectedWarehouseId);
+        const queued = await updateStock(processesState.selectedWarehouseId);
+        const result = await waitProcessResult(queued);
         
         if (result && result.success) {
             showNotification(result.message || 'Обновление остатков выполнено успешно');
@@ -294,12 +309,13 @@ async function runGenerateReport() {
         processesState.isLoading = true;
         showNotification('Формирование отчета...');
         
-        const result = await generateReport(
+        const queued = await generateReport(
             processesState.selectedReportType,
             processesState.selectedPeriod,
             processesState.selectedStoreId,
             processesState.selectedWarehouseId
         );
+        const result = await waitProcessResult(queued);
         
         if (result && result.success) {
             showNotification(result.message || 'Отчет сформирован успешно');
@@ -328,10 +344,11 @@ async function runCustomProcess(processName) {
         processesState.isLoading = true;
         showNotification(`Запуск обработки "${processName}"...`);
         
-        const result = await runProcess(processName, {
+        const queued = await runProcess(processName, {
             storeId: processesState.selectedStoreId,
             warehouseId: processesState.selectedWarehouseId
         });
+        const result = await waitProcessResult(queued);
         
         if (result && result.success) {
             showNotification(result.message || 'Обработка выполнена успешно');
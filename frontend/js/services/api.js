@@ -145,3 +145,22 @@ export async function generateReport(reportType, period = 'today', storeId = nul
         })
     });
 }
+
+// Статус обработки, поставленной в очередь
+export async function getProcessStatus(processId) {
+    const url = `${API_BASE_URL}/processes/${processId}`;
+    return await fetchWithAuth(url);
+}
+
+// Ожидание завершения обработки (опрос статуса)
+export async function waitForProcess(processId, intervalMs = 1000, timeoutMs = 10 * 60 * 1000) {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+        const status = await getProcessStatus(processId);
+        if (status.status === 'completed' || status.status === 'failed') {
+            return status;
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+    throw new Error('Превышено время ожидания обработки');
+}